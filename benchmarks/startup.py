@@ -0,0 +1,69 @@
+"""
+Measure the start-up cost of the package and the command line tool.
+
+Every command runs in a fresh interpreter, so nothing is already imported.
+
+Usage:
+    python benchmarks/startup.py [--runs 15] [--importtime]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = {
+    "import libraries": [sys.executable, "-c", "import libraries"],
+    "main.py --help": [sys.executable, "main.py", "--help"],
+}
+
+
+def time_command(command, runs):
+    """
+    Run a command 'runs' times and return the wall-clock times in seconds.
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def import_offenders(top=10):
+    """
+    Return the 'top' modules with the largest cumulative import time for "import libraries".
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import libraries"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        #lines look like "import time:   self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start-up time of the package and main.py.")
+    parser.add_argument("--runs", type=int, default=15, help="Runs per command (default: 15).")
+    parser.add_argument("--importtime", action="store_true", help="Also list the slowest imports.")
+    args = parser.parse_args()
+
+    for name, command in COMMANDS.items():
+        times = time_command(command, args.runs)
+        print(f"{name:<18} median {statistics.median(times) * 1000:7.1f} ms   "
+              f"min {min(times) * 1000:7.1f} ms   ({args.runs} runs)")
+
+    if args.importtime:
+        print("\nslowest imports (cumulative):")
+        for micros, module in import_offenders():
+            print(f"  {micros / 1000:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
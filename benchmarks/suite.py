@@ -0,0 +1,286 @@
+"""
+Benchmark suite for the library functions and the end-to-end main.py flow.
+
+Every benchmark runs on a synthetic signal for each (duration, sample rate,
+segment length) of the chosen profile. Wall-clock time is measured over
+several repetitions; peak memory and the number of memory blocks that are
+still allocated afterwards (retained_blocks) are measured in one extra run
+under tracemalloc, so tracing does not slow down the timed runs. Temporaries
+that are allocated and freed inside the call do not show in retained_blocks;
+their cost shows in peak_bytes.
+
+Usage:
+    python benchmarks/suite.py run [--profile quick|full] [--filter NAME] [--output results.json]
+    python benchmarks/suite.py compare baseline.json results.json [--time-threshold 0.1]
+
+'compare' exits with status 1 when a benchmark got slower or needs more memory
+than the thresholds allow, so it can gate a CI job.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from libraries import (concatenate_segments, manipulate_segments, reverse_segments, save_audio,  # noqa: E402
+                       segment_audio_by_duration, smooth_audio_list)
+
+#(duration in seconds, sample rate, segment length in ms) grids
+PROFILES = {
+    "quick": [(1, 16000, 20), (10, 44100, 20), (60, 44100, 100)],
+    "full": [(duration, sample_rate, segment_ms)
+             for duration in (1, 60, 600, 7200)
+             for sample_rate in (16000, 44100, 48000)
+             for segment_ms in (10, 20, 100)],
+}
+
+#everything the setup of a benchmark may need
+Context = namedtuple("Context", ["signal", "sample_rate", "segment_ms", "folder", "input_file"])
+
+
+def synthetic_signal(duration_s, sample_rate, seed=0):
+    """
+    Generate a speech-like test signal: a few harmonics with a slow amplitude envelope plus noise.
+
+    Parameters:
+    - duration_s: Duration in seconds.
+    - sample_rate: Sampling rate (in Hz).
+    - seed: Seed of the noise, so every run benchmarks the same samples.
+
+    Returns:
+    - float32 NumPy array with peaks below 1.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration_s * sample_rate), dtype=np.float32) / np.float32(sample_rate)
+    signal = np.zeros_like(t)
+    for harmonic, amplitude in ((140, 0.3), (280, 0.15), (420, 0.08), (1100, 0.04)):
+        signal += np.float32(amplitude) * np.sin(np.float32(2 * np.pi * harmonic) * t)
+    #syllable-rate envelope
+    signal *= np.float32(0.5) + np.float32(0.5) * np.sin(np.float32(2 * np.pi * 4) * t) ** 2
+    signal += rng.normal(0, 0.02, len(t)).astype(np.float32)
+    return signal
+
+
+def _table(ctx):
+    return segment_audio_by_duration(ctx.signal.copy(), ctx.sample_rate, ctx.segment_ms, as_table=True)
+
+
+def _segment_list(ctx):
+    return lambda: segment_audio_by_duration(ctx.signal, ctx.sample_rate, ctx.segment_ms)
+
+
+def _segment_table(ctx):
+    return lambda: segment_audio_by_duration(ctx.signal, ctx.sample_rate, ctx.segment_ms, as_table=True)
+
+
+def _reverse(ctx):
+    table = _table(ctx)
+    return lambda: reverse_segments(table, '1 * n + 0')
+
+
+def _manipulate(method, noise_type):
+    def setup(ctx):
+        table = _table(ctx)
+        return lambda: manipulate_segments(table, method, ctx.sample_rate, noise_type=noise_type)
+    return setup
+
+
+def _smooth(ctx):
+    table = _table(ctx)
+    return lambda: smooth_audio_list(table, ctx.sample_rate, fade_percentage=15)
+
+
+def _concatenate_list(ctx):
+    segments = segment_audio_by_duration(ctx.signal, ctx.sample_rate, ctx.segment_ms)
+    return lambda: concatenate_segments(segments)
+
+
+def _concatenate_table(ctx):
+    #a table that tiles its buffer is returned as a view; this measures that fast path
+    table = _table(ctx)
+    return lambda: concatenate_segments(table)
+
+
+def _save(ctx):
+    return lambda: save_audio(ctx.signal, ctx.sample_rate, ctx.folder, output_name="save", output_format="wav")
+
+
+def _main_flow(ctx):
+    import main
+
+    args = main.build_parser().parse_args(["--file", ctx.input_file, "--method", "reverse",
+                                           "--segment", str(ctx.segment_ms), "--format", "wav",
+                                           "--output-folder", ctx.folder, "--output", "main_flow"])
+    return lambda: main.run_cli(args)
+
+
+#name -> setup(ctx) returning the callable to measure; setup work is not measured
+BENCHMARKS = {
+    "segment_audio_by_duration[list]": _segment_list,
+    "segment_audio_by_duration[table]": _segment_table,
+    "reverse_segments": _reverse,
+    "manipulate_segments[mute]": _manipulate("mute", "white"),
+    "manipulate_segments[white]": _manipulate("noise", "white"),
+    "manipulate_segments[pink]": _manipulate("noise", "pink"),
+    "smooth_audio_list": _smooth,
+    "concatenate_segments[list]": _concatenate_list,
+    "concatenate_segments[table]": _concatenate_table,
+    "save_audio[wav]": _save,
+    "main[reverse,wav]": _main_flow,
+}
+
+
+def measure(setup, ctx, repeat):
+    """
+    Time a benchmark 'repeat' times and measure its memory in one traced run.
+
+    Returns:
+    - Dictionary with median_s, min_s, peak_bytes and retained_blocks (memory blocks
+      still allocated by the call after it returned, e.g. the returned arrays; not a
+      count of all allocations, since tracemalloc snapshots only see live blocks).
+    """
+    times = []
+    for _ in range(repeat):
+        #fresh inputs every time: the in-place stages would otherwise work on their own output
+        run = setup(ctx)
+        np.random.seed(0)
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    run = setup(ctx)
+    np.random.seed(0)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        result = run()
+        peak = tracemalloc.get_traced_memory()[1]
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del result
+    retained = sum(max(stat.count_diff, 0) for stat in after.compare_to(before, "lineno"))
+    return {"median_s": statistics.median(times), "min_s": min(times), "peak_bytes": peak,
+            "retained_blocks": retained}
+
+
+def run_suite(grid, names, repeat=5, log=print):
+    """
+    Run the named benchmarks over every (duration, sample rate, segment length) of the grid.
+
+    Returns:
+    - Dictionary 'key -> record'; the key looks like "reverse_segments/60s/44100Hz/20ms".
+    """
+    import soundfile as sf
+
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for duration, sample_rate, segment_ms in grid:
+            signal = synthetic_signal(duration, sample_rate)
+            input_file = os.path.join(folder, "input.wav")
+            sf.write(input_file, signal, sample_rate, subtype="PCM_16")
+            ctx = Context(signal, sample_rate, segment_ms, folder, input_file)
+            #long signals take seconds per call; fewer repetitions keep the suite usable
+            runs = repeat if duration < 600 else max(1, min(repeat, 2))
+            for name in names:
+                #the functions print progress messages; keep the report readable
+                with contextlib.redirect_stdout(io.StringIO()):
+                    record = measure(BENCHMARKS[name], ctx, runs)
+                record.update(name=name, duration_s=duration, sample_rate=sample_rate, segment_ms=segment_ms)
+                key = f"{name}/{duration}s/{sample_rate}Hz/{segment_ms}ms"
+                results[key] = record
+                log(f"{key:<58} {record['median_s'] * 1000:10.2f} ms {record['peak_bytes'] / 2**20:9.1f} MiB"
+                    f" {record['retained_blocks']:7d} retained blocks")
+    return results
+
+
+def compare(baseline, current, time_threshold=0.10, memory_threshold=0.10, min_time=0.001):
+    """
+    Compare two result sets benchmark by benchmark.
+
+    A benchmark regresses when its median time grows by more than 'time_threshold'
+    (relative) and by more than 'min_time' seconds, or when its peak memory grows by
+    more than 'memory_threshold'.
+
+    Returns:
+    - List of (key, metric, baseline value, current value, ratio) for every regression.
+    """
+    regressions = []
+    for key, new in current.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        if new["median_s"] - old["median_s"] > min_time and new["median_s"] > old["median_s"] * (1 + time_threshold):
+            regressions.append((key, "median_s", old["median_s"], new["median_s"], new["median_s"] / old["median_s"]))
+        if new["peak_bytes"] > old["peak_bytes"] * (1 + memory_threshold):
+            ratio = new["peak_bytes"] / old["peak_bytes"] if old["peak_bytes"] else float("inf")
+            regressions.append((key, "peak_bytes", old["peak_bytes"], new["peak_bytes"], ratio))
+    return regressions
+
+
+def _load(path):
+    with open(path) as file:
+        return json.load(file)["results"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite of the Voice Manipulation Project.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the benchmarks and write a JSON result file")
+    run.add_argument("--profile", choices=sorted(PROFILES), default="quick",
+                     help="signal grid; 'full' goes up to 2 h signals (default: quick)")
+    run.add_argument("--filter", action="append", default=[],
+                     help="only run benchmarks whose name contains this text (repeatable)")
+    run.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark (default: 5)")
+    run.add_argument("--output", default="benchmark_results.json", help="result file (default: benchmark_results.json)")
+
+    cmp = commands.add_parser("compare", help="compare a result file against a baseline")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--time-threshold", type=float, default=0.10, help="allowed relative slowdown (default: 0.10)")
+    cmp.add_argument("--memory-threshold", type=float, default=0.10,
+                     help="allowed relative peak memory growth (default: 0.10)")
+    cmp.add_argument("--min-time", type=float, default=0.001,
+                     help="slowdowns below this many seconds are noise (default: 0.001)")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        names = [name for name in BENCHMARKS if not args.filter or any(text in name for text in args.filter)]
+        if not names:
+            parser.error("no benchmark matches --filter")
+        results = run_suite(PROFILES[args.profile], names, repeat=args.repeat)
+        meta = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "profile": args.profile,
+                "python": platform.python_version(), "numpy": np.__version__, "machine": platform.platform()}
+        with open(args.output, "w") as file:
+            json.dump({"meta": meta, "results": results}, file, indent=1)
+        print(f"Results saved: {args.output}")
+        return
+
+    baseline, current = _load(args.baseline), _load(args.current)
+    regressions = compare(baseline, current, args.time_threshold, args.memory_threshold, args.min_time)
+    missing = sorted(set(baseline) - set(current))
+    print(f"{len(set(baseline) & set(current))} benchmarks compared, {len(regressions)} regressions")
+    for key, metric, old, new, ratio in regressions:
+        print(f"REGRESSION {key} {metric}: {old:.6g} -> {new:.6g} (x{ratio:.2f})")
+    if missing:
+        print(f"{len(missing)} baseline benchmarks are not in {args.current}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,85 @@
 # libraries/__init__.py
 
-# Import functions from all libraries
-from .library1 import segment_audio_list  # Example function from library1.py
-from .library1 import segment_audio_by_duration  # Example function from library1.py
-from .library2 import reverse_segments  # Example function from library2.py
-from .library3 import manipulate_segments  # Example function from library3.py
-from .library4 import save_audio  # Example function from library4.py
-from .library5 import smooth_audio_list  # Example function from library5.py
-from .library6 import concatenate_segments  # Example function from library6.py
-# Add more imports as needed for all libraries
+import importlib
 
-# List of all imported functions (for easier access in main.py)
+# Public names and the library each one lives in. Libraries are imported the
+# first time one of their names is used, so "import libraries" stays cheap and
+# librosa/scipy/soundfile are only loaded by the functions that need them.
+_EXPORTS = {
+    "segment_audio_list": ".library1",  # Example function from library1.py
+    "segment_audio_by_duration": ".library1",  # Example function from library1.py
+    "SegmentTable": ".library1",  # Zero-copy segment table from library1.py
+    "segment_audio_by_energy": ".library1",  # Cuts segments at pauses from library1.py
+    "energy_boundaries": ".library1",  # Low-energy segment boundaries from library1.py
+    "reverse_segments": ".library2",  # Example function from library2.py
+    "manipulate_segments": ".library3",  # Example function from library3.py
+    "save_audio": ".library4",  # Example function from library4.py
+    "export_audio": ".library4",  # Concurrent multi-format export from library4.py
+    "smooth_audio_list": ".library5",  # Example function from library5.py
+    "concatenate_segments": ".library6",  # Example function from library6.py
+    "SegmentAssembler": ".library6",  # Preallocated output buffer from library6.py
+    "load_audio": ".loader",  # Memory-mapped WAV / soundfile loader from loader.py
+    "stream_process": ".streaming",  # Constant-memory block pipeline from streaming.py
+    "parallel_process": ".parallel",  # Shared-memory multi-process executor from parallel.py
+    "run_batch": ".batch",  # Resumable manifest batch runner from batch.py
+    "run_sweep": ".sweep",  # Parameter sweep over shared intermediates from sweep.py
+    "sweep_variants": ".sweep",  # Expands a parameter grid from sweep.py
+    "RealtimeEngine": ".realtime",  # Low-latency block engine for live feeds from realtime.py
+    "Pipeline": ".pipeline",  # Fused stage pipeline from pipeline.py
+    "register_stage": ".pipeline",  # Adds a stage to the pipeline from pipeline.py
+    "pitch_shift": ".pitch",  # Phase vocoder pitch shift from pitch.py
+    "time_stretch": ".pitch",  # Phase vocoder time stretch from pitch.py
+    "shift_segments": ".pitch",  # Pitch shift of selected segments from pitch.py
+    "stretch_segments": ".pitch",  # Time stretch of selected segments from pitch.py
+    "precompute_noise": ".noise_bank",  # Memory-mappable noise pool from noise_bank.py
+    "set_dtype": ".dtypes",  # Sets the float32/float64 policy from dtypes.py
+    "dtype_policy": ".dtypes",  # Context manager form of set_dtype from dtypes.py
+    # Add more names here as needed for all libraries
+}
+
+# List of all exported functions (for easier access in main.py)
 __all__ = [
     "save_audio",
+    "export_audio",
     "segment_audio_list",
     "segment_audio_by_duration",
+    "SegmentTable",
+    "segment_audio_by_energy",
+    "energy_boundaries",
     "reverse_segments",
     "manipulate_segments",
     "smooth_audio_list",
-    "concatenate_segments", 
+    "concatenate_segments",
+    "SegmentAssembler",
+    "load_audio",
+    "stream_process",
+    "parallel_process",
+    "run_batch",
+    "run_sweep",
+    "sweep_variants",
+    "RealtimeEngine",
+    "Pipeline",
+    "register_stage",
+    "pitch_shift",
+    "time_stretch",
+    "shift_segments",
+    "stretch_segments",
+    "precompute_noise",
+    "set_dtype",
+    "dtype_policy",
     # Add more functions here as needed
 ]
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    # cache it, so later lookups do not come through here again
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
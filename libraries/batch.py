@@ -0,0 +1,233 @@
+import csv
+import hashlib
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .dtypes import get_dtype
+from .service import PROCESS_PARAMETERS, process_options, process_upload
+
+#manifest columns besides the parameters
+JOB_FIELDS = ('id', 'input', 'output', 'params')
+#per-job parameters of a manifest row; the output format comes from the output file's extension
+JOB_PARAMETERS = {name: kind for name, kind in PROCESS_PARAMETERS.items() if name not in ('format', 'filename')}
+
+
+def read_manifest(path):
+    """
+    Read a batch manifest: one job per row, as CSV (with a header row) or as JSON lines.
+
+    Every row names an 'input' and an 'output' file, optionally an 'id', and any of
+    JOB_PARAMETERS (method, segment, noise_type, noise_level, fade_percentage, seed, ...),
+    either as columns / keys of their own or as a JSON object in 'params'. Empty CSV
+    cells keep the default. The output format is taken from the output file's extension.
+
+    Parameters:
+    - path: Path of the manifest; '.jsonl' and '.json' files are read as JSON lines, anything else as CSV.
+
+    Returns:
+    - List of job dicts with 'id', 'input', 'output', 'key' (a digest of the job's settings,
+      used to recognize finished jobs) and 'kwargs' for process_upload.
+    """
+    with open(path, newline='', encoding='utf-8') as file:
+        if os.path.splitext(path)[1].lower() in ('.jsonl', '.json'):
+            rows = [json.loads(line) for line in file if line.strip()]
+        else:
+            rows = [{name: value for name, value in row.items() if value not in (None, '')}
+                    for row in csv.DictReader(file)]
+    jobs = []
+    outputs = set()
+    for number, row in enumerate(rows, 1):
+        try:
+            job = _manifest_job(row, number)
+        except (ValueError, TypeError, KeyError) as e:
+            raise ValueError(f"{path}, job {number}: {e}") from None
+        if job['output'] in outputs:
+            raise ValueError(f"{path}, job {number}: the output {job['output']} is written by an earlier job too.")
+        outputs.add(job['output'])
+        jobs.append(job)
+    return jobs
+
+
+def _manifest_job(row, number):
+    if not isinstance(row, dict):
+        raise TypeError("A job must be an object with 'input' and 'output'.")
+    row = dict(row)
+    params = row.pop('params', None) or {}
+    if isinstance(params, str):
+        params = json.loads(params)
+    for name in ('input', 'output'):
+        if not row.get(name):
+            raise ValueError(f"The job has no '{name}' file.")
+    job_id = str(row.pop('id', number))
+    input_path, output_path = str(row.pop('input')), str(row.pop('output'))
+    settings = {}
+    for name, value in {**row, **params}.items():
+        if name not in JOB_PARAMETERS:
+            raise ValueError(f"Unknown parameter '{name}'. Use {', '.join(JOB_PARAMETERS)}.")
+        settings[name] = JOB_PARAMETERS[name](value)
+    output_format = os.path.splitext(output_path)[1][1:].lower()
+    if not output_format:
+        raise ValueError(f"The output {output_path} has no extension to take the format from.")
+    kwargs = dict(process_options(settings), output_format=output_format)
+    #the same input, output and settings give the same key, wherever the row is in the manifest
+    key = hashlib.blake2b(json.dumps([input_path, output_path, kwargs], sort_keys=True).encode(),
+                          digest_size=16).hexdigest()
+    return dict(id=job_id, input=input_path, output=output_path, key=key, kwargs=kwargs)
+
+
+class CompletionLog:
+    """
+    Append-only JSON lines log of finished batch jobs, one record per job.
+
+    Every record is appended with a single write and synced to disk before the next
+    job is logged, so an interrupted run leaves at most one torn last line, which is
+    ignored when the log is read again.
+
+    Parameters:
+    - path: Path of the log file (created if missing).
+    - sync: fsync every record (default); False leaves the flushing to the OS.
+    """
+
+    def __init__(self, path, sync=True):
+        self.path = path
+        self.sync = sync
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        #a torn last line is ended, so the next record starts on a line of its own
+        if os.fstat(self._fd).st_size:
+            with open(path, 'rb') as file:
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b'\n':
+                    os.write(self._fd, b'\n')
+
+    @staticmethod
+    def records(path):
+        """
+        Return the readable records of a log (none if it does not exist).
+        """
+        if not os.path.exists(path):
+            return []
+        records = []
+        with open(path, encoding='utf-8', errors='replace') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict):
+                    records.append(record)
+        return records
+
+    def append(self, record):
+        os.write(self._fd, (json.dumps(record) + '\n').encode())
+        if self.sync:
+            os.fsync(self._fd)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def run_job(job, dtype=None):
+    """
+    Process one manifest job and return its log record; errors are caught and recorded.
+
+    The output is exported under a temporary name next to the final file and renamed
+    when complete, so an interrupted job never leaves a truncated output behind.
+    """
+    started = time.perf_counter()
+    record = dict(key=job['key'], id=job['id'], input=job['input'], output=job['output'], pid=os.getpid())
+    folder, name = os.path.split(job['output'])
+    partial = f".{os.path.splitext(name)[0]}.{os.getpid()}.partial"
+    try:
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        result = process_upload(job['input'], folder or '.', dtype=dtype, output_name=partial, **job['kwargs'])
+        os.replace(result['path'], job['output'])
+        record.update(status='done', samples=result['samples'], channels=result['channels'],
+                      sample_rate=result['sample_rate'],
+                      audio_seconds=round(result['samples'] / result['sample_rate'], 6))
+    except Exception as e:
+        record.update(status='failed', error=f"{type(e).__name__}: {e}",
+                      traceback=traceback.format_exc(limit=-3))
+        leftover = os.path.join(folder or '.', f"{partial}.{job['kwargs']['output_format']}")
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    record.update(seconds=round(time.perf_counter() - started, 6), finished=time.time())
+    return record
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def run_batch(manifest, log_path=None, workers=None, dtype=None, on_record=None):
+    """
+    Run every job of a manifest across a process pool, resuming an interrupted run.
+
+    Jobs already recorded as done in the completion log (with the same input, output
+    and settings) are skipped; failed jobs are tried again. The rest run largest input
+    file first, so the long jobs do not end up alone at the end of the run, and every
+    finished job is appended to the log with its status, timing and error, if any.
+
+    Parameters:
+    - manifest: Path of the manifest (see read_manifest).
+    - log_path: Completion log (default: the manifest's path + '.log.jsonl').
+    - workers: Worker processes (default: os.cpu_count()); 1 runs the jobs in this process.
+    - dtype: Sample precision of the jobs (default: the dtype policy).
+    - on_record: Optional callable called with every log record as it is written.
+
+    Returns:
+    - Summary dict: jobs, skipped, done, failed, seconds, audio_seconds, log.
+    """
+    started = time.perf_counter()
+    jobs = read_manifest(manifest)
+    log_path = log_path or f"{manifest}.log.jsonl"
+    finished = {record.get('key') for record in CompletionLog.records(log_path) if record.get('status') == 'done'}
+    pending = sorted((job for job in jobs if job['key'] not in finished), key=lambda job: -_file_size(job['input']))
+    dtype = dtype or get_dtype()
+    workers = max(min(workers or os.cpu_count() or 1, len(pending)), 1)
+
+    summary = dict(jobs=len(jobs), skipped=len(jobs) - len(pending), done=0, failed=0, audio_seconds=0.0,
+                   log=log_path)
+    with CompletionLog(log_path) as log:
+        def finish(record):
+            log.append(record)
+            summary[record['status']] += 1
+            summary['audio_seconds'] += record.get('audio_seconds', 0.0)
+            if on_record is not None:
+                on_record(record)
+
+        if workers == 1:
+            for job in pending:
+                finish(run_job(job, dtype))
+        else:
+            #the pool takes the jobs in submission order, so the largest files start first
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(run_job, job, dtype): job for job in pending}
+                for future in as_completed(futures):
+                    job = futures[future]
+                    try:
+                        record = future.result()
+                    except Exception as e:
+                        #a worker died (e.g. it ran out of memory); the job is tried again on resume
+                        record = dict(key=job['key'], id=job['id'], input=job['input'], output=job['output'],
+                                      status='failed', error=f"{type(e).__name__}: {e}", finished=time.time())
+                    finish(record)
+    summary.update(seconds=round(time.perf_counter() - started, 6), audio_seconds=round(summary['audio_seconds'], 6))
+    return summary
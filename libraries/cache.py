@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+from .dtypes import resolve_dtype
+
+#default size bound of the cache folder
+DEFAULT_CACHE_BYTES = 2 << 30
+#bytes hashed per read when fingerprinting an input file
+HASH_CHUNK = 1 << 20
+
+#(path, size, mtime) -> digest, so a file is hashed once per process
+_digests = {}
+
+
+def default_cache_dir():
+    """
+    Return the cache folder: $VOICE_CACHE_DIR, else ~/.cache/voice-manipulation.
+    """
+    return os.environ.get('VOICE_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'voice-manipulation')
+
+
+def file_digest(path):
+    """
+    Return the BLAKE2b hex digest of a file's content.
+
+    The cache is keyed by content, so renamed or copied inputs still hit it and an
+    edited file never returns stale audio.
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+    digest = _digests.get(memo_key)
+    if digest is None:
+        hasher = hashlib.blake2b(digest_size=20)
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(HASH_CHUNK), b''):
+                hasher.update(chunk)
+        digest = _digests[memo_key] = hasher.hexdigest()
+    return digest
+
+
+class AudioCache:
+    """
+    Content-addressed on-disk cache of arrays with least-recently-used eviction.
+
+    Every entry is a '.npy' file, read back through a memory map, next to a small
+    '.json' file with its metadata. Reading an entry marks it as recently used;
+    when the folder grows beyond max_bytes the least recently used entries are
+    removed.
+
+    Parameters:
+    - folder: Cache folder (default: default_cache_dir()).
+    - max_bytes: Size bound of the folder in bytes (default: DEFAULT_CACHE_BYTES).
+    """
+
+    def __init__(self, folder=None, max_bytes=DEFAULT_CACHE_BYTES):
+        self.folder = folder or default_cache_dir()
+        self.max_bytes = int(max_bytes)
+        os.makedirs(self.folder, exist_ok=True)
+
+    @staticmethod
+    def key(*parts):
+        """
+        Return the cache key for JSON-serializable parts (digests, parameters, ...).
+        """
+        text = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.blake2b(text.encode(), digest_size=20).hexdigest()
+
+    def _path(self, key, extension):
+        return os.path.join(self.folder, key + extension)
+
+    def get(self, key):
+        """
+        Return (read-only memory-mapped array, metadata dict) for 'key', or None on a miss.
+        """
+        path = self._path(key, '.npy')
+        try:
+            array = np.load(path, mmap_mode='r')
+            with open(self._path(key, '.json')) as file:
+                meta = json.load(file)
+            #the modification time is the entry's last use
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return array, meta
+
+    def put(self, key, array, **meta):
+        """
+        Store an array under 'key' with metadata, then evict entries beyond the size bound.
+
+        Returns:
+        - The stored entry as a read-only memory-mapped array.
+        """
+        path = self._path(key, '.npy')
+        temporary = f"{path}.{os.getpid()}.tmp"
+        #write under a temporary name, so a crash or a concurrent reader never sees half a file
+        with open(temporary, 'wb') as file:
+            np.save(file, np.ascontiguousarray(array))
+        with open(self._path(key, '.json'), 'w') as file:
+            json.dump(meta, file)
+        os.replace(temporary, path)
+        self.evict(keep=key)
+        return np.load(path, mmap_mode='r')
+
+    def entries(self):
+        """
+        Return (last use, bytes, key) for every entry, least recently used first.
+        """
+        entries = []
+        for name in os.listdir(self.folder):
+            if not name.endswith('.npy'):
+                continue
+            key = name[:-4]
+            try:
+                stat = os.stat(self._path(key, '.npy'))
+                size = stat.st_size + os.stat(self._path(key, '.json')).st_size
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, size, key))
+        return sorted(entries)
+
+    def size(self):
+        """
+        Return the number of bytes the entries take.
+        """
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        """
+        Remove least recently used entries until the cache fits into max_bytes.
+
+        Parameters:
+        - keep: Key that is never removed (the entry just written).
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self.remove(key)
+            total -= size
+
+    def remove(self, key):
+        for extension in ('.npy', '.json'):
+            try:
+                os.remove(self._path(key, extension))
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        """
+        Remove every entry.
+        """
+        for _, _, key in self.entries():
+            self.remove(key)
+
+
+def cached_load(path, cache, sr=None, mono=True, dtype=None):
+    """
+    Load an audio file through the cache; the file is only decoded on a miss.
+
+    Parameters:
+    - path: Path of the audio file.
+    - cache: AudioCache.
+    - sr, mono, dtype: See loader.load_audio.
+
+    Returns:
+    - (audio, sample_rate, key): audio is a read-only memory-mapped array, key identifies
+      the decoded audio for the caches of later stages.
+    """
+    #the resolved dtype is part of the key, so float32 and float64 decodes never mix
+    dtype = resolve_dtype(dtype)
+    key = cache.key('audio', file_digest(path), sr, mono, np.dtype(dtype).str)
+    entry = cache.get(key)
+    if entry is None:
+        from .loader import load_audio
+
+        audio, rate = load_audio(path, sr=sr, mono=mono, dtype=dtype)
+        return cache.put(key, audio, sample_rate=rate), rate, key
+    audio, meta = entry
+    return audio, meta['sample_rate'], key
+
+
+def cached_run(pipeline, audio, audio_key, cache, out=None, boundaries=None):
+    """
+    Run a Pipeline and keep the output of every stage in the cache.
+
+    A rerun resumes from the output of the longest cached run of leading stages,
+    so only the stages from the first changed one on are executed again. Stages
+    whose output is not reproducible (noise without a seed) and everything after
+    them are neither cached nor looked up. The stages run one after the other
+    here, not fused, because every stage's output is stored.
+
+    Parameters:
+    - pipeline: Pipeline to run.
+    - audio: Input audio (not modified).
+    - audio_key: Cache key of the input, e.g. from cached_load.
+    - cache: AudioCache.
+    - out: Optional array that receives the result.
+    - boundaries: Optional segment boundaries, see Pipeline.run.
+
+    Returns:
+    - NumPy array with the processed audio.
+    """
+    from .pipeline import stage_cacheable
+
+    base = ('stages', audio_key, pipeline.sample_rate, pipeline.segment_length)
+    if boundaries is not None:
+        #adaptive segments change every stage output, so they are part of the key
+        boundaries = np.asarray(boundaries, dtype=np.int64)
+        base += (hashlib.blake2b(boundaries.tobytes(), digest_size=20).hexdigest(),)
+    cacheable = 0
+    while cacheable < len(pipeline.stages) and stage_cacheable(*pipeline.stages[cacheable]):
+        cacheable += 1
+    keys = [cache.key(*base, pipeline.stages[:count]) for count in range(1, cacheable + 1)]
+
+    done, source = 0, audio
+    for count in range(cacheable, 0, -1):
+        entry = cache.get(keys[count - 1])
+        if entry is not None and entry[0].shape == audio.shape:
+            done, source = count, entry[0]
+            break
+
+    result = np.empty_like(audio) if out is None else out
+    result[...] = source
+    for count in range(done + 1, cacheable + 1):
+        pipeline.run(result, out=result, start=count - 1, stop=count, boundaries=boundaries)
+        cache.put(keys[count - 1], result, stage=pipeline.stages[count - 1][0])
+    if max(done, cacheable) < len(pipeline.stages):
+        #the stages after the first non-reproducible one run fused, as without a cache
+        pipeline.run(result, out=result, start=max(done, cacheable), boundaries=boundaries)
+    return result
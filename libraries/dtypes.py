@@ -0,0 +1,66 @@
+import contextlib
+import os
+import numpy as np
+
+#floating point dtypes the policy can select
+SUPPORTED_DTYPES = (np.dtype(np.float32), np.dtype(np.float64))
+
+
+def _check(dtype):
+    dtype = np.dtype(dtype)
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported dtype {dtype}. Choose float32 or float64.")
+    return dtype
+
+
+#float32 halves memory and bandwidth against float64 and is plenty for audio;
+#$VOICE_DTYPE=float64 switches the default for a whole run
+_policy = [_check(os.environ.get('VOICE_DTYPE', 'float32'))]
+
+
+def get_dtype():
+    """
+    Return the dtype new audio buffers (decoded audio, noise, envelopes, outputs) are created with.
+    """
+    return _policy[0]
+
+
+def set_dtype(dtype):
+    """
+    Set the dtype policy ('float32' or 'float64') and return the previous one.
+    """
+    previous = _policy[0]
+    _policy[0] = _check(dtype)
+    return previous
+
+
+@contextlib.contextmanager
+def dtype_policy(dtype):
+    """
+    Context manager that applies a dtype policy to the code inside it.
+
+    Example:
+        with dtype_policy('float64'):
+            audio, sr = load_audio(path)
+    """
+    previous = set_dtype(dtype)
+    try:
+        yield get_dtype()
+    finally:
+        set_dtype(previous)
+
+
+def resolve_dtype(dtype=None):
+    """
+    Return 'dtype' as a NumPy dtype, or the policy dtype when it is None.
+    """
+    return get_dtype() if dtype is None else _check(dtype)
+
+
+def work_dtype(dtype):
+    """
+    Return the dtype to compute with for audio of 'dtype': floating audio keeps its own
+    precision (never widened), anything else (e.g. integer PCM) uses the policy dtype.
+    """
+    dtype = np.dtype(dtype)
+    return dtype if np.issubdtype(dtype, np.floating) else get_dtype()
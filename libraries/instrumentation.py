@@ -0,0 +1,239 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+#callables that receive every stage record; while the list is empty nothing is measured
+_sinks = []
+#per thread stack of open stages, so nested stages can report their own memory peak
+_local = threading.local()
+#True while tracemalloc runs because a sink asked for it (and not because the user started it)
+_owns_tracing = False
+
+
+class JsonLinesSink:
+    """
+    Sink that writes every record as one JSON line.
+
+    Parameters:
+    - target: Path of the file to append to, '-' for stderr, or an open text file.
+    """
+
+    def __init__(self, target):
+        if target == '-':
+            self.file, self.owned = sys.stderr, False
+        elif isinstance(target, (str, os.PathLike)):
+            self.file, self.owned = open(target, 'a'), True
+        else:
+            self.file, self.owned = target, False
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record)
+        #export stages run in threads; keep their lines whole
+        with self._lock:
+            self.file.write(line + '\n')
+            self.file.flush()
+
+    def close(self):
+        if self.owned:
+            self.file.close()
+
+
+def enabled():
+    """
+    Return True if at least one sink receives stage records.
+    """
+    return bool(_sinks)
+
+
+def add_sink(sink, trace_memory=False):
+    """
+    Start sending stage records to 'sink'.
+
+    Parameters:
+    - sink: Callable taking a record (dict), e.g. a JsonLinesSink or a monitoring client.
+    - trace_memory: Also record allocated bytes per stage (starts tracemalloc, which slows Python code down).
+    """
+    global _owns_tracing
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _owns_tracing = True
+    _sinks.append(sink)
+
+
+def remove_sink(sink):
+    """
+    Stop sending stage records to 'sink'. Memory tracing started by add_sink ends with the last sink.
+    """
+    global _owns_tracing
+    if sink in _sinks:
+        _sinks.remove(sink)
+    if not _sinks and _owns_tracing:
+        tracemalloc.stop()
+        _owns_tracing = False
+
+
+class Stage:
+    """
+    Measurement of one stage, created by stage(). Counts can be filled in while the stage runs.
+    """
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.peak = 0
+
+    def update(self, **fields):
+        """
+        Add fields to the record, e.g. segments=... or samples=... once they are known.
+        """
+        self.fields.update(fields)
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        self._tracing = tracemalloc.is_tracing()
+        if self._tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            #the peak counter is shared; fold it into the enclosing stage before resetting it
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self._memory = current
+        stack.append(self)
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        _local.stack.pop()
+        record = {'stage': self.name, 'wall_s': wall, 'cpu_s': cpu, 'pid': os.getpid(), 'time': time.time()}
+        if self._tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            self.peak = max(self.peak, peak)
+            if _local.stack:
+                _local.stack[-1].peak = max(_local.stack[-1].peak, self.peak)
+            record['allocated_bytes'] = self.peak - self._memory
+            record['retained_bytes'] = current - self._memory
+        record.update(self.fields)
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        _emit(record)
+        return False
+
+
+def _emit(record):
+    if record.get('samples') and record['wall_s'] > 0:
+        record['samples_per_s'] = record['samples'] / record['wall_s']
+    for sink in list(_sinks):
+        sink(record)
+
+
+class StageTotals:
+    """
+    Adds up the time of stages that run many times in a loop (e.g. every pipeline
+    stage once per fused chunk) and reports one record per stage when asked.
+
+    Each record holds the summed wall_s and cpu_s, the number of calls and the
+    segments and samples (per channel) of the SegmentTables the stage processed.
+    Memory is not traced per call; the enclosing stage() reports it.
+    """
+
+    def __init__(self):
+        self.totals = {}
+
+    def measure(self, name, kernel):
+        """
+        Return 'kernel' (a callable taking a SegmentTable) wrapped so that its calls count towards 'name'.
+        """
+        entry = self.totals.setdefault(name, dict(wall_s=0.0, cpu_s=0.0, calls=0, segments=0, samples=0))
+
+        def measured(table):
+            cpu = time.process_time()
+            wall = time.perf_counter()
+            try:
+                return kernel(table)
+            finally:
+                entry['wall_s'] += time.perf_counter() - wall
+                entry['cpu_s'] += time.process_time() - cpu
+                entry['calls'] += 1
+                entry['segments'] += len(table)
+                entry['samples'] += int(table.lengths.sum())
+        return measured
+
+    def report(self, **fields):
+        """
+        Send one record per measured stage to the sinks, with the given extra fields.
+        """
+        for name, entry in self.totals.items():
+            record = {'stage': name, 'wall_s': entry['wall_s'], 'cpu_s': entry['cpu_s'], 'pid': os.getpid(),
+                      'time': time.time()}
+            record.update(entry)
+            record.update(fields)
+            _emit(record)
+
+
+class _NullStage:
+    #stand-in for Stage while no sink is registered: no clocks are read, nothing is recorded
+    def update(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name, **fields):
+    """
+    Context manager that measures the code inside it as one pipeline stage.
+
+    The record holds wall_s, cpu_s and the given fields (e.g. segments, samples);
+    samples_per_s is added when 'samples' is known, allocated_bytes and
+    retained_bytes when memory is traced. Without a sink this returns a shared
+    no-op object, so instrumented code costs one list check.
+
+    Code that runs a stage many times (e.g. once per chunk) sums the calls up
+    with StageTotals instead, so every stage still gives one record.
+
+    Parameters:
+    - name: Name of the stage, e.g. 'load', 'reverse' or 'export'.
+    - fields: Extra fields for the record.
+
+    Returns:
+    - Object with an update(**fields) method for counts known only inside the stage.
+    """
+    if not _sinks:
+        return _NULL_STAGE
+    return Stage(name, fields)
+
+
+def timed(name=None):
+    """
+    Decorator form of stage(): every call of the function is recorded as a stage.
+
+    Parameters:
+    - name: Name of the stage (default: the function's name).
+    """
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _sinks:
+                return func(*args, **kwargs)
+            with Stage(stage_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
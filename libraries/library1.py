@@ -1,14 +1,177 @@
 import numpy as np
-import unittest
 
-def segment_audio_list(audio_input, sample_rate, num_segments):
+#samples squared per step when frame energies are computed, so the float64 temporaries stay small
+ENERGY_BLOCK = 1 << 20
+
+
+class SegmentTable:
+    """
+    Compact description of the segments of one audio buffer.
+
+    Instead of holding one NumPy array per segment, the table stores the
+    contiguous audio buffer together with an offset and a length per segment.
+    Segments are only materialized as views when they are accessed, so a
+    multi-hour recording split into 10 ms segments costs two integer arrays
+    rather than hundreds of thousands of Python objects.
+
+    Multichannel audio is a (channels, samples) buffer: offsets and lengths count
+    samples along the last axis and every segment covers all channels.
+
+    Attributes:
+    - buffer: NumPy array holding the audio, (samples,) or (channels, samples). Stages modify it in place.
+    - offsets: int64 array with the first sample of every segment.
+    - lengths: int64 array with the number of samples of every segment.
+    - segment_length: Nominal segment length in samples.
+    - first_index: Global index of the first segment (non-zero when the table
+      only covers a part of a longer recording, e.g. one streaming block).
+    """
+
+    def __init__(self, buffer, offsets, lengths, segment_length, first_index=0):
+        self.buffer = buffer
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.segment_length = int(segment_length)
+        self.first_index = int(first_index)
+
+        #the leading segments that all have the nominal length and follow each
+        #other without gaps can be viewed as one 2-D array
+        expected = np.arange(len(self.offsets), dtype=np.int64) * self.segment_length
+        if len(self.offsets):
+            expected += self.offsets[0]
+        regular = (self.lengths == self.segment_length) & (self.offsets == expected)
+        self.n_rows = len(regular) if regular.all() else int(np.argmin(regular))
+
+    @classmethod
+    def from_duration(cls, audio, sample_rate, segment_duration_ms, first_index=0):
+        """
+        Build a table of fixed-duration segments; the last segment holds the remainder.
+        """
+        segment_length = int(sample_rate * segment_duration_ms / 1000)
+        if segment_length <= 0:
+            raise ValueError("segment_duration_ms is too short for the given sample_rate")
+        return cls.from_length(audio, segment_length, first_index=first_index)
+
+    @classmethod
+    def from_length(cls, audio, segment_length, first_index=0):
+        """
+        Build a table of segments of 'segment_length' samples; the last segment holds the remainder.
+        """
+        buffer = _as_buffer(audio)
+        n_samples = buffer.shape[-1]
+        offsets = np.arange(0, n_samples, segment_length, dtype=np.int64)
+        lengths = np.minimum(segment_length, n_samples - offsets)
+        return cls(buffer, offsets, lengths, segment_length, first_index=first_index)
+
+    @classmethod
+    def from_boundaries(cls, audio, boundaries, first_index=0, segment_length=None):
+        """
+        Build a table from segment boundaries: the start sample of every segment followed by
+        the end of the last one (e.g. [0, 4410, 9700, 13230]), as energy_boundaries returns them.
+        The nominal segment_length defaults to the length of the first segment.
+        """
+        buffer = _as_buffer(audio)
+        boundaries = np.asarray(boundaries, dtype=np.int64)
+        if len(boundaries) < 2:
+            return cls(buffer, np.zeros(0, np.int64), np.zeros(0, np.int64), 0, first_index=first_index)
+        lengths = np.diff(boundaries)
+        if (lengths < 0).any() or boundaries[0] < 0 or boundaries[-1] > buffer.shape[-1]:
+            raise ValueError("boundaries must be increasing sample positions inside the audio.")
+        if segment_length is None:
+            segment_length = lengths[0]
+        return cls(buffer, boundaries[:-1], lengths, int(segment_length), first_index=first_index)
+
+    @classmethod
+    def from_count(cls, audio, num_segments, first_index=0):
+        """
+        Build a table of 'num_segments' equal segments; the last segment absorbs the remainder.
+        """
+        if num_segments <= 0:
+            raise ValueError("num_segments must be greater than 0.")
+        buffer = _as_buffer(audio)
+        segment_length = buffer.shape[-1] // num_segments
+        offsets = np.arange(num_segments, dtype=np.int64) * segment_length
+        lengths = np.full(num_segments, segment_length, dtype=np.int64)
+        lengths[-1] += buffer.shape[-1] % num_segments
+        return cls(buffer, offsets, lengths, segment_length, first_index=first_index)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        #a single segment is a view into the buffer, never a copy
+        start = self.offsets[index]
+        return self.buffer[..., start:start + self.lengths[index]]
+
+    def __iter__(self):
+        for start, length in zip(self.offsets.tolist(), self.lengths.tolist()):
+            yield self.buffer[..., start:start + length]
+
+    @property
+    def channels(self):
+        """
+        Number of channels (1 for a 1-D buffer).
+        """
+        return 1 if self.buffer.ndim == 1 else self.buffer.shape[0]
+
+    @property
+    def rows(self):
+        """
+        Strided view (n_rows, segment_length) over the leading full-length segments,
+        or (channels, n_rows, segment_length) for a multichannel buffer.
+        """
+        start = self.offsets[0] if self.n_rows else 0
+        return self.buffer[..., start:start + self.n_rows * self.segment_length].reshape(
+            self.buffer.shape[:-1] + (self.n_rows, max(self.segment_length, 0)))
+
+    @property
+    def tail_indices(self):
+        """
+        Local indices of the segments that are not covered by 'rows'.
+        """
+        return range(self.n_rows, len(self))
+
+    def is_contiguous(self):
+        """
+        True if the segments tile the buffer in order without gaps or overlaps.
+        """
+        if len(self) == 0:
+            return True
+        return bool(np.array_equal(self.offsets[1:], self.offsets[:-1] + self.lengths[:-1]))
+
+    def span(self):
+        """
+        Return the (start, stop) sample range covered by the table.
+        """
+        if len(self) == 0:
+            return 0, 0
+        return int(self.offsets[0]), int(self.offsets[-1] + self.lengths[-1])
+
+    def to_list(self):
+        """
+        Return the segments as a list of views (for code that needs a real list).
+        """
+        return list(self)
+
+
+def _as_buffer(audio):
+    #only the time axis has to be contiguous for the row views; copying more often
+    #would detach the table from the caller's array and lose in-place updates
+    buffer = np.asarray(audio)
+    if buffer.ndim == 0 or buffer.strides[-1] != buffer.itemsize:
+        buffer = np.ascontiguousarray(buffer)
+    return buffer
+
+
+def segment_audio_list(audio_input, sample_rate, num_segments, as_table=False):
     """
     Segment an audio array into a given number of segments.
     
     Parameters:
-      - audio_input: A NumPy array representing an audio signal, or a list of such arrays.
+      - audio_input: A NumPy array representing an audio signal ((samples,) or (channels, samples)),
+        or a list of such arrays.
       - sample_rate: Sampling rate of the audio (provided for consistency, though not used here).
       - num_segments: Number of segments to split the audio into.
+      - as_table: If True, return a SegmentTable per audio instead of a list of arrays.
     
     Returns:
       - If a single array is provided, returns a list of segmented NumPy arrays.
@@ -25,13 +188,16 @@ def segment_audio_list(audio_input, sample_rate, num_segments):
 
     segmented_audios = []
     for audio in audio_arrays:
-        segment_samples = len(audio) // num_segments
-        segments = [audio[i * segment_samples:(i + 1) * segment_samples] for i in range(num_segments)]
+        if as_table:
+            segmented_audios.append(SegmentTable.from_count(audio, num_segments))
+            continue
+        segment_samples = audio.shape[-1] // num_segments
+        segments = [audio[..., i * segment_samples:(i + 1) * segment_samples] for i in range(num_segments)]
         
         # Append any remaining samples to the last segment if needed.
-        remainder = len(audio) % num_segments
+        remainder = audio.shape[-1] % num_segments
         if remainder:
-            segments[-1] = np.concatenate((segments[-1], audio[num_segments * segment_samples:]))
+            segments[-1] = np.concatenate((segments[-1], audio[..., num_segments * segment_samples:]), axis=-1)
         
         segmented_audios.append(segments)
     
@@ -41,14 +207,16 @@ def segment_audio_list(audio_input, sample_rate, num_segments):
     
     return segmented_audios
 
-def segment_audio_by_duration(audio_input, sample_rate, segment_duration_ms):
+def segment_audio_by_duration(audio_input, sample_rate, segment_duration_ms, as_table=False):
     """
     Segment an audio array into segments of fixed duration.
     
     Parameters:
-      - audio_input: A NumPy array representing an audio signal, or a list of such arrays.
+      - audio_input: A NumPy array representing an audio signal ((samples,) or (channels, samples)),
+        or a list of such arrays.
       - sample_rate: Sampling rate of the audio.
       - segment_duration_ms: Duration of each segment in milliseconds.
+      - as_table: If True, return a SegmentTable per audio instead of a list of arrays.
     
     Returns:
       - If a single array is provided, returns a list of segmented NumPy arrays.
@@ -67,68 +235,124 @@ def segment_audio_by_duration(audio_input, sample_rate, segment_duration_ms):
     
     segmented_audios = []
     for audio in audio_arrays:
+        if as_table:
+            segmented_audios.append(SegmentTable.from_length(audio, segment_length))
+            continue
         # Slice the audio into segments of 'segment_length' samples.
-        segments = [audio[i:i+segment_length] for i in range(0, len(audio), segment_length)]
+        segments = [audio[..., i:i+segment_length] for i in range(0, audio.shape[-1], segment_length)]
         segmented_audios.append(segments)
     
     if len(segmented_audios) == 1:
         return segmented_audios[0]
     return segmented_audios
 
-# ---------------------- Unit Tests ---------------------- #
-class TestSegmentAudioList(unittest.TestCase):
-    def test_segment_audio_list(self):
-        sample_rate = 1000  # 1000 samples per second
-        num_segments = 2   # Split each audio into 2 segments
-        audio1 = np.arange(1000)   # Test signal with values from 0 to 999
-        audio2 = np.arange(1500)   # Test signal with values from 0 to 1499
-        
-        audio_arrays = [audio1, audio2]
-        segmented_audios = segment_audio_list(audio_arrays, sample_rate, num_segments)
+def frame_energy(audio, hop_length, frame_hops=2):
+    """
+    Calculate the mean square energy of overlapping frames in one linear pass.
 
-        # Expected segment lengths.
-        expected_segment_samples1 = len(audio1) // num_segments
-        expected_segment_samples2 = len(audio2) // num_segments
-        
-        self.assertEqual(len(segmented_audios[0][0]), expected_segment_samples1)
-        self.assertEqual(len(segmented_audios[1][0]), expected_segment_samples2)
-        
-        # Check if segmentation preserves original values.
-        self.assertTrue(np.array_equal(segmented_audios[0][0], np.arange(500)))
-        self.assertTrue(np.array_equal(segmented_audios[0][1], np.arange(500, 1000)))
-        self.assertEqual(segmented_audios[1][1][-1], 1499)
-
-class TestSegmentAudioByDuration(unittest.TestCase):
-    def test_exact_division(self):
-        sample_rate = 1000  # 1000 samples per second
-        segment_duration_ms = 250  # Each segment is 250ms (i.e., 250 samples)
-        audio = np.arange(1000)
-        segments = segment_audio_by_duration(audio, sample_rate, segment_duration_ms)
-        
-        # Expecting exactly 4 segments.
-        self.assertEqual(len(segments), 4)
-        for segment in segments:
-            self.assertEqual(len(segment), 250)
-        
-        # Verify that reassembling the segments recovers the original audio.
-        self.assertTrue(np.array_equal(np.concatenate(segments), audio))
-
-    def test_inexact_division(self):
-        sample_rate = 1000  # 1000 samples per second
-        segment_duration_ms = 300  # Each segment is 300ms (i.e., 300 samples)
-        audio = np.arange(1000)
-        segments = segment_audio_by_duration(audio, sample_rate, segment_duration_ms)
-        # Expected segmentation:
-        # Segment 1: samples 0-299 (300 samples)
-        # Segment 2: samples 300-599 (300 samples)
-        # Segment 3: samples 600-899 (300 samples)
-        # Segment 4: samples 900-999 (100 samples)
-        self.assertEqual(len(segments), 4)
-        self.assertEqual(len(segments[0]), 300)
-        self.assertEqual(len(segments[1]), 300)
-        self.assertEqual(len(segments[2]), 300)
-        self.assertEqual(len(segments[3]), 100)
-        self.assertTrue(np.array_equal(np.concatenate(segments), audio))
-
-if __name__ == "__main__":
-    unittest.main()
+    The squares are summed per hop (a reshaped view, block by block, so no
+    squared copy of the audio is ever made), and the frames are differences of
+    the cumulative sum of the hop energies. All channels count together.
+
+    Parameters:
+    - audio: 1-D NumPy array, or a (channels, samples) array.
+    - hop_length: Distance between the starts of two frames in samples.
+    - frame_hops: Frame length in hops (default: 2, i.e. frames overlap by half).
+
+    Returns:
+    - float64 array; value i is the energy of samples [i * hop_length, (i + frame_hops) * hop_length).
+    """
+    if hop_length <= 0 or frame_hops <= 0:
+        raise ValueError("hop_length and frame_hops must be greater than 0.")
+    audio = np.asarray(audio)
+    channels = audio.shape[0] if audio.ndim > 1 else 1
+    n_hops = audio.shape[-1] // hop_length
+    hop_energy = np.empty(n_hops, dtype=np.float64)
+    step = max(ENERGY_BLOCK // (hop_length * channels), 1)
+    for start in range(0, n_hops, step):
+        stop = min(start + step, n_hops)
+        hops = audio[..., start * hop_length:stop * hop_length].reshape(-1, stop - start, hop_length)
+        hop_energy[start:stop] = np.einsum('cij,cij->i', hops, hops, dtype=np.float64)
+    cumulative = np.zeros(n_hops + 1, dtype=np.float64)
+    np.cumsum(hop_energy, out=cumulative[1:])
+    frames = cumulative[frame_hops:] - cumulative[:-frame_hops]
+    frames /= frame_hops * hop_length * channels
+    return frames
+
+def energy_boundaries(audio, sample_rate, min_duration_ms=100, max_duration_ms=1000, frame_ms=20):
+    """
+    Place segment boundaries at low-energy points (pauses, gaps between syllables).
+
+    Every segment lasts between min_duration_ms and max_duration_ms; each cut is
+    made where the energy of a frame_ms frame centred on it is lowest within that
+    range. The frame energies come from one linear pass (frame_energy); every cut
+    then only looks at the frames of its own range, so the search is linear in
+    the length of the audio as well.
+
+    Parameters:
+    - audio: 1-D NumPy array, or a (channels, samples) array.
+    - sample_rate: Sampling rate of the audio (in Hz).
+    - min_duration_ms: Shortest segment (the last one may be shorter if the audio is).
+    - max_duration_ms: Longest segment.
+    - frame_ms: Length of the energy frames; cuts fall on multiples of half a frame.
+
+    Returns:
+    - int64 array with the first sample of every segment followed by the audio's length.
+    """
+    if not (0 < min_duration_ms <= max_duration_ms):
+        raise ValueError("min_duration_ms must be greater than 0 and at most max_duration_ms.")
+    hop = max(int(sample_rate * frame_ms / 2000), 1)
+    n_samples = np.shape(audio)[-1]
+    min_hops = max(int(np.ceil(sample_rate * min_duration_ms / 1000 / hop)), 1)
+    max_hops = max(int(sample_rate * max_duration_ms / 1000) // hop, min_hops)
+    #energy around the cut at hop j: the frame of hops j - 1 and j
+    cut_energy = np.full(n_samples // hop + 1, np.inf)
+    energy = frame_energy(audio, hop, 2)
+    cut_energy[1:len(energy) + 1] = energy
+
+    cuts = [0]
+    position = 0
+    while n_samples - position * hop > max_hops * hop:
+        remaining = n_samples // hop - position
+        #the next cut lies min_hops .. max_hops ahead, and leaves at least min_hops for the final segment
+        last = min(max_hops, remaining - min_hops) if remaining < max_hops + min_hops else max_hops
+        window = cut_energy[position + min_hops:position + max(last, min_hops) + 1]
+        position += min_hops + int(np.argmin(window))
+        cuts.append(position)
+    boundaries = np.array(cuts, dtype=np.int64) * hop
+    return np.append(boundaries, np.int64(n_samples)) if n_samples else np.zeros(1, np.int64)
+
+def segment_audio_by_energy(audio_input, sample_rate, min_duration_ms=100, max_duration_ms=1000, frame_ms=20,
+                            as_table=False):
+    """
+    Segment an audio array at low-energy points, into segments of variable duration.
+
+    Parameters:
+      - audio_input: A NumPy array representing an audio signal ((samples,) or (channels, samples)),
+        or a list of such arrays.
+      - sample_rate: Sampling rate of the audio.
+      - min_duration_ms, max_duration_ms: Range of the segment durations in milliseconds.
+      - frame_ms: Length of the energy frames (see energy_boundaries).
+      - as_table: If True, return a SegmentTable per audio instead of a list of arrays.
+
+    Returns:
+      - If a single array is provided, returns a list of segmented NumPy arrays.
+      - If a list of arrays is provided, returns a list of lists of segmented arrays.
+    """
+    # If a single audio array is provided, wrap it in a list.
+    if isinstance(audio_input, np.ndarray):
+        audio_arrays = [audio_input]
+    else:
+        audio_arrays = audio_input
+
+    segmented_audios = []
+    for audio in audio_arrays:
+        boundaries = energy_boundaries(audio, sample_rate, min_duration_ms, max_duration_ms, frame_ms)
+        if as_table:
+            segmented_audios.append(SegmentTable.from_boundaries(audio, boundaries))
+            continue
+        segmented_audios.append([audio[..., start:stop] for start, stop in zip(boundaries[:-1], boundaries[1:])])
+
+    if len(segmented_audios) == 1:
+        return segmented_audios[0]
+    return segmented_audios
@@ -1,7 +1,20 @@
+import functools
 import re
-import unittest
 import numpy as np
 
+from .library1 import SegmentTable
+
+
+#compiled once at import; the patterns are matched after removing all spaces
+_NUMBER = r'\d+(?:\.\d+)?'
+AFFINE_RE = re.compile(rf'^(?:({_NUMBER})\*?)?([a-zA-Z])(?:([+-]{_NUMBER}))?$')
+STRICT_AFFINE_RE = re.compile(rf'^({_NUMBER})\*([a-zA-Z])([+-]{_NUMBER})$')
+RANGE_RE = re.compile(r'^(\d+)-(\d+)$')
+SLICE_RE = re.compile(r'^(-?\d*):(-?\d*)(?::(-?\d+))?$')
+MODULO_RE = re.compile(r'^[a-zA-Z]%(\d+)(?:==?|in)\{?(\d+(?:,\d+)*)\}?$')
+INDEX_RE = re.compile(r'^\d+$')
+#top-level separators of a union: ',' or '|' outside of {...}
+UNION_RE = re.compile(r'[,|](?![^{]*\})')
 
 
 def pattern_decoder(pattern:str):
@@ -12,20 +25,138 @@ def pattern_decoder(pattern:str):
         pattern (str): should follow this pattern: MULT * var * CONS, where var can be any letter and MULT & CONS can be float or int.
         MULT and CONS are required. use 1 * n + 0 if you mean a pattern which only includes n.
     Raises:
-        Exception: if the pattern does not match the format, an exception will be raised.
+        ValueError: if the pattern does not match the format, an exception will be raised.
 
     Returns:
         Multiplier (float): the multiplier in the pattern
         Constant (float): The constant in the pattern
     """
     pattern = pattern.replace(' ','')
-    if re.match(r'(\d|\d\.\d)(\*)([a-zA-Z])((\+|\-)(\d|(\d.\d)))', pattern):
-        multiplier = float(re.findall(r'(\d|\d\.\d)(\*)([a-zA-Z])((\+|\-)(\d|(\d\.\d)))',pattern)[0][0])
-        constant = float(re.findall(r'(\d|\d\.\d)(\*)([a-zA-Z])((\+|\-)(\d\.\d|\d))',pattern)[0][3])
-    else:
-        raise Exception(f"The pattern: '{pattern}' does not match the following pattern: 'multiplier * n + constant'")
-    
-    return multiplier,constant
+    match = STRICT_AFFINE_RE.match(pattern)
+    if not match:
+        raise ValueError(f"The pattern: '{pattern}' does not match the following pattern: 'multiplier * n + constant'")
+    return float(match.group(1)), float(match.group(3))
+
+
+class Selector:
+    """
+    Compiled segment selector.
+
+    An expression is a union (',' or '|') of terms:
+        k*n+c     every index k*n+c for n = 0, 1, 2, ... (e.g. '2*n+1', '3n', 'n')
+        a-b       the indices a to b, both included (e.g. '0-10')
+        a:b:s     a Python slice over the segment indices (e.g. '::3', '10:', ':-1')
+        n%m==r    indices whose remainder modulo m is r, or one of a set (e.g. 'n%4=={0,1}')
+        i         a single index
+        all       every segment
+
+    Negative slice bounds count from the end of the segments the selector is applied to.
+
+    Parameters:
+        expression (str): the selector expression.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.terms = [self._parse_term(term) for term in UNION_RE.split(expression.replace(' ', '')) if term]
+        if not self.terms:
+            raise ValueError(f"The selector '{expression}' is empty.")
+
+    @staticmethod
+    def _parse_term(term: str):
+        if term.lower() in ('all', '*'):
+            return ('slice', 0, None, 1)
+        match = AFFINE_RE.match(term)
+        if match:
+            multiplier = float(match.group(1)) if match.group(1) else 1.0
+            constant = float(match.group(3)) if match.group(3) else 0.0
+            return ('affine', multiplier, constant)
+        match = RANGE_RE.match(term)
+        if match:
+            return ('range', int(match.group(1)), int(match.group(2)))
+        match = SLICE_RE.match(term)
+        if match:
+            start, stop, step = (int(value) if value else None for value in match.groups())
+            if step == 0:
+                raise ValueError(f"The slice '{term}' has a step of zero.")
+            return ('slice', start, stop, step or 1)
+        match = MODULO_RE.match(term)
+        if match:
+            modulus = int(match.group(1))
+            if modulus == 0:
+                raise ValueError(f"The modulo set '{term}' has a modulus of zero.")
+            return ('modulo', modulus, tuple(int(value) for value in match.group(2).split(',')))
+        if INDEX_RE.match(term):
+            return ('range', int(term), int(term))
+        raise ValueError(f"The selector term '{term}' is not one of: 'k*n+c', 'a-b', 'a:b:s', 'n%m==r', an index or 'all'.")
+
+    def mask(self, count: int, offset: int = 0):
+        """
+        Return a boolean mask over the segments offset .. offset + count - 1 (cached, read-only).
+        """
+        return _selection_mask(self.expression, int(count), int(offset))
+
+    def indices(self, count: int, offset: int = 0):
+        """
+        Return the selected local indices (0 .. count - 1) for the segments offset .. offset + count - 1.
+        """
+        return _selection_indices(self.expression, int(count), int(offset))
+
+    def _compute_mask(self, count, offset):
+        index = np.arange(offset, offset + count, dtype=np.int64)
+        total = offset + count
+        mask = np.zeros(count, dtype=bool)
+        for term in self.terms:
+            kind = term[0]
+            if kind == 'affine':
+                _, multiplier, constant = term
+                if multiplier == 0:
+                    mask |= index == constant
+                elif multiplier.is_integer() and constant.is_integer():
+                    shifted = index - int(constant)
+                    mask |= (shifted >= 0) & (shifted % int(multiplier) == 0)
+                else:
+                    #index = k*n + c must hold for a non-negative integer n
+                    n = (index - constant) / multiplier
+                    mask |= (n > -1e-9) & np.isclose(n, np.round(n))
+            elif kind == 'range':
+                mask |= (index >= term[1]) & (index <= term[2])
+            elif kind == 'modulo':
+                mask |= np.isin(index % term[1], term[2])
+            else:
+                start, stop, step = slice(term[1], term[2], term[3]).indices(total)
+                if step > 0:
+                    mask |= (index >= start) & (index < stop) & ((index - start) % step == 0)
+                else:
+                    selected = np.arange(start, stop, step)
+                    selected = selected[selected >= offset] - offset
+                    mask[selected] = True
+        return mask
+
+
+@functools.lru_cache(maxsize=256)
+def compile_selector(expression: str):
+    """
+    Compile a selector expression (see Selector), cached per expression.
+
+    Returns:
+        Selector: the compiled selector.
+    """
+    return Selector(expression)
+
+
+@functools.lru_cache(maxsize=1024)
+def _selection_mask(expression, count, offset):
+    mask = compile_selector(expression)._compute_mask(count, offset)
+    mask.setflags(write=False)
+    return mask
+
+
+@functools.lru_cache(maxsize=1024)
+def _selection_indices(expression, count, offset):
+    indices = np.flatnonzero(_selection_mask(expression, count, offset))
+    indices.setflags(write=False)
+    return indices
 
 
 def reverse_segments(segments_list: list,pattern: str = '2 * n + 0'):
@@ -34,49 +165,35 @@ def reverse_segments(segments_list: list,pattern: str = '2 * n + 0'):
     Reverses the segments whose index follows the pattern.
     
     Parameters:
-        segments_list (list): list of the segments/audios. if only one audio is to be reversed, pass it in a list
-        pattern (str): the pattern which is used to select the segments. Should follow this pattern: 'MULT * var * CONS', where 'var' can be any letter and 'MULT' & 'CONS' can be float or int. 'MULT and CONS' are required. 
+        segments_list (list | SegmentTable): list of the segments/audios. if only one audio is to be reversed, pass it in a list.
+            A SegmentTable is reversed in place inside its buffer. Multichannel segments ((channels, samples))
+            are reversed along time, all channels together.
+        pattern (str): the selector used to pick the segments, e.g. '2 * n + 0' (every even segment), '0-10', '::3',
+            'n%4=={0,1}' or a union such as '2*n+1, 0-4'. See Selector for the full syntax.
         Use 1 * n + 0 if you mean a pattern which includes all the segments.
 
     Returns:
-        segments_list (list): the list of segments.
+        segments_list (list | SegmentTable): the list of segments, or the same table.
     """
-    try:
-        multiplier, constant = pattern_decoder(pattern)
-        i = 0
-        while multiplier * i + constant < len(segments_list):
-            segments_list[i] = segments_list[i][::-1]
-            i += 1
-        return segments_list
-    except Exception as e:
-        raise e
-        
-        
-class TestReverseSegments(unittest.TestCase):
-    
-    def setUp(self):
-        self.segment1 = np.array([1,2,3])
-        self.segment2 = np.array([4,5,6])
-        self.segment3 = np.array([7,8,9])
-        self.segments = [self.segment1, self.segment2, self.segment3]
-        
-    def test_reverse_segments1(self):
-        reversed_segments = reverse_segments(self.segments, 44100, '1*n+0')
-        true_reverses = [np.array([3,2,1]), np.array([6,5,4]), np.array([9,8,7])]
-        self.assertEqual(reversed_segments[0].all(),true_reverses[0].all())
-        self.assertEqual(reversed_segments[1].all(),true_reverses[1].all())
-        self.assertEqual(reversed_segments[2].all(),true_reverses[2].all())
-        
-        # Test the function with a different pattern.
-    def test_reverse_segments2(self):
-        reversed_segments = reverse_segments(self.segments, 44100, '2*n+0')
-        true_reverses = [np.array([3,2,1]), np.array([4,5,6]), np.array([9,8,7])]
-        self.assertEqual(reversed_segments[0].all(),true_reverses[0].all())
-        self.assertEqual(reversed_segments[1].all(),true_reverses[1].all())
-        self.assertEqual(reversed_segments[2].all(),true_reverses[2].all())
-        
-        
-    
-        
-if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+    selector = compile_selector(pattern)
+    if isinstance(segments_list, SegmentTable):
+        return _reverse_table(segments_list, selector)
+    for i in selector.indices(len(segments_list)):
+        segments_list[i] = segments_list[i][..., ::-1]
+    return segments_list
+
+
+def _reverse_table(table, selector):
+    """
+    Reverse the selected segments of a SegmentTable in place.
+    """
+    indices = selector.indices(len(table), table.first_index)
+    rows = table.rows
+    selected = indices[indices < table.n_rows]
+    if len(selected):
+        #one gather/scatter over the row view reverses every selected row of every channel
+        rows[..., selected, :] = rows[..., selected, ::-1]
+    for i in indices[len(selected):]:
+        seg = table[i]
+        seg[...] = seg[..., ::-1]
+    return table
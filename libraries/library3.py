@@ -1,6 +1,8 @@
 import numpy as np
-import librosa
-import scipy.signal
+
+from .dtypes import work_dtype
+from .library1 import SegmentTable
+from .noise_bank import NoiseBank, check_noise_type
 
 
 def calculate_rms(signal):
@@ -13,66 +15,135 @@ def calculate_rms(signal):
     Returns:
     - RMS value of the signal.
     """
+    #librosa is heavy to import, so it is only loaded when an RMS is actually needed
+    import librosa
+
     #librosa.feature.rms returns an array with shape (1, frames)
     rms = librosa.feature.rms(y=signal)
     #compute the mean RMS over all frames
     return np.mean(rms)
 
-def generate_noise(length, sample_rate, noise_type='white'):
+def segment_rms(frames):
+    """
+    Calculate the RMS of every segment in a batch with one vectorized reduction.
+
+    Parameters:
+    - frames: NumPy array whose last axis holds the samples of each segment
+      (e.g. a (segments, samples) view).
+
+    Returns:
+    - NumPy array with one RMS value per segment (float64).
+    """
+    frames = np.asarray(frames)
+    length = max(frames.shape[-1], 1)
+    #einsum computes the sum of squares without allocating a squared copy
+    return np.sqrt(np.einsum('...i,...i->...', frames, frames, dtype=np.float64) / length)
+
+def generate_noise(length, sample_rate, noise_type='white', shaping='fir', channels=None, dtype=None, out=None,
+                   seed=None):
     """
     Generate a noise array of a given length and type.
 
     Parameters:
     - length: Length of the noise array.
     - sample_rate: Sampling rate of the audio (in Hz).
-    - noise_type: Type of noise to generate ('white', 'pink').
+    - noise_type: Type of noise to generate ('white', 'pink'; with shaping='fft' also 'brown', 'blue').
+    - shaping: 'fir' filters white noise with a cached FIR kernel, 'fft' shapes its spectrum.
+    - channels: Number of channels; None gives 1-D noise, a number (channels, length) with
+      independent noise per channel.
+    - dtype: float32 or float64 (default: the dtype policy, see dtypes.set_dtype).
+    - out: Optional array of the result's shape to write the noise into.
+    - seed: Optional seed (int or numpy SeedSequence); the same seed gives the same noise.
+      By default numpy's global random state is used.
 
     Returns:
     - NumPy array containing the generated noise.
     """
-    if noise_type == 'white':
-        #random samples from a normal distribution
-        noise = np.random.normal(0, 1, length)
-    elif noise_type == 'pink':
-        #generate pink noise by filtering white noise
-        white_noise = np.random.normal(0, 1, length)
-
-        #apply a 1/f filter to white noise to approximate pink noise
-       
-        b = scipy.signal.firwin(
-            numtaps=101,
-            cutoff=[0.01, 0.5],
-            window='hann',  
-            pass_zero=False,
-            fs=sample_rate
-        )
-        pink_noise = scipy.signal.lfilter(b, [1.0], white_noise)
-        noise = pink_noise
+    batch_out = None if out is None else out.reshape(channels or 1, length)
+    noise = generate_noise_batch(channels or 1, length, sample_rate, noise_type=noise_type, shaping=shaping,
+                                 dtype=dtype, out=batch_out, seed=seed)
+    if out is not None:
+        return out
+    return noise if channels else noise[0]
+
+def generate_noise_batch(count, length, sample_rate, noise_type='white', shaping='fir', dtype=None, out=None,
+                         seed=None):
+    """
+    Generate 'count' noise segments of a given length in one call.
+
+    Parameters:
+    - count: Number of noise segments.
+    - length: Length of each noise segment.
+    - sample_rate: Sampling rate of the audio (in Hz).
+    - noise_type: Type of noise to generate ('white', 'pink'; with shaping='fft' also 'brown', 'blue').
+    - shaping: 'fir' or 'fft', see generate_noise.
+    - dtype: float32 or float64 (default: the dtype policy, or the dtype of 'out').
+    - out: Optional (count, length) array to write the noise into.
+    - seed: Optional seed; row i is then the noise of segment i of a seeded NoiseBank.
+
+    Returns:
+    - NumPy array of shape (count, length); every row has zero mean and unit variance.
+    """
+    if dtype is None and out is not None:
+        dtype = work_dtype(out.dtype)
+    noise_bank = NoiseBank(sample_rate, noise_type, shaping, dtype=dtype, seed=seed)
+    if seed is not None:
+        noise = noise_bank.segments(np.arange(count), length)
     else:
-        raise ValueError("Unsupported noise type. Choose 'white' or 'pink'.")
+        #one stream for all segments, sliced into rows
+        noise = noise_bank.take(count, length)
+    if out is None:
+        return noise
+    out[...] = noise
+    return out
+
+def _scaled_noise(frames, noise_bank, noise_level, out=None, indices=None, grouped=True):
+    """
+    Return noise rows whose RMS matches the RMS of 'frames' times noise_level.
 
-    #normalize noise to have zero mean and unit variance
-    noise = (noise - np.mean(noise)) / (np.std(noise) + 1e-6)
-    return noise[:length]  #ensure that the noise array has the correct length
+    'frames' may have any number of leading axes (channels, segments); every row along
+    the last axis gets its own noise, scaled to its own RMS. With 'out' (which may be
+    'frames' itself) the scaled noise is written there instead of a new array. A seeded
+    bank draws the noise of the global segment 'indices' (see NoiseBank.segments).
+    """
+    original_rms = segment_rms(frames)
+    if noise_bank.seed is not None and indices is not None:
+        channels = original_rms.size // max(len(indices), 1)
+        noise = noise_bank.segments(indices, frames.shape[-1], channels, grouped=grouped).reshape(frames.shape)
+    else:
+        noise = noise_bank.take(original_rms.size, frames.shape[-1]).reshape(frames.shape)
+    #the noise rows already have unit RMS, so one broadcast scales them all
+    scale = (original_rms * noise_level).astype(noise.dtype)[..., None]
+    return np.multiply(noise, scale, out=noise if out is None else out)
 
-def manipulate_segments(segmented_audios, method, sample_rate, noise_type='white', noise_level=0.5):
+def manipulate_segments(segmented_audios, method, sample_rate, noise_type='white', noise_level=0.5,
+                        shaping='fir', noise_bank=None, seed=None):
     """
     Manipulate audio segments based on the specified method.
 
     Parameters:
-    - segmented_audios: List of NumPy arrays representing audio segments.
+    - segmented_audios: List of NumPy arrays representing audio segments, or a SegmentTable
+      (manipulated in place inside its buffer). Multichannel segments are (channels, samples)
+      arrays; noise is independent per channel and matches each channel's RMS.
     - method: Method to manipulate segments ('mute' or 'noise').
     - sample_rate: Sampling rate of the audio (in Hz). Must be a positive number.
     - noise_type: Type of noise to add ('white', 'pink'); used only if method is 'noise'.
     - noise_level: Amplitude scaling factor for the noise (default: 0.5); used only if method is 'noise'.
+    - shaping: 'fir' or 'fft' noise shaping (see generate_noise); 'fft' also offers 'brown' and 'blue'.
+    - noise_bank: Optional NoiseBank to draw from, e.g. one bank shared by all blocks of a job.
+      By default a new bank is created for the call.
+    - seed: Optional seed (int or numpy SeedSequence) for the noise of a new bank; with a seed the
+      noise of every segment only depends on the seed and the segment's index.
 
     Returns:
-    - List of audio segments with specified manipulation applied to segments with even indices.
+    - List of audio segments with specified manipulation applied to segments with even indices,
+      or the same SegmentTable when a table was passed.
     """
     #validate input types
-    if not isinstance(segmented_audios, list):
+    is_table = isinstance(segmented_audios, SegmentTable)
+    if not is_table and not isinstance(segmented_audios, list):
         raise TypeError("segmented_audios must be a list of NumPy arrays.")
-    if any(not isinstance(seg, np.ndarray) for seg in segmented_audios):
+    if not is_table and any(not isinstance(seg, np.ndarray) for seg in segmented_audios):
         raise TypeError("Each item in segmented_audios must be a NumPy array.")
     if not isinstance(sample_rate, (int, float)):
         raise TypeError("sample_rate must be an integer or float.")
@@ -80,29 +151,66 @@ def manipulate_segments(segmented_audios, method, sample_rate, noise_type='white
         raise ValueError("sample_rate must be a positive number.")  # Added validation
     if method not in ['mute', 'noise']:
         raise ValueError("method must be either 'mute' or 'noise'.")
-
-    manipulated_segments = []
-
-    for i, seg in enumerate(segmented_audios):
-        if i % 2 == 0:  #manipulate segments with even indices
-            if method == 'mute':
-                #mute the segment by replacing it with zeros
-                manipulated_seg = np.zeros_like(seg)
-            elif method == 'noise':
-                #generate noise segment
-                noise_seg = generate_noise(len(seg), sample_rate, noise_type=noise_type)
-
-                #calculate RMS values using librosa
-                original_rms = calculate_rms(seg)
-                noise_rms = calculate_rms(noise_seg) + 1e-6  #prevent division by zero
-
-                #scale noise to match the RMS of the original segment, adjusted by noise_level
-                scaled_noise = (noise_seg / noise_rms) * original_rms * noise_level
-
-                manipulated_seg = scaled_noise
-            manipulated_segments.append(manipulated_seg)
+    if method == 'noise' and noise_bank is None:
+        check_noise_type(noise_type, shaping)
+        #draw the noise in the precision of the audio, so it is never cast afterwards;
+        #integer segments get the policy dtype
+        if is_table:
+            dtype = work_dtype(segmented_audios.buffer.dtype)
         else:
-            #leave the segment unchanged
-            manipulated_segments.append(seg)
-
-    return manipulated_segments
\ No newline at end of file
+            dtype = work_dtype(segmented_audios[0].dtype) if segmented_audios else None
+        noise_bank = NoiseBank(sample_rate, noise_type, shaping, dtype=dtype, seed=seed)
+
+    if is_table:
+        return _manipulate_table(segmented_audios, method, noise_bank, noise_level)
+
+    manipulated_segments = list(segmented_audios)
+
+    #group the segments with even indices by shape and dtype, so every group
+    #is handled by a few array operations instead of one pass per segment
+    groups = {}
+    for i in range(0, len(segmented_audios), 2):
+        seg = segmented_audios[i]
+        groups.setdefault((seg.shape, seg.dtype), []).append(i)
+
+    nominal = segmented_audios[0].shape[-1] if segmented_audios else 0
+    for (shape, dtype), indices in groups.items():
+        if method == 'mute':
+            #mute the segments by replacing them with rows of one zero block
+            manipulated = np.zeros((len(indices),) + shape, dtype=dtype)
+        elif method == 'noise':
+            #(segments, channels, samples) frames are handled as (channels, segments, samples), like table rows
+            frames = np.moveaxis(np.stack([segmented_audios[i] for i in indices]), 0, -2)
+            manipulated = _scaled_noise(frames, noise_bank, noise_level, indices=indices,
+                                        grouped=shape[-1] == nominal)
+            manipulated = np.moveaxis(manipulated, -2, 0)
+            manipulated = manipulated.astype(work_dtype(dtype), copy=False)
+        for row, i in zip(manipulated, indices):
+            manipulated_segments[i] = row
+
+    return manipulated_segments
+
+
+def _manipulate_table(table, method, noise_bank, noise_level):
+    """
+    Apply the manipulation to the even segments of a SegmentTable, in place.
+    """
+    rows = table.rows
+    #segments with even indices; first_index keeps the parity global
+    start = table.first_index % 2
+    tails = [i for i in table.tail_indices if (table.first_index + i) % 2 == 0]
+    if method == 'mute':
+        rows[..., start::2, :] = 0
+        for i in tails:
+            table[i][...] = 0
+        return table
+
+    selected = rows[..., start::2, :]
+    if selected.size:
+        indices = table.first_index + np.arange(start, table.n_rows, 2)
+        _scaled_noise(selected, noise_bank, noise_level, out=selected, indices=indices)
+    for i in tails:
+        seg = table[i]
+        _scaled_noise(seg, noise_bank, noise_level, out=seg, indices=[table.first_index + i],
+                      grouped=bool(table.lengths[i] == table.segment_length))
+    return table
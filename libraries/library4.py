@@ -1,38 +1,140 @@
 import os
+import shutil
+import subprocess
+import time
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import soundfile as sf
 
-def save_audio(audio, sr, output_folder, output_name="output", output_format="wav", bitrate="192k"):
-    """Saves the processed audio in different formats with optional settings."""
+# Samples handed to an encoder per write call
+EXPORT_CHUNK_SIZE = 65536
+
+# Formats that are encoded from the shared clipped int16 buffer
+INT16_FORMATS = ("wav", "flac", "mp3")
+
+# Result of one export target
+ExportResult = namedtuple("ExportResult", ["format", "path", "bitrate", "ok", "error", "bytes", "seconds"])
+
+def to_int16(audio, chunk_size=EXPORT_CHUNK_SIZE, out=None):
+    """Converts float audio in [-1, 1] to int16 with clipping, chunk by chunk to keep the temporary small.
+
+    The result is written into 'out' (an int16 array of the audio's shape) when given."""
+    audio_int16 = np.empty(audio.shape, dtype=np.int16) if out is None else out
+    if audio_int16.shape != audio.shape or audio_int16.dtype != np.int16:
+        raise ValueError("out must be an int16 array with the shape of the audio.")
+    n_samples = audio.shape[-1]
+    scratch = np.empty(audio.shape[:-1] + (min(chunk_size, n_samples),), dtype=np.float32)
+    for start in range(0, n_samples, chunk_size):
+        chunk = audio[..., start:start + chunk_size]
+        tmp = scratch[..., :chunk.shape[-1]]
+        np.multiply(chunk, 32767, out=tmp, casting='unsafe')
+        np.clip(tmp, -32768, 32767, out=tmp)
+        np.rint(tmp, out=tmp)
+        audio_int16[..., start:start + chunk.shape[-1]] = tmp
+    return audio_int16
+
+def _channels(audio):
+    # (samples,) is mono, (channels, samples) multichannel
+    return 1 if audio.ndim == 1 else audio.shape[0]
+
+def _write_soundfile(path, audio, sr, output_format, chunk_size, compression_level=None, bitrate_mode=None):
+    import soundfile as sf
+
+    # Stream the samples to the encoder in chunks instead of handing over one big array
+    subtype = "PCM_16" if audio.dtype == np.int16 and output_format in ("wav", "flac") else None
+    with sf.SoundFile(path, "w", samplerate=sr, channels=_channels(audio), format=output_format.upper(),
+                      subtype=subtype, compression_level=compression_level, bitrate_mode=bitrate_mode) as out:
+        for start in range(0, audio.shape[-1], chunk_size):
+            # soundfile takes (frames, channels); the transposed chunk is interleaved on the way in
+            out.write(audio[..., start:start + chunk_size].T)
+
+def _write_mp3(path, audio_int16, sr, bitrate, chunk_size):
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        # libsndfile's own MP3 encoder: map the bitrate onto its 0 (320k) - 1 (32k) compression scale
+        kbps = float(str(bitrate).lower().rstrip("k"))
+        level = min(max((320 - kbps) / (320 - 32), 0.0), 1.0)
+        _write_soundfile(path, audio_int16, sr, "mp3", chunk_size, compression_level=level, bitrate_mode="CONSTANT")
+        return
+    # ffmpeg reads raw PCM from a pipe and writes the MP3 file itself
+    command = [ffmpeg, "-y", "-loglevel", "error", "-f", "s16le", "-ar", str(sr), "-ac", str(_channels(audio_int16)),
+               "-i", "pipe:0", "-b:a", str(bitrate), path]
+    with subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE) as process:
+        try:
+            for start in range(0, audio_int16.shape[-1], chunk_size):
+                # raw PCM is interleaved frame by frame
+                process.stdin.write(np.ascontiguousarray(audio_int16[..., start:start + chunk_size].T).tobytes())
+        finally:
+            process.stdin.close()
+        error = process.stderr.read()
+    if process.returncode:
+        raise RuntimeError(f"ffmpeg failed: {error.decode(errors='replace').strip()}")
+
+def _export_one(audio, audio_int16, sr, path, output_format, bitrate, chunk_size):
+    started = time.perf_counter()
     try:
-        # Ensure output folder exists
-        os.makedirs(output_folder, exist_ok=True)
-
-        # Define output file path with the desired format
-        output_file = os.path.join(output_folder, f"{output_name}.{output_format}")
-
-        if output_format.lower() == "mp3":
-            # Use Pydub to export as MP3 with bitrate.
-            from pydub import AudioSegment
-
-            # Convert float audio (range [-1, 1]) to int16 (range [-32768, 32767])
-            audio_int16 = np.int16(audio * 32767)
-
-            # Create an AudioSegment instance.
-            # Adjust channels if needed (here, it's set to 1 for mono).
-            audio_segment = AudioSegment(
-                audio_int16.tobytes(),
-                frame_rate=sr,
-                sample_width=audio_int16.dtype.itemsize,
-                channels=1
-            )
-
-            # Export the audio segment as an MP3 with the specified bitrate.
-            audio_segment.export(output_file, format="mp3", bitrate=bitrate)
+        if output_format == "mp3":
+            _write_mp3(path, audio_int16(), sr, bitrate, chunk_size)
+        elif output_format in INT16_FORMATS:
+            _write_soundfile(path, audio_int16(), sr, output_format, chunk_size)
         else:
-            # For non-MP3 formats (like WAV), use soundfile.
-            sf.write(output_file, audio, sr, format=output_format.upper())
-
-        print(f"Audio saved: {output_file}")
+            _write_soundfile(path, audio, sr, output_format, chunk_size)
+        return ExportResult(output_format, path, bitrate, True, None, os.path.getsize(path),
+                            time.perf_counter() - started)
     except Exception as e:
-        print(f"Error saving audio: {e}")
+        return ExportResult(output_format, path, bitrate, False, str(e), 0, time.perf_counter() - started)
+
+def _parse_target(target):
+    # "mp3", "mp3:320k" or ("mp3", "320k")
+    if isinstance(target, str):
+        output_format, _, bitrate = target.partition(":")
+    else:
+        output_format, bitrate = target
+    output_format = output_format.lower()
+    return output_format, (bitrate or "192k") if output_format == "mp3" else None
+
+def export_audio(audio, sr, output_folder, output_name="output", targets=("wav", "flac", "mp3"),
+                 max_workers=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Exports one audio buffer to several formats concurrently.
+
+    Parameters:
+    - audio: NumPy array with float audio in [-1, 1], (samples,) or (channels, samples).
+    - sr: Sampling rate of the audio.
+    - output_folder: Folder for the output files (created if needed).
+    - output_name: File name without extension.
+    - targets: Formats to write, as "mp3", "mp3:320k" or ("mp3", "320k"); the bitrate only applies to MP3.
+    - max_workers: Encoder threads (default: one per target).
+    - chunk_size: Samples handed to an encoder per write call.
+
+    Returns:
+    - List of ExportResult(format, path, bitrate, ok, error, bytes, seconds), in the order of targets.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    targets = [_parse_target(target) for target in targets]
+
+    # The clipped int16 conversion is done once, by the first encoder that needs it
+    lock = threading.Lock()
+    shared = {}
+    def audio_int16():
+        with lock:
+            if "int16" not in shared:
+                shared["int16"] = to_int16(audio, chunk_size)
+            return shared["int16"]
+
+    with ThreadPoolExecutor(max_workers=max_workers or max(len(targets), 1)) as pool:
+        futures = [pool.submit(_export_one, audio, audio_int16, sr,
+                               os.path.join(output_folder, f"{output_name}.{output_format}"),
+                               output_format, bitrate, chunk_size)
+                   for output_format, bitrate in targets]
+        return [future.result() for future in futures]
+
+def save_audio(audio, sr, output_folder, output_name="output", output_format="wav", bitrate="192k"):
+    """Saves the processed audio in different formats with optional settings."""
+    result = export_audio(audio, sr, output_folder, output_name, targets=[(output_format, bitrate)])[0]
+    if result.ok:
+        print(f"Audio saved: {result.path}")
+    else:
+        print(f"Error saving audio: {result.error}")
+    return result
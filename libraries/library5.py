@@ -1,31 +1,113 @@
+import functools
 import numpy as np
 
-def smooth_audio_list(audio_arrays, sample_rate, fade_percentage=15):
+from .dtypes import resolve_dtype, work_dtype
+from .library1 import SegmentTable
+
+#available fade curve shapes
+FADE_CURVES = ('linear', 'equal_power', 'raised_cosine')
+
+def fade_envelopes(length, fade_percentage=15, curve='linear', dtype=None):
+    """
+    Return the fade-in and fade-out envelopes for a segment length, cached.
+
+    Almost every segment of a job has the same length, so the ramps are built
+    once and reused instead of allocating two new arrays per segment.
+
+    Parameters:
+    - length: Length of the segment in samples.
+    - fade_percentage: Percentage of the segment covered by each fade (0 - 50).
+    - curve: Shape of the fades: 'linear', 'equal_power' (sine/cosine) or 'raised_cosine'.
+    - dtype: float32 or float64 envelopes (default: the dtype policy); use the audio's dtype,
+      so applying a fade never mixes precisions.
+
+    Returns:
+    - (fade_in, fade_out): read-only NumPy arrays with int(length * fade_percentage / 100) samples.
+    """
+    #the policy is resolved before the cache lookup, so changing it never returns stale envelopes
+    return _fade_envelopes(length, fade_percentage, curve, resolve_dtype(dtype))
+
+@functools.lru_cache(maxsize=256)
+def _fade_envelopes(length, fade_percentage, curve, dtype):
+    if not (0 <= fade_percentage <= 50): # checks to see if the fade_percentage is withing desired bounds.
+        raise ValueError("The fade_percentage must be between 0 and 50.")
+    if curve not in FADE_CURVES:
+        raise ValueError(f"Unsupported fade curve. Choose one of {', '.join(FADE_CURVES)}.")
+
+    fade_samples = int(length * (fade_percentage / 100))
+    ramp = np.linspace(0.0, 1.0, fade_samples)
+    if curve == 'linear':
+        fade_in = ramp
+        fade_out = np.linspace(1.0, 0.0, fade_samples)
+    else:
+        if curve == 'equal_power':
+            fade_in = np.sin(ramp * (np.pi / 2))
+        else:
+            fade_in = 0.5 - 0.5 * np.cos(ramp * np.pi)
+        fade_out = fade_in[::-1].copy()
+    #the curves are computed in float64 and rounded once
+    fade_in = fade_in.astype(dtype, copy=False)
+    fade_out = fade_out.astype(dtype, copy=False)
+
+    #cached arrays are shared by every caller, so they must never be modified
+    fade_in.setflags(write=False)
+    fade_out.setflags(write=False)
+    return fade_in, fade_out
+
+def smooth_audio_list(audio_arrays, sample_rate, fade_percentage=15, curve='linear'):
     """
     Apply fade-in and fade-out smoothing to a list of audio arrays.
 
     Parameters:
-    - audio_arrays: List of NumPy arrays representing audio signals.
+    - audio_arrays: List of NumPy arrays representing audio signals ((samples,) or (channels, samples)),
+      or a SegmentTable (smoothed in place inside its buffer). The fades run along the last axis.
     - sample_rate: Sampling rate of the audio.
     - fade_percentage: Percentage of the audio duration to apply fade in/out (default: 15%).
+    - curve: Shape of the fades: 'linear' (default), 'equal_power' or 'raised_cosine'.
 
     Returns:
-    - List of smoothed audio arrays.
+    - List of smoothed audio arrays, or the same SegmentTable when a table was passed.
     """
     if not (0 <= fade_percentage <= 50): # checks to see if the fade_percentage is withing desired bounds.
         raise ValueError("The fade_percentage must be between 0 and 50.")
+    if curve not in FADE_CURVES:
+        raise ValueError(f"Unsupported fade curve. Choose one of {', '.join(FADE_CURVES)}.")
+
+    if isinstance(audio_arrays, SegmentTable):
+        return _smooth_table(audio_arrays, fade_percentage, curve)
 
-    fade_percentage /= 100  # Convert to fraction
     smoothed_audios = []
 
     for audio in audio_arrays:
-        fade_samples = int(len(audio) * fade_percentage)
-        fade_in = np.linspace(0.0, 1.0, fade_samples) #used for fade-in
-        fade_out = np.linspace(1.0, 0.0, fade_samples) #used for fade-out
-
-        audio[:fade_samples] *= fade_in #applies fade-in
-        audio[-fade_samples:] *= fade_out #applies fade-out
-
+        _apply_fades(audio, *fade_envelopes(audio.shape[-1], fade_percentage, curve, work_dtype(audio.dtype)))
         smoothed_audios.append(audio)
 
     return smoothed_audios
+
+
+def _apply_fades(audio, fade_in, fade_out):
+    """
+    Multiply the first and last samples along the last axis by the envelopes, in place.
+    """
+    fade_samples = len(fade_in)
+    if fade_samples == 0:
+        #audio[..., -0:] would cover the whole segment
+        return
+    audio[..., :fade_samples] *= fade_in #applies fade-in
+    audio[..., -fade_samples:] *= fade_out #applies fade-out
+
+
+def _smooth_table(table, fade_percentage, curve):
+    """
+    Apply the fades to every segment of a SegmentTable, in place.
+    """
+    rows = table.rows
+    dtype = work_dtype(table.buffer.dtype)
+    if len(rows):
+        #one pair of envelopes for all full-length segments, broadcast over the 2-D view
+        _apply_fades(rows, *fade_envelopes(table.segment_length, fade_percentage, curve, dtype))
+
+    for i in table.tail_indices:
+        audio = table[i]
+        _apply_fades(audio, *fade_envelopes(audio.shape[-1], fade_percentage, curve, dtype))
+    return table
@@ -1,13 +1,155 @@
+import struct
 import numpy as np
 
-def concatenate_segments(segments):
+from .dtypes import SUPPORTED_DTYPES, get_dtype
+from .library1 import SegmentTable
+
+
+class SegmentAssembler:
+    """
+    Output buffer that is allocated once and filled with segments at known offsets.
+
+    Stages write their segments straight into the output, so the segments and a
+    concatenated copy never have to exist at the same time. The buffer lives in
+    RAM, or in a file through np.memmap: a '.wav' path gives a 32-bit float WAV
+    file whose sample data is the buffer, any other path gives a '.npy' file.
+
+    Parameters:
+    - length: Total number of samples of the output (per channel).
+    - dtype: NumPy dtype of the output (default: the dtype policy, see dtypes.set_dtype).
+    - path: Optional file to back the buffer with.
+    - sample_rate: Sampling rate written to the header of a '.wav' file.
+    - out: Optional existing array to fill instead of allocating one.
+    - channels: None for a 1-D output, or the number of channels of a (channels, length) output.
+    """
+
+    def __init__(self, length, dtype=None, path=None, sample_rate=44100, out=None, channels=None):
+        self.length = int(length)
+        self.dtype = get_dtype() if dtype is None else np.dtype(dtype)
+        self.path = path
+        self.cursor = 0
+        shape = (self.length,) if channels is None else (channels, self.length)
+        if out is not None:
+            if out.shape[-1] != self.length:
+                raise ValueError(f"out has {out.shape[-1]} samples but the output needs {self.length}.")
+            self.output = out
+        elif path is None:
+            self.output = np.empty(shape, dtype=self.dtype)
+        elif str(path).lower().endswith('.wav'):
+            if self.dtype != np.float32:
+                raise ValueError("A WAV backed assembler stores float32 samples.")
+            header = _float_wav_header(self.length, sample_rate, channels or 1)
+            with open(path, 'wb') as file:
+                file.write(header)
+                file.truncate(len(header) + self.length * (channels or 1) * self.dtype.itemsize)
+            #WAV files interleave the channels, so the (channels, length) output is a transposed view
+            frames = np.memmap(path, dtype='<f4', mode='r+', offset=len(header), shape=shape[::-1])
+            self._memmap = frames
+            self.output = frames.T
+        else:
+            self.output = np.lib.format.open_memmap(path, mode='w+', dtype=self.dtype, shape=shape)
+
+    def write(self, offset, segment):
+        """
+        Copy a segment into the output at a sample offset and move the cursor behind it.
+        """
+        end = offset + segment.shape[-1]
+        if offset < 0 or end > self.length:
+            raise ValueError(f"Segment [{offset}, {end}) does not fit into an output of {self.length} samples.")
+        self.output[..., offset:end] = segment
+        self.cursor = end
+
+    def append(self, segment):
+        """
+        Copy a segment into the output right after the previous one.
+        """
+        self.write(self.cursor, segment)
+
+    def write_table(self, table, offset=None):
+        """
+        Copy all segments of a SegmentTable into the output, starting at 'offset' (default: the cursor).
+        """
+        offset = self.cursor if offset is None else offset
+        if table.is_contiguous():
+            #the segments tile their buffer, so one copy moves them all
+            start, stop = table.span()
+            self.write(offset, table.buffer[..., start:stop])
+        else:
+            for segment in table:
+                self.write(offset, segment)
+                offset += segment.shape[-1]
+
+    @property
+    def result(self):
+        return self.output
+
+    def flush(self):
+        """
+        Write a file backed buffer to disk.
+        """
+        memmap = getattr(self, '_memmap', self.output)
+        if isinstance(memmap, np.memmap):
+            memmap.flush()
+
+
+def _float_wav_header(length, sample_rate, channels=1):
+    #RIFF header of a 32-bit IEEE float WAV file with 'length' frames of 'channels' samples
+    data_bytes = length * channels * 4
+    fmt = struct.pack('<HHIIHH', 3, channels, sample_rate, sample_rate * channels * 4, channels * 4, 32)
+    fact = struct.pack('<I', length)
+    riff_bytes = 4 + (8 + len(fmt)) + (8 + len(fact)) + 8 + data_bytes
+    #the RIFF sizes are 32-bit, so a plain WAV file holds at most 4 GiB
+    if riff_bytes > 0xFFFFFFFF:
+        raise ValueError(f"{length} frames of {channels} float32 samples do not fit into a WAV file (4 GiB at most); "
+                         "back the assembler with a '.npy' file instead.")
+    return (b'RIFF' + struct.pack('<I', riff_bytes) + b'WAVE'
+            + b'fmt ' + struct.pack('<I', len(fmt)) + fmt
+            + b'fact' + struct.pack('<I', len(fact)) + fact
+            + b'data' + struct.pack('<I', data_bytes))
+
+
+def _output_dtype(segments):
+    #floating segments keep a precision they all share; mixed precisions get the dtype policy,
+    #not whichever precision happens to come first
+    dtypes = {segment.dtype for segment in segments}
+    if dtypes and all(np.issubdtype(dtype, np.floating) for dtype in dtypes):
+        return dtypes.pop() if len(dtypes) == 1 and dtypes <= set(SUPPORTED_DTYPES) else get_dtype()
+    return np.result_type(*dtypes) if dtypes else get_dtype()
+
+
+def concatenate_segments(segments, dtype=None, out=None):
     """
     Concatenate a list of audio segments into a single audio array.
 
     Parameters:
-    - segments: List of NumPy arrays representing audio segments.
+    - segments: List of NumPy arrays representing audio segments, or a SegmentTable.
+      Multichannel segments ((channels, samples)) are joined along time.
+    - dtype: dtype of the result. By default the segments' dtype when they all share float32 or
+      float64, the dtype policy (see dtypes.set_dtype) for mixed float precisions (no silent upcast
+      to float64), otherwise the common dtype.
+    - out: Optional preallocated array or SegmentAssembler to write the result into.
 
     Returns:
-    - A single concatenated NumPy array.
+    - A single concatenated NumPy array. For a SegmentTable whose segments tile its
+      buffer, this is a view of the buffer and nothing is copied.
     """
-    return np.concatenate(segments)
\ No newline at end of file
+    if isinstance(segments, SegmentTable):
+        if out is None and segments.is_contiguous() and (dtype is None or segments.buffer.dtype == dtype):
+            start, stop = segments.span()
+            return segments.buffer[..., start:stop]
+        total = int(segments.lengths.sum())
+        dtype = dtype or segments.buffer.dtype
+        channels = segments.channels if segments.buffer.ndim > 1 else None
+    else:
+        total = sum(segment.shape[-1] for segment in segments)
+        dtype = dtype or _output_dtype(segments)
+        channels = segments[0].shape[0] if segments and segments[0].ndim > 1 else None
+
+    assembler = out if isinstance(out, SegmentAssembler) else SegmentAssembler(total, dtype, out=out,
+                                                                                 channels=channels)
+    if isinstance(segments, SegmentTable):
+        assembler.write_table(segments)
+    else:
+        for segment in segments:
+            assembler.append(segment)
+    return assembler.result
@@ -0,0 +1,262 @@
+import struct
+import numpy as np
+
+from .dtypes import resolve_dtype
+
+#samples converted per step when a memory-mapped WAV is turned into floats
+LOAD_BLOCKSIZE = 1 << 18
+
+#PCM sample layouts that can be mapped directly: (format tag, bits) -> (dtype, offset, scale)
+#float value = (sample - offset) / scale, the same scaling soundfile uses
+WAV_LAYOUTS = {
+    (1, 8): (np.dtype('u1'), 128.0, 128.0),
+    (1, 16): (np.dtype('<i2'), 0.0, 32768.0),
+    (1, 32): (np.dtype('<i4'), 0.0, 2147483648.0),
+    (3, 32): (np.dtype('<f4'), 0.0, 1.0),
+    (3, 64): (np.dtype('<f8'), 0.0, 1.0),
+}
+
+
+def parse_wav_header(path):
+    """
+    Read the chunk layout of a RIFF/WAVE file without touching the sample data.
+
+    Parameters:
+    - path: Path of the WAV file.
+
+    Returns:
+    - Dictionary with format_tag, channels, sample_rate, bits, data_offset and data_bytes,
+      or None if the file is not a WAV file.
+    """
+    with open(path, 'rb') as file:
+        riff = file.read(12)
+        if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+            return None
+        header = {}
+        while True:
+            chunk = file.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, size = chunk[:4], struct.unpack('<I', chunk[4:])[0]
+            if chunk_id == b'fmt ':
+                fmt = file.read(size)
+                format_tag, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', fmt[:16])
+                if format_tag == 0xFFFE and len(fmt) >= 26:
+                    #WAVE_FORMAT_EXTENSIBLE: the real format tag starts the sub-format GUID
+                    format_tag = struct.unpack('<H', fmt[24:26])[0]
+                header.update(format_tag=format_tag, channels=channels, sample_rate=sample_rate, bits=bits)
+                if size % 2:
+                    file.seek(1, 1)
+            elif chunk_id == b'data':
+                if 'format_tag' not in header:
+                    return None
+                header.update(data_offset=file.tell(), data_bytes=size)
+                return header
+            else:
+                #chunks are padded to an even size
+                file.seek(size + size % 2, 1)
+
+
+class WavMap:
+    """
+    Zero-copy view of the PCM samples of a WAV file through numpy.memmap.
+
+    Nothing is decoded up front; samples are converted to floats per block when requested.
+
+    Parameters:
+    - path: Path of a PCM (8/16/32-bit integer) or IEEE float (32/64-bit) WAV file.
+
+    Raises:
+    - ValueError: if the file is not a WAV file with a directly mappable sample layout.
+    """
+
+    def __init__(self, path):
+        header = parse_wav_header(path)
+        if header is None:
+            raise ValueError(f"{path} is not a WAV file.")
+        layout = WAV_LAYOUTS.get((header['format_tag'], header['bits']))
+        if layout is None:
+            raise ValueError(f"{path} uses a sample layout that cannot be memory-mapped.")
+        self.path = path
+        self.sample_rate = header['sample_rate']
+        self.channels = header['channels']
+        dtype, self._offset, self._scale = layout
+        #truncated files announce more data than they hold
+        file_bytes = _file_size(path) - header['data_offset']
+        frames = min(header['data_bytes'], file_bytes) // (dtype.itemsize * self.channels)
+        self.frames = np.memmap(path, dtype=dtype, mode='r', offset=header['data_offset'],
+                                shape=(frames, self.channels)) if frames else np.zeros((0, self.channels), dtype)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def read(self, start=0, stop=None, mono=True, out=None, dtype=None):
+        """
+        Convert the frames start .. stop - 1 to floats of 'dtype' (default: the dtype policy).
+
+        Returns:
+        - Array of shape (frames,) when mono is True (channels are averaged), else (channels, frames).
+        """
+        frames = self.frames[start:stop]
+        dtype = resolve_dtype(dtype)
+        if mono:
+            source = frames[:, 0] if self.channels == 1 else frames.mean(axis=1, dtype=np.float64)
+            if out is None:
+                out = np.empty(len(frames), dtype=dtype)
+        else:
+            source = frames.T
+            if out is None:
+                out = np.empty((self.channels, len(frames)), dtype=dtype)
+        #the only copy: mapped samples straight into the float output
+        out[...] = source
+        if self._offset:
+            out -= self._offset
+        if self._scale != 1.0:
+            out *= 1.0 / self._scale
+        return out
+
+    def blocks(self, blocksize=LOAD_BLOCKSIZE, mono=True, dtype=None):
+        """
+        Yield the audio as float blocks, converting each block only when it is reached.
+        """
+        for start in range(0, len(self), blocksize):
+            yield self.read(start, start + blocksize, mono=mono, dtype=dtype)
+
+
+class LazyAudio:
+    """
+    Read-only float view of a WavMap that converts only the samples that are sliced.
+
+    It has the shape, ndim and dtype of the array load_audio would return, and
+    audio[..., start:stop] converts just those frames, so Pipeline.run can take it
+    chunk by chunk. Anything else that needs a real array gets the whole file
+    converted through np.asarray(audio).
+
+    Parameters:
+    - wav: WavMap of the file.
+    - mono: Average the channels into one if True.
+    - dtype: Floating point dtype of the samples (default: the dtype policy).
+    """
+
+    def __init__(self, wav, mono=True, dtype=None):
+        self.wav = wav
+        self.mono = mono
+        self.dtype = resolve_dtype(dtype)
+        self.shape = (len(wav),) if mono else (wav.channels, len(wav))
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple) and len(index) == 2 and index[0] is Ellipsis:
+            index = index[1]
+        if not isinstance(index, slice) or index.step not in (None, 1):
+            raise TypeError("LazyAudio only supports [..., start:stop] slices; use np.asarray for anything else.")
+        start, stop, _ = index.indices(len(self.wav))
+        return self.wav.read(start, max(start, stop), mono=self.mono, dtype=self.dtype)
+
+    def __array__(self, dtype=None, copy=None):
+        audio = self[..., :]
+        return audio if dtype is None else audio.astype(dtype, copy=False)
+
+
+def _file_size(path):
+    with open(path, 'rb') as file:
+        return file.seek(0, 2)
+
+
+def open_wav(path):
+    """
+    Return a WavMap for 'path', or None if the file cannot be memory-mapped.
+    """
+    try:
+        return WavMap(path)
+    except (ValueError, OSError, struct.error):
+        return None
+
+
+def load_audio(path, sr=None, mono=True, dtype=None, lazy=False):
+    """
+    Load an audio file as floats, decoding as little as possible.
+
+    PCM WAV files are read through a memory map and converted block by block into
+    the output array. The whole file is converted by default, because most callers
+    need a real array (energy_boundaries, parallel_process, the cache, the encoders)
+    and the pipeline then processes that one array in place. With lazy=True a WAV
+    at its own rate is returned as a LazyAudio instead, which Pipeline.run converts
+    chunk by chunk straight into its output.
+
+    Other formats are decoded by soundfile directly. librosa (and its resampler) is
+    only used when a sample rate different from the file's own rate is requested,
+    or when soundfile cannot read the file.
+
+    Parameters:
+    - path: Path of the audio file.
+    - sr: Target sampling rate; None keeps the file's rate (no resampling).
+    - mono: Average the channels into one (like librosa.load) if True.
+    - dtype: Floating point dtype of the result (default: the dtype policy, float32 unless changed).
+    - lazy: Return a LazyAudio for memory-mappable WAV files (other files are still decoded whole).
+
+    Returns:
+    - (audio, sample_rate): audio has shape (samples,) if mono, else (channels, samples).
+    """
+    dtype = resolve_dtype(dtype)
+    wav = open_wav(path)
+    native_rate = wav.sample_rate if wav is not None else _native_rate(path)
+    if native_rate is None or (sr is not None and sr != native_rate):
+        import librosa
+        audio, rate = librosa.load(path, sr=sr, mono=mono, dtype=dtype)
+        return audio, rate
+
+    if wav is not None and lazy:
+        return LazyAudio(wav, mono=mono, dtype=dtype), native_rate
+    if wav is not None:
+        shape = (len(wav),) if mono else (wav.channels, len(wav))
+        audio = np.empty(shape, dtype=dtype)
+        for start in range(0, len(wav), LOAD_BLOCKSIZE):
+            stop = min(start + LOAD_BLOCKSIZE, len(wav))
+            wav.read(start, stop, mono=mono, out=audio[..., start:stop])
+        return audio, native_rate
+
+    import soundfile as sf
+
+    data, rate = sf.read(path, dtype=dtype, always_2d=True)
+    if mono:
+        return (data[:, 0].copy() if data.shape[1] == 1 else data.mean(axis=1, dtype=dtype)), rate
+    return np.ascontiguousarray(data.T), rate
+
+
+def _native_rate(path):
+    import soundfile as sf
+
+    try:
+        return sf.info(path).samplerate
+    except Exception:
+        return None
+
+
+def load_blocks(path, blocksize=LOAD_BLOCKSIZE, mono=True, dtype=None):
+    """
+    Yield an audio file as float blocks (default: the dtype policy) without loading it whole.
+
+    Returns:
+    - (sample_rate, generator of blocks)
+    """
+    dtype = resolve_dtype(dtype)
+    wav = open_wav(path)
+    if wav is not None:
+        return wav.sample_rate, wav.blocks(blocksize, mono=mono, dtype=dtype)
+
+    import soundfile as sf
+
+    def decoded_blocks():
+        for block in sf.blocks(path, blocksize=blocksize, dtype=dtype, always_2d=True):
+            if mono:
+                yield block[:, 0] if block.shape[1] == 1 else block.mean(axis=1, dtype=dtype)
+            else:
+                yield np.ascontiguousarray(block.T)
+    return sf.info(path).samplerate, decoded_blocks()
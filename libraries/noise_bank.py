@@ -0,0 +1,364 @@
+import functools
+import json
+import os
+import numpy as np
+
+from .dtypes import resolve_dtype
+
+#scipy is imported inside the functions that use it: importing it costs more than
+#the rest of the package together, and white noise never needs it
+
+#noise types available for each shaping mode
+NOISE_TYPES = {
+    'fir': ('white', 'pink'),
+    'fft': ('white', 'pink', 'brown', 'blue'),
+}
+
+#power spectral density ~ 1/f**exponent
+SPECTRAL_EXPONENTS = {'white': 0.0, 'pink': 1.0, 'brown': 2.0, 'blue': -1.0}
+
+#normal samples drawn per call from a legacy RandomState, so a float32 stream never needs a float64 copy of itself
+DRAW_CHUNK = 1 << 16
+
+#segments that share one spawned stream in a seeded bank: enough that setting a stream up
+#costs little next to drawing it, few enough that a chunk edge wastes little noise
+NOISE_GROUP = 64
+
+#spawn keys of the streams of a seeded bank (below the job seed)
+GROUP_STREAMS, SEGMENT_STREAMS, SEQUENTIAL_STREAM = 0, 1, 2
+
+
+def check_noise_type(noise_type, shaping='fir'):
+    """
+    Raise a ValueError if the noise type is not available for the shaping mode.
+
+    Parameters:
+    - noise_type: Type of noise ('white', 'pink', and for shaping='fft' also 'brown', 'blue').
+    - shaping: 'fir' (FIR filtered white noise) or 'fft' (spectral shaping).
+    """
+    if shaping not in NOISE_TYPES:
+        raise ValueError("Unsupported noise shaping. Choose 'fir' or 'fft'.")
+    if noise_type not in NOISE_TYPES[shaping]:
+        choices = "', '".join(NOISE_TYPES[shaping])
+        raise ValueError(f"Unsupported noise type. Choose '{choices}'.")
+
+
+@functools.lru_cache(maxsize=32)
+def fir_kernel(sample_rate, noise_type):
+    """
+    Return the FIR coefficients used to colour white noise, cached per (sample_rate, noise_type).
+
+    Parameters:
+    - sample_rate: Sampling rate of the audio (in Hz).
+    - noise_type: 'white' or 'pink'.
+
+    Returns:
+    - Read-only NumPy array with the filter taps, or None for white noise.
+    """
+    check_noise_type(noise_type, 'fir')
+    if noise_type == 'white':
+        return None
+    import scipy.signal
+
+    #apply a 1/f filter to white noise to approximate pink noise
+    b = scipy.signal.firwin(
+        numtaps=101,
+        cutoff=[0.01, 0.5],
+        window='hann',
+        pass_zero=False,
+        fs=sample_rate
+    )
+    b.setflags(write=False)
+    return b
+
+
+def seed_sequence(seed=None):
+    """
+    Return 'seed' (int, sequence of ints, SeedSequence, or None for fresh entropy) as a SeedSequence.
+    """
+    return seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+
+
+def spawn_rng(seed, *key):
+    """
+    Return the Generator of the child stream 'key' of a job seed.
+
+    The result is the same as descending through SeedSequence.spawn (child key[0],
+    then its child key[1], ...), but any child is reached in O(1), so workers and
+    blocks derive the stream of any segment without sharing state.
+    """
+    seed = seed_sequence(seed)
+    return np.random.default_rng(np.random.SeedSequence(
+        seed.entropy, spawn_key=tuple(seed.spawn_key) + key, pool_size=seed.pool_size))
+
+
+def normalize_rows(noise):
+    """
+    Give every row of a 2-D noise array zero mean and unit variance, in place, and return it.
+    """
+    #the statistics accumulate in float64 even for float32 noise
+    noise -= noise.mean(axis=-1, keepdims=True, dtype=np.float64).astype(noise.dtype)
+    #einsum sums the squares without the float64 copy of the rows that std() makes
+    std = np.sqrt(np.einsum('ij,ij->i', noise, noise, dtype=np.float64) / max(noise.shape[-1], 1))
+    noise /= (std + 1e-6).astype(noise.dtype)[:, None]
+    return noise
+
+
+def _meta_path(path):
+    return os.path.splitext(path)[0] + '.json'
+
+
+def precompute_noise(path, sample_rate, noise_type='white', shaping='fir', seconds=60, seed=0, dtype=None):
+    """
+    Write a pool of noise to a '.npy' file, for NoiseBank(pool=path) to memory-map.
+
+    Seeded banks with a pool slice every segment's noise out of it instead of
+    generating (and filtering) it, and every worker process shares the pages of
+    the file. The settings are stored in a '.json' file next to it.
+
+    Parameters:
+    - path: Path of the '.npy' file.
+    - sample_rate, noise_type, shaping: Noise settings (see NoiseBank).
+    - seconds: Length of the pool; segments must be shorter than it.
+    - seed: Seed of the pool's noise.
+    - dtype: float32 or float64 (default: the dtype policy).
+
+    Returns:
+    - The pool as a read-only memory-mapped array.
+    """
+    length = int(sample_rate * seconds)
+    if length <= 0:
+        raise ValueError("seconds is too short for the given sample_rate.")
+    bank = NoiseBank(sample_rate, noise_type, shaping, seed=seed, dtype=dtype)
+    noise = normalize_rows(bank.draw(length)[None])[0]
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    #write both files under temporary names, so a concurrent reader or a crash never leaves half a file
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'wb') as file:
+        np.save(file, noise)
+    meta_path = _meta_path(path)
+    meta_temporary = f"{meta_path}.{os.getpid()}.tmp"
+    with open(meta_temporary, 'w') as file:
+        json.dump(dict(sample_rate=sample_rate, noise_type=noise_type, shaping=shaping, seed=seed), file)
+    os.replace(meta_temporary, meta_path)
+    os.replace(temporary, path)
+    return np.load(path, mmap_mode='r')
+
+
+def load_noise_pool(path):
+    """
+    Memory-map a pool written by precompute_noise.
+
+    Returns:
+    - (read-only array, settings dict); the dict is empty if the '.json' file is missing.
+    """
+    pool = np.load(path, mmap_mode='r')
+    try:
+        with open(_meta_path(path)) as file:
+            meta = json.load(file)
+    except FileNotFoundError:
+        meta = {}
+    return pool, meta
+
+
+def standard_normal(rng, length, dtype=None):
+    """
+    Draw 'length' standard normal samples of 'dtype' (default: the dtype policy).
+
+    numpy Generators draw float32 directly. The legacy global state only produces
+    float64, so it is drawn in chunks into the output; the samples are the same
+    as from one large draw.
+    """
+    dtype = resolve_dtype(dtype)
+    if isinstance(rng, np.random.Generator):
+        return rng.standard_normal(length, dtype=dtype)
+    if dtype == np.float64:
+        return rng.standard_normal(length)
+    out = np.empty(length, dtype=dtype)
+    for start in range(0, length, DRAW_CHUNK):
+        stop = min(start + DRAW_CHUNK, length)
+        out[start:stop] = rng.standard_normal(stop - start)
+    return out
+
+
+def spectral_noise(length, sample_rate, noise_type='pink', rng=None, dtype=None):
+    """
+    Generate coloured noise over a whole signal by shaping the spectrum of white noise.
+
+    The amplitude spectrum is multiplied by f**(-exponent/2), which gives a true
+    1/f power spectrum for pink noise (1/f**2 for brown, f for blue) in O(n log n).
+
+    Parameters:
+    - length: Number of samples.
+    - sample_rate: Sampling rate of the audio (in Hz).
+    - noise_type: 'white', 'pink', 'brown' or 'blue'.
+    - rng: Object with a standard_normal(size) method (default: numpy's global state).
+    - dtype: float32 or float64 (default: the dtype policy); the FFTs run in this precision.
+
+    Returns:
+    - NumPy array of 'length' samples with zero mean and unit variance.
+    """
+    check_noise_type(noise_type, 'fft')
+    import scipy.fft
+
+    rng = np.random if rng is None else rng
+    dtype = resolve_dtype(dtype)
+    #an FFT-friendly size avoids slow prime-length transforms; the excess is cut off
+    n_fft = scipy.fft.next_fast_len(max(length, 1), real=True)
+    spectrum = scipy.fft.rfft(standard_normal(rng, n_fft, dtype))
+    exponent = SPECTRAL_EXPONENTS[noise_type]
+    if exponent:
+        freqs = scipy.fft.rfftfreq(n_fft, d=1.0 / sample_rate)
+        freqs[0] = freqs[1] if len(freqs) > 1 else 1.0
+        spectrum *= (freqs ** (-exponent / 2)).astype(dtype)
+        spectrum[0] = 0
+    noise = scipy.fft.irfft(spectrum, n=n_fft)[:length]
+    noise -= noise.mean()
+    noise /= noise.std() + 1e-6
+    return noise
+
+
+class NoiseBank:
+    """
+    Noise source for one job.
+
+    Noise is produced as one long stream and sliced per segment, so the FIR
+    kernel is designed once and filtering runs over the whole stream in a single
+    call. With shaping='fir' consecutive draws continue the same filtered stream
+    (the filter state is carried over), which lets streaming jobs share a bank
+    across blocks.
+
+    A seeded bank (seed or pool given) also serves segments(): the noise of a
+    segment then only depends on the seed and the segment's global index, not on
+    the order of the calls, the chunk, block or worker it is processed in. Groups
+    of NOISE_GROUP segments share a stream spawned from the seed, so workers
+    generate their noise concurrently without any shared state.
+
+    Parameters:
+    - sample_rate: Sampling rate of the audio (in Hz).
+    - noise_type: Type of noise (see NOISE_TYPES).
+    - shaping: 'fir' (FIR filtered white noise) or 'fft' (spectral shaping).
+    - rng: Object with a standard_normal(size) method (default: numpy's global state).
+    - dtype: float32 or float64 noise (default: the dtype policy).
+    - seed: Job seed (int or SeedSequence) for segments() and, unless rng is given, draw().
+    - pool: Precomputed noise (the path of a precompute_noise file, or a 1-D array) that
+      segments() slices instead of generating noise; without a seed a fresh one is used.
+    """
+
+    def __init__(self, sample_rate, noise_type='white', shaping='fir', rng=None, dtype=None, seed=None, pool=None):
+        check_noise_type(noise_type, shaping)
+        self.sample_rate = sample_rate
+        self.noise_type = noise_type
+        self.shaping = shaping
+        self.seed = None if seed is None and pool is None else seed_sequence(seed)
+        if rng is None and self.seed is not None:
+            rng = spawn_rng(self.seed, SEQUENTIAL_STREAM)
+        self.rng = np.random if rng is None else rng
+        self.dtype = resolve_dtype(dtype)
+        kernel = fir_kernel(sample_rate, noise_type) if shaping == 'fir' else None
+        #taps, filter state and samples share one dtype, so lfilter does not widen the stream
+        self._kernel = None if kernel is None else kernel.astype(self.dtype)
+        self._zi = None
+        self.pool = None if pool is None else self._load_pool(pool)
+        #the last group drawn, which the next chunk usually starts in
+        self._group = (None, None)
+
+    def _load_pool(self, pool):
+        if not isinstance(pool, np.ndarray):
+            pool, meta = load_noise_pool(pool)
+            settings = dict(sample_rate=self.sample_rate, noise_type=self.noise_type, shaping=self.shaping)
+            for name, value in settings.items():
+                if name in meta and meta[name] != value:
+                    raise ValueError(f"The noise pool was made with {name}={meta[name]!r}, not {value!r}.")
+        if pool.ndim != 1:
+            raise ValueError("The noise pool must be a 1-D array.")
+        return pool
+
+    def draw(self, length):
+        """
+        Return the next 'length' samples of the job's noise stream (not normalized).
+        """
+        if self.shaping == 'fft':
+            return spectral_noise(length, self.sample_rate, self.noise_type, rng=self.rng, dtype=self.dtype)
+        noise = standard_normal(self.rng, length, self.dtype)
+        if self._kernel is None:
+            return noise
+        import scipy.signal
+
+        if self._zi is None:
+            self._zi = np.zeros(len(self._kernel) - 1, dtype=self.dtype)
+        noise, self._zi = scipy.signal.lfilter(self._kernel, np.ones(1, dtype=self.dtype), noise, zi=self._zi)
+        return noise
+
+    def take(self, count, length):
+        """
+        Slice 'count' segments of 'length' samples out of the stream.
+
+        Returns:
+        - NumPy array of shape (count, length); every row has zero mean and unit variance.
+        """
+        return normalize_rows(self.draw(count * length).reshape(count, length))
+
+    def segments(self, indices, length, channels=1, grouped=True):
+        """
+        Return the noise of the segments with the global 'indices' (seeded banks only).
+
+        Parameters:
+        - indices: Global segment indices.
+        - length: Samples per segment.
+        - channels: Independent noise rows per segment.
+        - grouped: True for segments of the nominal segment length, whose groups of
+          NOISE_GROUP share a stream; False for any other length (e.g. the last segment),
+          which gets a stream of its own.
+
+        Returns:
+        - NumPy array of shape (channels * len(indices), length), channel by channel; every
+          row has zero mean and unit variance.
+        """
+        if self.seed is None:
+            raise ValueError("segments() needs a NoiseBank with a seed or a pool.")
+        indices = np.asarray(indices, dtype=np.int64)
+        noise = np.empty((channels, len(indices), length), dtype=self.dtype)
+        if grouped:
+            groups = indices // NOISE_GROUP
+            order = np.argsort(groups, kind='stable')
+            starts = np.flatnonzero(np.diff(groups[order], prepend=-1))
+            for run in np.split(order, starts[1:]) if len(order) else []:
+                block = self._group_block(int(groups[run[0]]), length, channels)
+                noise[:, run] = block[:, indices[run] % NOISE_GROUP]
+        else:
+            for k, index in enumerate(indices.tolist()):
+                noise[:, k] = self._block(spawn_rng(self.seed, SEGMENT_STREAMS, index), channels, 1, length)[:, 0]
+        return normalize_rows(noise.reshape(-1, length))
+
+    def _group_block(self, group, length, channels):
+        key = (group, length, channels)
+        if self._group[0] != key:
+            self._group = key, self._block(spawn_rng(self.seed, GROUP_STREAMS, group), channels, NOISE_GROUP, length)
+        return self._group[1]
+
+    def _block(self, rng, channels, count, length):
+        """
+        Return (channels, count, length) noise from a fresh stream 'rng' (not normalized).
+        """
+        if self.pool is not None:
+            if length > len(self.pool):
+                raise ValueError(f"Segments of {length} samples are longer than the noise pool.")
+            #every row is a slice of the pool at its own offset
+            offsets = rng.integers(0, len(self.pool) - length + 1, size=(channels, count))
+            return self.pool[offsets[..., None] + np.arange(length)].astype(self.dtype, copy=False)
+        if self.shaping == 'fft':
+            noise = np.stack([spectral_noise(count * length, self.sample_rate, self.noise_type, rng=rng,
+                                             dtype=self.dtype) for _ in range(channels)])
+            return noise.reshape(channels, count, length)
+        if self._kernel is None:
+            return rng.standard_normal((channels, count, length), dtype=self.dtype)
+        import scipy.signal
+
+        #the filter starts empty, so it runs over len(taps) - 1 extra samples before the kept ones
+        warm_up = len(self._kernel) - 1
+        noise = rng.standard_normal((channels, warm_up + count * length), dtype=self.dtype)
+        noise = scipy.signal.lfilter(self._kernel, np.ones(1, dtype=self.dtype), noise, axis=-1)
+        return noise[:, warm_up:].reshape(channels, count, length)
@@ -0,0 +1,147 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+
+from .dtypes import resolve_dtype
+from .library1 import SegmentTable
+from .noise_bank import check_noise_type, seed_sequence
+from .streaming import run_kernels
+
+#shards per worker; more shards than workers keeps the pool busy when shards finish unevenly
+SHARDS_PER_WORKER = 4
+#below this many segments per worker the pool start-up costs more than it saves
+MIN_SEGMENTS_PER_WORKER = 256
+
+
+class SharedAudio:
+    """
+    Audio buffer in shared memory that worker processes attach to by name.
+
+    Parameters:
+    - length: Number of samples (per channel).
+    - dtype: NumPy dtype of the samples (default: the dtype policy).
+    - name: Name of an existing block to attach to; None creates a new block.
+    - channels: None for a 1-D buffer, or the number of channels of a (channels, length) buffer.
+
+    Use it as a context manager: the creating process unlinks the block on exit.
+    """
+
+    def __init__(self, length, dtype=None, name=None, channels=None):
+        self.length = int(length)
+        self.dtype = resolve_dtype() if dtype is None else np.dtype(dtype)
+        self.channels = channels
+        self.owner = name is None
+        shape = (self.length,) if channels is None else (channels, self.length)
+        nbytes = max(int(np.prod(shape)) * self.dtype.itemsize, 1)
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=nbytes if self.owner else 0)
+        self.array = np.ndarray(shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        #the array must be released before the mapping can be closed
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _process_shard(job):
+    """
+    Worker: attach to the shared buffer and process one contiguous range of segments in place.
+    """
+    name, length, channels, dtype, start, stop, first_index, segment_length, seed, settings = job
+    shared = SharedAudio(length, dtype, name=name, channels=channels)
+    try:
+        table = SegmentTable.from_length(shared.array[..., start:stop], segment_length, first_index=first_index)
+        run_kernels(table, seed=seed, **settings)
+        del table
+    finally:
+        shared.close()
+    return stop - start
+
+
+def parallel_process(audio, sample_rate, segment_duration_ms, method, workers=None, out=None, **settings):
+    """
+    Process an audio with a pool of worker processes that share one memory buffer.
+
+    The audio is copied once into a shared memory block, which is also the output
+    buffer. The segment range is split into contiguous shards. Workers attach to
+    the block by name, so no array is pickled, and process their shard in place.
+
+    Parameters:
+    - audio: 1-D or (channels, samples) NumPy array (or a SharedAudio, which is then processed in
+      place without the initial copy).
+    - sample_rate: Sampling rate of the audio.
+    - segment_duration_ms: Duration of each segment in milliseconds.
+    - method: 'mute', 'noise', 'reverse' or None (fades only).
+    - workers: Number of worker processes (default: os.cpu_count()).
+    - out: Optional array to receive the result (default: a new array).
+    - settings: pattern, noise_type, noise_level, shaping, fade_percentage, curve, seed, noise_pool
+      (see process_blocks). With a seed the output does not depend on the number of workers.
+
+    Returns:
+    - NumPy array with the processed audio.
+    """
+    segment_length = int(sample_rate * segment_duration_ms / 1000)
+    if segment_length <= 0:
+        raise ValueError("segment_duration_ms is too short for the given sample_rate")
+    if not settings.get('stages') and method not in ['mute', 'noise', 'reverse', None]:
+        raise ValueError("method must be 'mute', 'noise', 'reverse' or None.")
+    if method == 'noise':
+        check_noise_type(settings.get('noise_type', 'white'), settings.get('shaping', 'fir'))
+
+    workers = workers or os.cpu_count() or 1
+    if isinstance(audio, SharedAudio):
+        length, channels = audio.length, audio.channels
+    else:
+        length, channels = audio.shape[-1], (audio.shape[0] if audio.ndim > 1 else None)
+    n_segments = -(-length // segment_length)
+    workers = max(min(workers, n_segments // MIN_SEGMENTS_PER_WORKER), 1)
+
+    if workers == 1 and not isinstance(audio, SharedAudio):
+        #not worth a pool: run the same kernels in this process
+        #(an interleaved out, e.g. a multichannel WAV assembler, has no row views, so it gets the result copied)
+        interleaved = out is not None and out.strides[-1] != out.itemsize
+        result = np.empty_like(audio) if out is None or interleaved else out
+        result[...] = audio
+        run_kernels(SegmentTable.from_length(result, segment_length), sample_rate, method, **settings)
+        if interleaved:
+            out[...] = result
+            return out
+        return result
+
+    #contiguous shards of whole segments; they all get the job seed and derive the noise
+    #stream of every segment from it and the segment's index (see NoiseBank.segments)
+    n_shards = min(workers * SHARDS_PER_WORKER, n_segments)
+    bounds = np.linspace(0, n_segments, n_shards + 1).astype(np.int64)
+    seed = seed_sequence(settings.pop('seed', None))
+
+    shared = audio if isinstance(audio, SharedAudio) else SharedAudio(length, audio.dtype, channels=channels)
+    try:
+        if shared is not audio:
+            shared.array[...] = audio
+        jobs = [(shared.name, length, channels, shared.dtype.str, int(first) * segment_length,
+                 min(int(last) * segment_length, length), int(first), segment_length, seed,
+                 dict(settings, sample_rate=sample_rate, method=method))
+                for first, last in zip(bounds[:-1], bounds[1:])]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for _ in pool.map(_process_shard, jobs):
+                pass
+        if shared is audio:
+            return shared.array
+        result = np.empty_like(shared.array) if out is None else out
+        result[...] = shared.array
+        return result
+    finally:
+        if shared is not audio:
+            shared.close()
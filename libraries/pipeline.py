@@ -0,0 +1,296 @@
+import inspect
+import numpy as np
+
+from .instrumentation import StageTotals, enabled
+from .library1 import SegmentTable
+from .library2 import compile_selector, reverse_segments
+from .library3 import manipulate_segments
+from .library5 import FADE_CURVES, smooth_audio_list
+from .library6 import SegmentAssembler
+from .noise_bank import NoiseBank, check_noise_type
+from .pitch import check_frames, semitone_ratio, shift_segments
+
+#samples per fused chunk: small enough for the chunk to stay in the CPU cache while every stage runs over it
+FUSION_CHUNK = 1 << 16
+
+#stage name -> factory(sample_rate, **params) returning a kernel(table) that works in place
+STAGES = {}
+#stage name -> True/False or predicate(params): whether the stage's output can be cached
+CACHEABLE = {}
+
+
+def register_stage(name, cacheable=True):
+    """
+    Decorator that makes a stage factory available to Pipeline.add under 'name'.
+
+    The factory is called once per run as factory(sample_rate, **params); it checks
+    its parameters and returns a kernel(table) that processes a SegmentTable in place.
+    State that must carry over from chunk to chunk (e.g. a noise stream) lives in the
+    kernel. Registering an existing name replaces that stage.
+
+    Parameters:
+    - name: Name of the stage.
+    - cacheable: False if equal parameters can give a different output (randomness), or a
+      predicate(params) deciding it per call; see cache.cached_run.
+    """
+    def decorator(factory):
+        STAGES[name] = factory
+        CACHEABLE[name] = cacheable
+        return factory
+    return decorator
+
+
+def stage_cacheable(name, params):
+    """
+    Return True if the output of stage 'name' with 'params' is reproducible, so it can be cached.
+    """
+    cacheable = CACHEABLE.get(name, True)
+    return bool(cacheable(params) if callable(cacheable) else cacheable)
+
+
+@register_stage('mute')
+def mute_stage(sample_rate):
+    def kernel(table):
+        manipulate_segments(table, 'mute', sample_rate)
+    return kernel
+
+
+@register_stage('noise', cacheable=lambda params: params.get('seed') is not None)
+def noise_stage(sample_rate, noise_type='white', noise_level=0.5, shaping='fir', seed=None, noise_pool=None):
+    check_noise_type(noise_type, shaping)
+    #one bank for the whole run; seeded, every segment's noise follows from its index alone
+    noise_bank = NoiseBank(sample_rate, noise_type, shaping, seed=seed, pool=noise_pool)
+
+    def kernel(table):
+        manipulate_segments(table, 'noise', sample_rate, noise_level=noise_level, noise_bank=noise_bank)
+    return kernel
+
+
+@register_stage('reverse')
+def reverse_stage(sample_rate, pattern='1 * n + 0'):
+    compile_selector(pattern)
+
+    def kernel(table):
+        reverse_segments(table, pattern)
+    return kernel
+
+
+@register_stage('pitch')
+def pitch_stage(sample_rate, semitones=2.0, pattern='1 * n + 0', n_fft=None, hop_length=None):
+    semitone_ratio(semitones)
+    check_frames(sample_rate, n_fft, hop_length)
+    compile_selector(pattern)
+
+    def kernel(table):
+        #one STFT per table: the whole audio, or one chunk / streaming block of it
+        shift_segments(table, sample_rate, semitones, pattern=pattern, n_fft=n_fft, hop_length=hop_length)
+    return kernel
+
+
+@register_stage('fade')
+def fade_stage(sample_rate, fade_percentage=15, curve='linear'):
+    if not (0 <= fade_percentage <= 50):
+        raise ValueError("The fade_percentage must be between 0 and 50.")
+    if curve not in FADE_CURVES:
+        raise ValueError(f"Unsupported fade curve. Choose one of {', '.join(FADE_CURVES)}.")
+
+    def kernel(table):
+        smooth_audio_list(table, sample_rate, fade_percentage=fade_percentage, curve=curve)
+    return kernel
+
+
+def stage_options(name, options):
+    """
+    Return the entries of 'options' that the factory of stage 'name' accepts.
+    """
+    if name not in STAGES:
+        raise ValueError(f"Unknown stage '{name}'. Choose one of {', '.join(sorted(STAGES))}.")
+    parameters = inspect.signature(STAGES[name]).parameters
+    if any(p.kind == p.VAR_KEYWORD for p in parameters.values()):
+        return dict(options)
+    return {key: value for key, value in options.items() if key in parameters and key != 'sample_rate'}
+
+
+def stage_kernels(sample_rate, names, **options):
+    """
+    Build the kernels of the named stages for one run.
+
+    Parameters:
+    - sample_rate: Sampling rate of the audio.
+    - names: Stage names, in the order the kernels should run.
+    - options: Shared settings (noise_type, pattern, fade_percentage, ...); each stage gets the ones it accepts.
+
+    Returns:
+    - List of kernel(table) callables.
+    """
+    return [STAGES[name](sample_rate, **stage_options(name, options)) for name in names]
+
+
+class Pipeline:
+    """
+    Sequence of segment stages that runs as one fused pass over the audio.
+
+    Instead of running every stage over the whole audio in turn, the audio is
+    processed chunk by chunk: each chunk of whole segments is copied into the
+    output once and all stages run on it while it is still in the CPU cache.
+    No stage materializes a list of segments.
+
+    Parameters:
+    - sample_rate: Sampling rate of the audio.
+    - segment_duration_ms: Duration of each segment in milliseconds.
+    - chunk_size: Approximate number of samples per fused chunk (default: FUSION_CHUNK).
+
+    Example:
+        Pipeline(44100, 20).add('noise', noise_type='pink').add('reverse').add('fade').run(audio)
+    """
+
+    def __init__(self, sample_rate, segment_duration_ms, chunk_size=FUSION_CHUNK):
+        self.sample_rate = sample_rate
+        self.segment_length = int(sample_rate * segment_duration_ms / 1000)
+        if self.segment_length <= 0:
+            raise ValueError("segment_duration_ms is too short for the given sample_rate")
+        self.chunk_size = chunk_size
+        self.stages = []
+
+    @classmethod
+    def from_names(cls, sample_rate, segment_duration_ms, names, **options):
+        """
+        Build a pipeline from stage names, giving each stage the options its factory accepts.
+        """
+        pipeline = cls(sample_rate, segment_duration_ms)
+        for name in names:
+            pipeline.add(name, **stage_options(name, options))
+        return pipeline
+
+    def add(self, name, **params):
+        """
+        Append the registered stage 'name' with its parameters and return the pipeline.
+        """
+        if name not in STAGES:
+            raise ValueError(f"Unknown stage '{name}'. Choose one of {', '.join(sorted(STAGES))}.")
+        #build the kernel once now, so invalid parameters fail before any audio is touched
+        STAGES[name](self.sample_rate, **params)
+        self.stages.append((name, params))
+        return self
+
+    @property
+    def names(self):
+        return [name for name, _ in self.stages]
+
+    def kernels(self):
+        """
+        Return fresh kernels for one run (stateful stages start over).
+        """
+        return [STAGES[name](self.sample_rate, **params) for name, params in self.stages]
+
+    def run_table(self, table, kernels=None):
+        """
+        Run every stage on a SegmentTable in place and return it.
+        """
+        kernels = self.kernels() if kernels is None else kernels
+        for kernel in kernels:
+            kernel(table)
+        return table
+
+    def _measured(self, kernels, names):
+        #with a metrics sink every stage reports its time summed over all chunks (see instrumentation)
+        if not enabled():
+            return kernels, None
+        totals = StageTotals()
+        return [totals.measure(name, kernel) for name, kernel in zip(names, kernels)], totals
+
+    def run(self, audio, out=None, start=0, stop=None, boundaries=None):
+        """
+        Process a whole audio.
+
+        With a metrics sink registered (see instrumentation.add_sink) every stage sends
+        one record with its time, segments and samples summed over all chunks.
+
+        Parameters:
+        - audio: 1-D NumPy array, or a (channels, samples) array, or a loader.LazyAudio
+          (converted chunk by chunk).
+        - out: Optional array (or the audio itself, to work in place) that receives the result,
+          or a SegmentAssembler (e.g. a memmapped WAV file), which is filled and flushed.
+        - start, stop: Run only the stages start .. stop - 1 (default: all of them).
+        - boundaries: Optional segment boundaries (see library1.energy_boundaries) to use
+          instead of segments of segment_duration_ms.
+
+        Returns:
+        - NumPy array with the processed audio.
+        """
+        assembler = out if isinstance(out, SegmentAssembler) else None
+        if assembler is not None:
+            #the chunks are copied into the assembler's buffer and processed there
+            out = assembler.output
+        result = np.empty(audio.shape, dtype=audio.dtype) if out is None else out
+        if result.shape != audio.shape:
+            raise ValueError(f"out has shape {result.shape} but the audio has shape {audio.shape}.")
+        kernels, totals = self._measured(self.kernels()[start:stop], self.names[start:stop])
+        self._run_chunks(audio, result, kernels, boundaries)
+        if totals is not None:
+            totals.report()
+        if assembler is not None:
+            assembler.cursor = audio.shape[-1]
+            assembler.flush()
+            return assembler.result
+        return result
+
+    def _run_chunks(self, audio, result, kernels, boundaries):
+        n_samples = audio.shape[-1]
+        #a chunk holds all channels, so fewer samples per channel keep it the same size
+        channels = audio.shape[0] if audio.ndim > 1 else 1
+        if boundaries is None:
+            step = max(self.chunk_size // (self.segment_length * channels), 1) * self.segment_length
+            for begin in range(0, n_samples, step):
+                chunk, target = self._chunk(audio, result, begin, min(begin + step, n_samples))
+                table = SegmentTable.from_length(chunk, self.segment_length, first_index=begin // self.segment_length)
+                self.run_table(table, kernels)
+                if target is not chunk:
+                    target[...] = chunk
+            return
+        boundaries = np.asarray(boundaries, dtype=np.int64)
+        if len(boundaries) < 2 or boundaries[0] != 0 or boundaries[-1] != n_samples:
+            raise ValueError("boundaries must start at 0 and end at the length of the audio.")
+        #chunks end on segment boundaries, as close to chunk_size as the segments allow
+        first = 0
+        while first < len(boundaries) - 1:
+            last = int(np.searchsorted(boundaries, boundaries[first] + self.chunk_size // channels, 'right')) - 1
+            last = min(max(last, first + 1), len(boundaries) - 1)
+            chunk, target = self._chunk(audio, result, int(boundaries[first]), int(boundaries[last]))
+            #the nominal length does not depend on the chunk, so neither does the seeded noise
+            table = SegmentTable.from_boundaries(chunk, boundaries[first:last + 1] - boundaries[first],
+                                                 first_index=first, segment_length=self.segment_length)
+            self.run_table(table, kernels)
+            if target is not chunk:
+                target[...] = chunk
+            first = last
+
+    @staticmethod
+    def _chunk(audio, result, begin, end):
+        #returns the chunk to process and the part of the result it belongs to
+        target = result[..., begin:end]
+        if target.strides[-1] != target.itemsize:
+            #an interleaved output (e.g. a multichannel WAV assembler) has no row views, so the
+            #chunk is processed in a contiguous copy and written back
+            return np.array(audio[..., begin:end], dtype=result.dtype, order='C'), target
+        if result is not audio:
+            target[...] = audio[..., begin:end]
+        return target, target
+
+    def run_blocks(self, blocks):
+        """
+        Process a stream of blocks (see streaming.segment_blocks).
+
+        Returns:
+        - Generator of processed 1-D NumPy arrays. Each array is only valid until the next one is requested.
+        """
+        #imported here: streaming builds its stage kernels with this module
+        from .streaming import segment_blocks
+
+        kernels, totals = self._measured(self.kernels(), self.names)
+        for table in segment_blocks(blocks, self.segment_length):
+            self.run_table(table, kernels)
+            start, stop = table.span()
+            yield table.buffer[..., start:stop]
+        if totals is not None:
+            totals.report()
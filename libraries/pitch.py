@@ -0,0 +1,359 @@
+import functools
+import numpy as np
+
+from .dtypes import work_dtype
+from .library1 import SegmentTable
+from .library2 import compile_selector
+
+#synthesized frames processed per batch; bounds the spectra held in memory at once
+FRAME_BATCH = 512
+#analysis window length in seconds; the FFT size is the nearest power of two
+WINDOW_SECONDS = 0.046
+
+
+def default_n_fft(sample_rate):
+    """
+    Return the FFT size used when none is given: the power of two nearest to 46 ms of audio.
+    """
+    return 1 << max(int(round(np.log2(max(sample_rate * WINDOW_SECONDS, 16)))), 4)
+
+
+def check_frames(sample_rate, n_fft, hop_length):
+    """
+    Validate the STFT sizes and return (n_fft, hop_length) with the defaults filled in.
+    """
+    n_fft = default_n_fft(sample_rate) if n_fft is None else int(n_fft)
+    hop_length = n_fft // 4 if hop_length is None else int(hop_length)
+    if n_fft < 4 or n_fft % 2:
+        raise ValueError("n_fft must be an even number of at least 4.")
+    if hop_length <= 0 or n_fft % hop_length:
+        raise ValueError("hop_length must be a positive divisor of n_fft.")
+    return n_fft, hop_length
+
+
+@functools.lru_cache(maxsize=32)
+def _window(n_fft, dtype):
+    #periodic Hann window; shared by every call with the same size, so never modified
+    window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n_fft) / n_fft)).astype(dtype)
+    window.setflags(write=False)
+    return window
+
+
+class _Analysis:
+    """
+    Whole-signal STFT that computes the spectra of the frames it is asked for.
+
+    The signal is padded by n_fft // 2 zeros on both sides; frame t is centred on
+    sample t * hop_length. The frames are a strided view, so only the frames that
+    are transformed are ever copied.
+    """
+
+    def __init__(self, audio, n_fft, hop_length):
+        import scipy.fft
+
+        self._fft = scipy.fft
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.dtype = work_dtype(audio.dtype)
+        half = n_fft // 2
+        padded = np.zeros(audio.shape[:-1] + (audio.shape[-1] + 2 * half,), dtype=self.dtype)
+        padded[..., half:half + audio.shape[-1]] = audio
+        self.n_frames = audio.shape[-1] // hop_length + 1
+        self.frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft, axis=-1)[..., ::hop_length, :]
+        self.window = _window(n_fft, self.dtype)
+
+    def spectra(self, indices):
+        """
+        Return the spectra (..., len(indices), n_fft // 2 + 1) of the frames at 'indices', in one batch.
+        """
+        return self._fft.rfft(self.frames[..., indices, :] * self.window, axis=-1)
+
+    def synthesize(self, magnitude, phase):
+        """
+        Return the windowed frames of the spectra given by magnitude and phase.
+        """
+        spectrum = magnitude * np.cos(phase) + 1j * (magnitude * np.sin(phase))
+        frames = self._fft.irfft(spectrum, n=self.n_fft, axis=-1).astype(self.dtype, copy=False)
+        frames *= self.window
+        return frames
+
+
+def _vocode(analysis, steps, starts, positions, n_hops):
+    """
+    Phase vocoder over a description of the frames to synthesize.
+
+    Synthesized frame r takes its magnitudes from the analysis at position steps[r]
+    (in frames, interpolated between the two neighbouring frames), advances its
+    phases by the phase advance measured there, and is overlap-added at output
+    position positions[r] (in hops). Rows where 'starts' is True begin a new run
+    whose phases are taken from the analysis. The rows are processed in batches
+    of FRAME_BATCH frames; the phases carry over from batch to batch.
+
+    Returns:
+    - Flat output (..., (n_hops + n_fft // hop_length - 1) * hop_length); output position p
+      is centred on sample p * hop_length + n_fft // 2.
+    """
+    n_fft, hop = analysis.n_fft, analysis.hop_length
+    dtype = analysis.dtype
+    overlap = n_fft // hop
+    leading = analysis.frames.shape[:-2]
+
+    out = np.zeros(leading + (n_hops + overlap - 1, hop), dtype=dtype)
+    norm = np.zeros((n_hops + overlap - 1, hop), dtype=dtype)
+    window_pieces = (analysis.window * analysis.window).reshape(overlap, hop)
+    last_phase = last_delta = None
+    for begin in range(0, len(steps), FRAME_BATCH):
+        step = np.minimum(steps[begin:begin + FRAME_BATCH], analysis.n_frames - 1)
+        start = starts[begin:begin + FRAME_BATCH].copy()
+        position = positions[begin:begin + FRAME_BATCH]
+
+        #one batched FFT for every analysis frame the batch touches
+        floor = step.astype(np.int64)
+        ceil = np.minimum(floor + 1, analysis.n_frames - 1)
+        needed = np.unique(np.concatenate([floor, ceil]))
+        spectra = analysis.spectra(needed)
+        first = spectra[..., np.searchsorted(needed, floor), :]
+        second = spectra[..., np.searchsorted(needed, ceil), :]
+
+        fraction = (step - floor).astype(dtype)[:, None]
+        magnitude = np.abs(first)
+        magnitude *= 1 - fraction
+        magnitude += fraction * np.abs(second)
+        phase = np.angle(first)
+        #phase advance per hop, wrapped: only the phase modulo 2 pi matters, and small
+        #values keep the float32 cumulative sums precise
+        delta = np.angle(second) - phase
+        delta -= (2 * np.pi) * np.rint(delta / (2 * np.pi))
+
+        #phase of row r = phase at the start of its run + the advances of the rows before it
+        if last_phase is not None and not start[0]:
+            phase[..., 0, :] = last_phase + last_delta
+        start[0] = True
+        increments = np.zeros_like(delta)
+        increments[..., 1:, :] = delta[..., :-1, :]
+        total = np.cumsum(increments, axis=-2)
+        run_rows = np.flatnonzero(start)
+        run = np.cumsum(start) - 1
+        total += (phase[..., run_rows, :] - total[..., run_rows, :])[..., run, :]
+        last_phase = np.mod(total[..., -1, :], 2 * np.pi)
+        last_delta = delta[..., -1, :]
+
+        frames = analysis.synthesize(magnitude, total)
+        #overlap-add: every frame is 'overlap' hop-sized pieces added to consecutive output rows
+        pieces = frames.reshape(frames.shape[:-1] + (overlap, hop))
+        for k in range(overlap):
+            out[..., position + k, :] += pieces[..., k, :]
+            norm[position + k] += window_pieces[k]
+
+    out /= np.where(norm > 1e-6, norm, 1)
+    return out.reshape(leading + (-1,))
+
+
+def semitone_ratio(semitones):
+    """
+    Return the frequency ratio of a shift by 'semitones' (12 semitones double the frequency).
+    """
+    if not isinstance(semitones, (int, float)) or not np.isfinite(semitones):
+        raise TypeError("semitones must be a finite number.")
+    return 2.0 ** (semitones / 12.0)
+
+
+def _shift_spans(audio, spans, ratio, n_fft, hop_length):
+    """
+    Pitch shift the sample ranges 'spans' ((start, stop) pairs) of 'audio' by a frequency ratio.
+
+    The whole signal is resampled once, which scales every frequency by 'ratio' and
+    the time axis by 1 / ratio; the spans are then time stretched back to their
+    own length from one STFT of the resampled signal.
+
+    Returns:
+    - (flat, begins): the shifted span i is flat[..., begins[i]:begins[i] + its length].
+    """
+    import scipy.signal
+
+    resampled_length = max(int(round(audio.shape[-1] / ratio)), 1)
+    resampled = scipy.signal.resample(audio, resampled_length, axis=-1).astype(work_dtype(audio.dtype), copy=False)
+    lengths = spans[:, 1] - spans[:, 0]
+    return _stretch_spans(resampled, spans[:, 0] / ratio, lengths, 1 / ratio, n_fft, hop_length)
+
+
+def pitch_shift(audio, sample_rate, semitones, n_fft=None, hop_length=None):
+    """
+    Shift the pitch of an audio without changing its duration.
+
+    The signal is resampled once, which scales every frequency by 2 ** (semitones / 12)
+    but also the duration, and then time stretched back to its length by a phase
+    vocoder over one STFT of the whole resampled signal, in batches of frames.
+
+    Parameters:
+    - audio: 1-D NumPy array, or a (channels, samples) array.
+    - sample_rate: Sampling rate of the audio (in Hz).
+    - semitones: Shift in semitones; positive is higher, negative lower.
+    - n_fft: FFT size (default: default_n_fft(sample_rate), about 46 ms).
+    - hop_length: Hop between frames; must divide n_fft (default: n_fft // 4).
+
+    Returns:
+    - NumPy array of the audio's shape, in the audio's floating point precision.
+    """
+    n_fft, hop_length = check_frames(sample_rate, n_fft, hop_length)
+    ratio = semitone_ratio(semitones)
+    audio = np.asarray(audio)
+    if ratio == 1 or audio.shape[-1] == 0:
+        return audio.astype(work_dtype(audio.dtype))
+    spans = np.array([[0, audio.shape[-1]]])
+    return _spans_list(*_shift_spans(audio, spans, ratio, n_fft, hop_length), spans[:, 1])[0]
+
+
+def _stretch_spans(audio, starts, lengths, rate, n_fft, hop_length):
+    """
+    Time stretch ranges of 'audio' by 'rate' from one STFT, in batches of frames.
+
+    Span i starts at sample starts[i] (may be fractional) and its stretched output
+    is lengths[i] samples long, i.e. it covers lengths[i] * rate input samples.
+
+    Returns:
+    - (flat, begins): the stretched span i is flat[..., begins[i]:begins[i] + lengths[i]].
+    """
+    analysis = _Analysis(audio, n_fft, hop_length)
+    overlap = n_fft // hop_length
+    lengths = np.asarray(lengths, dtype=np.int64)
+    #each span is synthesized in its own output region, 'overlap' hops apart from the next one
+    counts = -(-lengths // hop_length) + 1
+    regions = np.cumsum(counts + overlap) - counts - overlap
+    row = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+    #synthesized frame k of a span reads the analysis at input sample start + k * hop * rate
+    steps = np.repeat(np.asarray(starts, dtype=np.float64) / hop_length, counts) + row * rate
+    positions = np.repeat(regions, counts) + row
+    n_hops = int(regions[-1] + counts[-1]) if len(lengths) else 0
+    flat = _vocode(analysis, steps, row == 0, positions, n_hops)
+    return flat, regions * hop_length + n_fft // 2
+
+
+def _spans_list(flat, begins, lengths):
+    return [flat[..., begin:begin + length].copy() for begin, length in zip(begins.tolist(), lengths.tolist())]
+
+
+def _check_rate(rate):
+    if not isinstance(rate, (int, float)) or not np.isfinite(rate):
+        raise TypeError("rate must be a finite number.")
+    if rate <= 0:
+        raise ValueError("rate must be greater than 0.")
+
+
+def time_stretch(audio, sample_rate, rate, n_fft=None, hop_length=None):
+    """
+    Change the duration of an audio without changing its pitch.
+
+    Parameters:
+    - audio: 1-D NumPy array, or a (channels, samples) array.
+    - sample_rate: Sampling rate of the audio (in Hz).
+    - rate: Speed factor; 2.0 is twice as fast (half as long), 0.5 twice as long.
+    - n_fft, hop_length: See pitch_shift.
+
+    Returns:
+    - NumPy array with round(samples / rate) samples (per channel).
+    """
+    n_fft, hop_length = check_frames(sample_rate, n_fft, hop_length)
+    _check_rate(rate)
+    audio = np.asarray(audio)
+    lengths = np.array([int(round(audio.shape[-1] / rate))])
+    return _spans_list(*_stretch_spans(audio, [0], lengths, rate, n_fft, hop_length), lengths)[0]
+
+
+def _as_table(segmented_audios):
+    #a list is concatenated once, so its segments share one STFT like the segments of a table
+    if isinstance(segmented_audios, SegmentTable):
+        return segmented_audios
+    if not isinstance(segmented_audios, list):
+        raise TypeError("segmented_audios must be a list of NumPy arrays or a SegmentTable.")
+    if any(not isinstance(seg, np.ndarray) for seg in segmented_audios):
+        raise TypeError("Each item in segmented_audios must be a NumPy array.")
+    from .library6 import concatenate_segments
+
+    lengths = np.array([seg.shape[-1] for seg in segmented_audios], dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    segment_length = int(lengths[0]) if len(lengths) else 0
+    return SegmentTable(concatenate_segments(segmented_audios), offsets, lengths, segment_length)
+
+
+def _selected_spans(table, pattern):
+    indices = compile_selector(pattern).indices(len(table), table.first_index)
+    indices = indices[table.lengths[indices] > 0]
+    spans = np.stack([table.offsets[indices], table.offsets[indices] + table.lengths[indices]], axis=-1)
+    return indices, spans.reshape(-1, 2)
+
+
+def shift_segments(segmented_audios, sample_rate, semitones, pattern='1 * n + 0', n_fft=None, hop_length=None):
+    """
+    Shift the pitch of the segments selected by a pattern.
+
+    One STFT is computed over the whole signal (the table's buffer, or the list's
+    segments joined together), so short segments are analysed with the context of
+    their neighbours, and the frames of all selected segments are processed in
+    batches. Segments that are not selected are left untouched.
+
+    Parameters:
+    - segmented_audios: List of NumPy arrays ((samples,) or (channels, samples)), or a
+      SegmentTable (shifted in place inside its buffer).
+    - sample_rate: Sampling rate of the audio (in Hz).
+    - semitones: Shift in semitones; positive is higher, negative lower.
+    - pattern: Selector of the segments to shift (see library2.Selector), e.g. '2 * n + 0'.
+    - n_fft, hop_length: See pitch_shift.
+
+    Returns:
+    - List of audio segments with the selected ones shifted, or the same SegmentTable.
+    """
+    n_fft, hop_length = check_frames(sample_rate, n_fft, hop_length)
+    ratio = semitone_ratio(semitones)
+    table = _as_table(segmented_audios)
+    indices, spans = _selected_spans(table, pattern)
+    if ratio == 1 or not len(indices):
+        return segmented_audios
+    flat, begins = _shift_spans(table.buffer, spans, ratio, n_fft, hop_length)
+
+    if not isinstance(segmented_audios, SegmentTable):
+        manipulated = list(segmented_audios)
+        for i, segment in zip(indices.tolist(), _spans_list(flat, begins, spans[:, 1] - spans[:, 0])):
+            manipulated[i] = segment
+        return manipulated
+
+    n_rows = int(np.count_nonzero(indices < table.n_rows))
+    if n_rows:
+        #one gather/scatter writes every selected full-length segment of every channel
+        gather = begins[:n_rows, None] + np.arange(table.segment_length)
+        table.rows[..., indices[:n_rows], :] = flat[..., gather]
+    for i, begin in zip(indices[n_rows:].tolist(), begins[n_rows:].tolist()):
+        table[i][...] = flat[..., begin:begin + table.lengths[i]]
+    return table
+
+
+def stretch_segments(segmented_audios, sample_rate, rate, pattern='1 * n + 0', n_fft=None, hop_length=None):
+    """
+    Change the duration of the segments selected by a pattern, keeping their pitch.
+
+    Like shift_segments, one STFT covers the whole signal and all selected segments
+    are synthesized in batches. The stretched segments change length, so the result
+    is always a list (a SegmentTable is left unchanged).
+
+    Parameters:
+    - segmented_audios: List of NumPy arrays ((samples,) or (channels, samples)), or a SegmentTable.
+    - sample_rate: Sampling rate of the audio (in Hz).
+    - rate: Speed factor; 2.0 halves the length of a segment, 0.5 doubles it.
+    - pattern: Selector of the segments to stretch (see library2.Selector).
+    - n_fft, hop_length: See pitch_shift.
+
+    Returns:
+    - List of audio segments in which the selected segments are round(length / rate) samples long.
+    """
+    n_fft, hop_length = check_frames(sample_rate, n_fft, hop_length)
+    _check_rate(rate)
+    table = _as_table(segmented_audios)
+    segments = list(segmented_audios) if isinstance(segmented_audios, list) else table.to_list()
+    indices, spans = _selected_spans(table, pattern)
+    if not len(indices):
+        return segments
+    lengths = np.rint((spans[:, 1] - spans[:, 0]) / rate).astype(np.int64)
+    stretched = _spans_list(*_stretch_spans(table.buffer, spans[:, 0], lengths, rate, n_fft, hop_length), lengths)
+    for i, segment in zip(indices.tolist(), stretched):
+        segments[i] = segment
+    return segments
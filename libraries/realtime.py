@@ -0,0 +1,292 @@
+import os
+import time
+import numpy as np
+
+from .dtypes import resolve_dtype
+from .library1 import SegmentTable
+from .library5 import smooth_audio_list
+from .loader import load_blocks
+from .pipeline import stage_kernels
+
+#samples per block of an audio device callback
+DEFAULT_BLOCK_SIZE = 512
+#stages that only depend on the position of a sample inside its segment, so they run without lookahead
+ZERO_LATENCY_STAGES = ('mute', 'fade')
+#block times kept for the deadline report
+REPORT_WINDOW = 4096
+
+
+class RealtimeEngine:
+    """
+    Block-based engine for live audio: fixed-size blocks in, processed blocks of the same size out.
+
+    Input blocks are written into a preallocated ring buffer. Stages that need whole
+    segments (reverse, noise, pitch, ...) run as soon as a segment is complete, so the
+    output is delayed by one segment. With only mute and fades no lookahead is needed
+    and the output can follow the input without delay. Segments that span blocks are
+    assembled in the ring, and the stage state (segment parity, noise stream, fade
+    position) carries over from block to block, so the concatenated output equals the
+    offline pipeline's output shifted by 'latency' samples. The one exception is a
+    mute/fade engine whose latency is shorter than the last, shorter segment: part of
+    that segment is out before the stream is known to end, so it is faded like a whole one.
+
+    Every call to process() is timed against the real-time deadline of one block
+    (block_size / sample_rate); see report().
+
+    Parameters:
+    - sample_rate: Sampling rate of the audio.
+    - block_size: Samples per input block (per channel); blocks may be shorter, not longer.
+    - segment_duration_ms: Duration of each segment in milliseconds.
+    - method: 'mute', 'noise', 'reverse', 'pitch' or None (fades only).
+    - stages: Registered stage names to run instead of method + fades (see pipeline.STAGES).
+    - latency_ms: Output delay; at least one segment when a stage needs lookahead
+      (default: the smallest possible delay).
+    - channels: None for 1-D blocks, or the channel count of (channels, samples) blocks.
+    - dtype: Sample precision (default: the dtype policy).
+    - options: Stage settings (pattern, noise_type, noise_level, fade_percentage, curve, seed, ...).
+    """
+
+    def __init__(self, sample_rate, block_size=DEFAULT_BLOCK_SIZE, segment_duration_ms=100, method='reverse',
+                 stages=None, latency_ms=None, channels=None, dtype=None, **options):
+        self.sample_rate = sample_rate
+        self.block_size = int(block_size)
+        self.segment_length = int(sample_rate * segment_duration_ms / 1000)
+        if self.block_size <= 0:
+            raise ValueError("block_size must be greater than 0.")
+        if self.segment_length <= 0:
+            raise ValueError("segment_duration_ms is too short for the given sample_rate")
+        self.stages = list(stages) if stages else ([method] if method else []) + ['fade']
+        self.options = options
+        self.lookahead = any(name not in ZERO_LATENCY_STAGES for name in self.stages)
+        minimum = self.segment_length if self.lookahead else 0
+        self.latency = minimum if latency_ms is None else int(round(sample_rate * latency_ms / 1000))
+        if self.latency < minimum:
+            raise ValueError(f"The stages {', '.join(self.stages)} need a latency of at least one segment "
+                             f"({1000 * minimum / sample_rate:g} ms).")
+        self.channels = channels
+        self.dtype = resolve_dtype(dtype)
+        if not self.lookahead:
+            self._gain = self._segment_gain(self.segment_length)
+        #room for the latency, one block and the segment being assembled; whole segments never wrap
+        segments = -(-(self.latency + self.block_size) // self.segment_length) + 1
+        self.capacity = segments * self.segment_length
+        shape = (self.capacity,) if channels is None else (channels, self.capacity)
+        self._ring = np.empty(shape, dtype=self.dtype)
+        self._out = np.empty(shape[:-1] + (self.block_size,), dtype=self.dtype)
+        self._times = np.zeros(REPORT_WINDOW)
+        self.reset()
+
+    def reset(self):
+        """
+        Start a new stream: clear the buffered audio, the stage state and the report.
+        """
+        #the kernels hold the stage state (e.g. the noise stream), so a new stream gets new ones
+        self._kernels = stage_kernels(self.sample_rate, self.stages, **self.options)
+        self._ring[...] = 0
+        self.written = 0
+        self.processed = 0
+        self.blocks = 0
+        self.overruns = 0
+        self._times[:] = 0
+
+    @property
+    def deadline(self):
+        """
+        Seconds one block may take: its duration.
+        """
+        return self.block_size / self.sample_rate
+
+    def process(self, block):
+        """
+        Take one input block and return the output block of the same length.
+
+        The output is the processed input of 'latency' samples earlier (silence at the
+        start). It is a view of an internal buffer, valid until the next call.
+        """
+        started = time.perf_counter()
+        block = np.asarray(block)
+        length = block.shape[-1]
+        if length > self.block_size:
+            raise ValueError(f"Blocks may hold at most block_size ({self.block_size}) samples, not {length}.")
+        if block.shape[:-1] != self._ring.shape[:-1]:
+            raise ValueError(f"Blocks must have the shape {self._ring.shape[:-1] + ('samples',)}, not {block.shape}.")
+        for ring, start, stop in self._slices(self.written, self.written + length):
+            ring[...] = block[..., start - self.written:stop - self.written]
+        self.written += length
+        self._advance(final=False)
+        out = self._read(self.written - length - self.latency, self._out[..., :length])
+
+        elapsed = time.perf_counter() - started
+        self._times[self.blocks % REPORT_WINDOW] = elapsed
+        self.blocks += 1
+        self.overruns += elapsed > self.deadline
+        return out
+
+    def flush(self):
+        """
+        End the stream: process the last (possibly shorter) segment and return the
+        'latency' samples still held back.
+        """
+        self._advance(final=True)
+        out = np.empty(self._ring.shape[:-1] + (self.latency,), dtype=self.dtype)
+        return self._read(self.written - self.latency, out)
+
+    def report(self):
+        """
+        Return the deadline report: processing time per block against the block duration.
+        """
+        times = self._times[:min(self.blocks, REPORT_WINDOW)] * 1000
+        deadline = self.deadline * 1000
+        summary = dict(blocks=self.blocks, block_size=self.block_size, latency_ms=1000 * self.latency / self.sample_rate,
+                       deadline_ms=deadline, overruns=self.overruns)
+        if len(times):
+            p50, p99 = np.percentile(times, [50, 99])
+            summary.update(mean_ms=float(times.mean()), p50_ms=float(p50), p99_ms=float(p99),
+                           max_ms=float(times.max()), load=float(times.mean() / deadline))
+        return summary
+
+    def _slices(self, start, stop):
+        #ring views of the global sample range [start, stop), split where it wraps
+        while start < stop:
+            offset = start % self.capacity
+            end = min(stop, start + self.capacity - offset)
+            yield self._ring[..., offset:offset + end - start], start, end
+            start = end
+
+    def _segment_gain(self, length):
+        #mute and fades as one gain curve over the positions of a segment
+        gain = np.ones(length, dtype=self.dtype)
+        if 'fade' in self.stages:
+            smooth_audio_list([gain], self.sample_rate, fade_percentage=self.options.get('fade_percentage', 15),
+                              curve=self.options.get('curve', 'linear'))
+        return gain
+
+    def _apply_gain(self, start, stop, gain):
+        for ring, first, last in self._slices(start, stop):
+            positions = np.arange(first, last)
+            scale = gain[positions % self.segment_length]
+            if 'mute' in self.stages:
+                #the segments with even indices are muted, like manipulate_segments does
+                scale = np.where((positions // self.segment_length) % 2 == 0, 0, scale).astype(self.dtype)
+            ring *= scale
+
+    def _advance(self, final):
+        if not self.lookahead:
+            #mute and fades apply when the samples are due, so the held-back ones can still
+            #get the envelope of the last segment once the stream ends
+            short = self.written % self.segment_length
+            tail = self.written - short
+            if final and short and tail >= self.processed:
+                #the last, shorter segment is faded over its own length, like smooth_audio_list does
+                self._apply_gain(self.processed, tail, self._gain)
+                self._apply_gain(tail, self.written, self._segment_gain(short))
+                self.processed = self.written
+                return
+            ready = self.written if final else max(self.written - self.latency, self.processed)
+            self._apply_gain(self.processed, ready, self._gain)
+            self.processed = ready
+            return
+        #the stages run on whole segments only, except for the last one when the stream ends
+        ready = self.written if final else self.written - self.written % self.segment_length
+        for ring, start, _ in self._slices(self.processed, ready):
+            table = SegmentTable.from_length(ring, self.segment_length, first_index=start // self.segment_length)
+            for kernel in self._kernels:
+                kernel(table)
+        self.processed = ready
+
+    def _read(self, start, out):
+        #samples before the start of the stream are silence
+        silence = min(max(-start, 0), out.shape[-1])
+        out[..., :silence] = 0
+        filled = silence
+        for ring, _, _ in self._slices(start + silence, start + out.shape[-1]):
+            out[..., filled:filled + ring.shape[-1]] = ring
+            filled += ring.shape[-1]
+        return out
+
+
+def fixed_blocks(blocks, block_size):
+    """
+    Regroup a stream of blocks of any size into blocks of exactly block_size samples
+    (the last one may be shorter), as an audio device delivers them.
+    """
+    pending = []
+    count = 0
+    for block in blocks:
+        pending.append(block)
+        count += block.shape[-1]
+        if count < block_size:
+            continue
+        joined = np.concatenate(pending, axis=-1)
+        usable = count - count % block_size
+        for start in range(0, usable, block_size):
+            yield joined[..., start:start + block_size]
+        pending = [joined[..., usable:]]
+        count -= usable
+    if count:
+        yield np.concatenate(pending, axis=-1)
+
+
+def simulate(engine, blocks, speed=None, clock=time.perf_counter, sleep=time.sleep):
+    """
+    Feed a stream through a RealtimeEngine as an audio device clock would, for offline tests.
+
+    Parameters:
+    - engine: RealtimeEngine.
+    - blocks: Iterable of blocks of any size (e.g. loader.load_blocks); they are regrouped
+      into blocks of engine.block_size.
+    - speed: None feeds the blocks as fast as possible; a number paces them at that multiple
+      of real time (1.0 is real time), waiting for the simulated clock between blocks.
+    - clock, sleep: Time source and wait function of the simulated clock.
+
+    Returns:
+    - Generator of output blocks (views, valid until the next one), ending with engine.flush().
+    """
+    period = engine.deadline / speed if speed else 0.0
+    tick = clock()
+    for block in fixed_blocks(blocks, engine.block_size):
+        if period:
+            tick += period
+            wait = tick - clock()
+            if wait > 0:
+                sleep(wait)
+        yield engine.process(block)
+    yield engine.flush()
+
+
+def realtime_process(input_file, output_file, segment_duration_ms, method, block_size=DEFAULT_BLOCK_SIZE,
+                     latency_ms=None, speed=None, mono=True, output_format=None, **options):
+    """
+    Run a file through a RealtimeEngine block by block, as a live feed, and write the result.
+
+    The latency of the engine is removed again, so the output file lines up with the input.
+
+    Parameters:
+    - input_file, output_file: Paths of the input and output audio files.
+    - segment_duration_ms, method, block_size, latency_ms: See RealtimeEngine.
+    - speed: Pace of the simulated device clock (see simulate).
+    - mono: Downmix to mono (default); False processes all channels.
+    - output_format: soundfile format name (default: taken from the output file extension).
+    - options: Stage settings (see RealtimeEngine).
+
+    Returns:
+    - The engine's deadline report.
+    """
+    import soundfile as sf
+
+    sample_rate, blocks = load_blocks(input_file, mono=mono)
+    channels = None if mono else sf.info(input_file).channels
+    engine = RealtimeEngine(sample_rate, block_size, segment_duration_ms, method, latency_ms=latency_ms,
+                            channels=channels, **options)
+    output_folder = os.path.dirname(output_file)
+    if output_folder:
+        os.makedirs(output_folder, exist_ok=True)
+    skip = engine.latency
+    with sf.SoundFile(output_file, 'w', samplerate=sample_rate, channels=channels or 1,
+                      format=output_format.upper() if output_format else None) as out:
+        for chunk in simulate(engine, blocks, speed=speed):
+            #the first 'latency' samples are the silence before the stream
+            dropped = min(skip, chunk.shape[-1])
+            skip -= dropped
+            out.write(chunk[..., dropped:].T)
+    return engine.report()
@@ -0,0 +1,466 @@
+import asyncio
+import collections
+import http
+import json
+import os
+import shutil
+import tempfile
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .dtypes import resolve_dtype
+
+#bytes read from a socket or an output file per step
+IO_CHUNK = 1 << 16
+#jobs that may wait for a worker besides the ones being processed
+DEFAULT_QUEUE_SIZE = 8
+#seconds a request waits for room in the queue before it is turned away with 503
+DEFAULT_ADMIT_TIMEOUT = 30.0
+#largest accepted upload
+DEFAULT_MAX_UPLOAD = 2 << 30
+#completed requests kept for the latency percentiles and the throughput
+METRICS_WINDOW = 1024
+
+#query parameters of POST /process and their types; the rest of the chain's settings keep their defaults
+PROCESS_PARAMETERS = {
+    'method': str, 'segment': float, 'pattern': str, 'noise_type': str, 'noise_level': float, 'shaping': str,
+    'fade_percentage': float, 'curve': str, 'semitones': float, 'seed': int, 'stages': str,
+    'format': str, 'bitrate': str, 'multichannel': int, 'filename': str,
+}
+#media types of the output formats; anything else is sent as application/octet-stream
+MEDIA_TYPES = {'wav': 'audio/wav', 'flac': 'audio/flac', 'mp3': 'audio/mpeg', 'ogg': 'audio/ogg'}
+
+
+class HTTPError(Exception):
+    """
+    Error answered with an HTTP status and a JSON body.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def process_upload(input_path, output_folder, segment_duration_ms=100, method='reverse', stages=None,
+                   output_format='wav', bitrate='192k', mono=True, dtype=None, output_name='output', **options):
+    """
+    Run the segment / manipulate / smooth / export chain on one file (the service's worker job).
+
+    Parameters:
+    - input_path: Path of the uploaded audio file.
+    - output_folder: Folder for the processed file.
+    - segment_duration_ms: Duration of each segment in milliseconds.
+    - method: Stage run before the fades ('mute', 'noise', 'reverse', 'pitch', or 'none').
+    - stages: Stage names to run instead of method + fades (see pipeline.STAGES).
+    - output_format, bitrate: Output format and MP3 bitrate (see library4.export_audio).
+    - mono: Downmix to mono (default); False keeps the channels.
+    - dtype: Sample precision (default: the dtype policy).
+    - output_name: Name of the processed file without extension (default: 'output').
+    - options: Further stage settings (pattern, noise_type, seed, ...).
+
+    Returns:
+    - Dict with the output path, its samples (per channel), channels and sample rate.
+    """
+    from .dtypes import dtype_policy, get_dtype
+    from .library4 import export_audio
+    from .loader import load_audio
+    from .pipeline import Pipeline
+
+    if not stages:
+        stages = ([] if method in (None, 'none') else [method]) + ['fade']
+    with dtype_policy(dtype or get_dtype()):
+        audio, sr = load_audio(input_path, mono=mono)
+        pipeline = Pipeline.from_names(sr, segment_duration_ms, stages, **options)
+        pipeline.run(audio, out=audio)
+    result = export_audio(audio, sr, output_folder, output_name, targets=[(output_format, bitrate)])[0]
+    if not result.ok:
+        raise RuntimeError(f"Export to {output_format} failed: {result.error}")
+    return dict(path=result.path, samples=audio.shape[-1], channels=audio.shape[0] if audio.ndim > 1 else 1,
+                sample_rate=sr)
+
+
+class ServiceMetrics:
+    """
+    Counters and latency window of a ProcessingService, reported by GET /metrics.
+    """
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.started = time.monotonic()
+        #(finish time, seconds from arrival to result, seconds spent queued, seconds of audio)
+        self.completions = collections.deque(maxlen=window)
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def record(self, latency, wait, audio_seconds):
+        self.completed += 1
+        self.completions.append((time.monotonic(), latency, wait, audio_seconds))
+
+    def snapshot(self):
+        """
+        Return the metrics as a JSON-serializable dict.
+        """
+        now = time.monotonic()
+        finished = np.array([entry[0] for entry in self.completions])
+        latencies = np.array([entry[1] for entry in self.completions]) * 1000
+        waits = np.array([entry[2] for entry in self.completions]) * 1000
+        audio = np.array([entry[3] for entry in self.completions])
+
+        def percentiles(values):
+            if not len(values):
+                return {'p50': None, 'p90': None, 'p99': None}
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            return {'p50': round(float(p50), 3), 'p90': round(float(p90), 3), 'p99': round(float(p99), 3)}
+
+        #throughput over the completions in the window, from the first one to now
+        span = now - finished[0] if len(finished) else 0.0
+        return {
+            'uptime_s': round(now - self.started, 3),
+            'queue_depth': self.queued,
+            'in_flight': self.running,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'latency_ms': percentiles(latencies),
+            'queue_wait_ms': percentiles(waits),
+            'throughput': {
+                'requests_per_s': round(len(finished) / span, 3) if span > 0 else None,
+                'audio_seconds_per_s': round(float(audio.sum()) / span, 3) if span > 0 else None,
+            },
+        }
+
+
+class ProcessingService:
+    """
+    Local asyncio HTTP service in front of a process pool that runs the processing chain.
+
+    Endpoints:
+    - POST /process?method=reverse&segment=100&format=wav&...: the request body is an audio
+      file, the response body (chunked) the processed file. See PROCESS_PARAMETERS.
+    - GET /metrics: queue depth, latency percentiles and throughput as JSON.
+    - GET /health: 'ok'.
+
+    Uploads are streamed to a spool folder, never held in memory. At most workers +
+    queue_size requests are admitted at a time; further ones are not read until there
+    is room (TCP backpressure on the client), and get a 503 after admit_timeout seconds.
+
+    Parameters:
+    - host, port: Address to listen on (default: localhost; port 0 picks a free port).
+    - workers: Worker processes (default: os.cpu_count()).
+    - queue_size: Admitted requests that may wait for a worker.
+    - admit_timeout: Seconds a request waits for admission.
+    - max_upload: Largest accepted upload in bytes.
+    - spool_dir: Folder for uploads and outputs (default: a new temporary folder).
+    - dtype: Sample precision of the workers (default: the dtype policy when the service is created).
+    """
+
+    def __init__(self, host='127.0.0.1', port=8000, workers=None, queue_size=DEFAULT_QUEUE_SIZE,
+                 admit_timeout=DEFAULT_ADMIT_TIMEOUT, max_upload=DEFAULT_MAX_UPLOAD, spool_dir=None, dtype=None):
+        if queue_size < 0:
+            raise ValueError("queue_size must be 0 or greater.")
+        #worker processes do not share the policy of this process, so it travels with every job
+        self.dtype = resolve_dtype(dtype).name
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.admit_timeout = admit_timeout
+        self.max_upload = max_upload
+        self.metrics = ServiceMetrics()
+        self._spool_dir = spool_dir
+        self._owns_spool = spool_dir is None
+        self._server = None
+        self._pool = None
+        self._queue = None
+        self._admission = None
+        self._dispatchers = []
+        self._requests = 0
+
+    async def start(self):
+        """
+        Start the pool and listen; self.port holds the bound port afterwards.
+        """
+        if self._owns_spool:
+            self._spool_dir = tempfile.mkdtemp(prefix='voice-service-')
+        os.makedirs(self._spool_dir, exist_ok=True)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._queue = asyncio.Queue(maxsize=self.queue_size + self.workers)
+        self._admission = asyncio.Semaphore(self.queue_size + self.workers)
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """
+        Stop listening, cancel the dispatchers, shut the pool down and remove the spool folder.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._dispatchers = []
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        if self._owns_spool and self._spool_dir:
+            shutil.rmtree(self._spool_dir, ignore_errors=True)
+
+    async def _dispatch(self):
+        #one dispatcher per worker process, so a job only leaves the queue when a worker is free
+        loop = asyncio.get_running_loop()
+        while True:
+            job, future = await self._queue.get()
+            self.metrics.queued -= 1
+            self.metrics.running += 1
+            job['started'] = time.monotonic()
+            try:
+                result = await loop.run_in_executor(self._pool, _run_job, job['kwargs'])
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.metrics.running -= 1
+                self._queue.task_done()
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                method, target, headers = await _read_head(reader)
+                path, _, query = target.partition('?')
+                if path == '/process':
+                    if method != 'POST':
+                        raise HTTPError(405, "Use POST for /process.")
+                    await self._process(reader, writer, headers, urllib.parse.parse_qs(query))
+                elif path in ('/metrics', '/health'):
+                    if method != 'GET':
+                        raise HTTPError(405, f"Use GET for {path}.")
+                    if path == '/metrics':
+                        await _send(writer, 200, json.dumps(self.metrics.snapshot()).encode(), 'application/json')
+                    else:
+                        await _send(writer, 200, b'ok', 'text/plain')
+                else:
+                    raise HTTPError(404, f"No endpoint {path}.")
+            except HTTPError as e:
+                await _send_error(writer, e.status, str(e))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _process(self, reader, writer, headers, query):
+        arrived = time.monotonic()
+        settings = _process_settings(query)
+        try:
+            await asyncio.wait_for(self._admission.acquire(), self.admit_timeout)
+        except asyncio.TimeoutError:
+            self.metrics.rejected += 1
+            raise HTTPError(503, "The processing queue is full, try again later.")
+        self._requests += 1
+        folder = os.path.join(self._spool_dir, str(self._requests))
+        try:
+            os.makedirs(folder)
+            input_path = os.path.join(folder, 'input' + settings.pop('extension'))
+            if headers.get('expect', '').lower() == '100-continue':
+                writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+                await writer.drain()
+            await self._spool(reader, headers, input_path)
+
+            future = asyncio.get_running_loop().create_future()
+            job = dict(kwargs=dict(settings, input_path=input_path, output_folder=folder, dtype=self.dtype))
+            self.metrics.queued += 1
+            await self._queue.put((job, future))
+            try:
+                result = await future
+            except (ValueError, TypeError) as e:
+                self.metrics.failed += 1
+                raise HTTPError(400, str(e))
+            except Exception as e:
+                self.metrics.failed += 1
+                raise HTTPError(500, f"{type(e).__name__}: {e}")
+            now = time.monotonic()
+            self.metrics.record(now - arrived, job['started'] - arrived, result['samples'] / result['sample_rate'])
+            output_format = settings.get('output_format', 'wav')
+            await _send_file(writer, result['path'], MEDIA_TYPES.get(output_format, 'application/octet-stream'),
+                             {'X-Sample-Rate': result['sample_rate'], 'X-Channels': result['channels'],
+                              'X-Samples': result['samples']})
+        finally:
+            self._admission.release()
+            shutil.rmtree(folder, ignore_errors=True)
+
+    async def _spool(self, reader, headers, path):
+        size = 0
+        with open(path, 'wb') as file:
+            async for data in _body_chunks(reader, headers):
+                size += len(data)
+                if size > self.max_upload:
+                    raise HTTPError(413, f"Uploads are limited to {self.max_upload} bytes.")
+                file.write(data)
+        if not size:
+            raise HTTPError(400, "The request body must be an audio file.")
+
+
+def _run_job(kwargs):
+    #module-level, so the process pool can pickle it
+    return process_upload(**kwargs)
+
+
+def _process_settings(query):
+    """
+    Turn the query of POST /process into keyword arguments of process_upload.
+    """
+    settings = {}
+    for name, values in query.items():
+        if name not in PROCESS_PARAMETERS:
+            raise HTTPError(400, f"Unknown parameter '{name}'. Use {', '.join(PROCESS_PARAMETERS)}.")
+        try:
+            settings[name] = PROCESS_PARAMETERS[name](values[-1])
+        except ValueError:
+            raise HTTPError(400, f"Invalid value for '{name}': {values[-1]!r}.")
+    #the upload keeps the extension of its file name, which some decoders need
+    extension = os.path.splitext(os.path.basename(settings.pop('filename', '')))[1].lower()
+    return dict(process_options(settings), extension=extension if extension[1:].isalnum() else '.wav')
+
+
+def process_options(settings):
+    """
+    Turn typed PROCESS_PARAMETERS settings into keyword arguments of process_upload.
+    """
+    settings = dict(settings)
+    kwargs = {}
+    if 'segment' in settings:
+        kwargs['segment_duration_ms'] = settings.pop('segment')
+    if 'format' in settings:
+        kwargs['output_format'] = settings.pop('format').lower()
+    if 'multichannel' in settings:
+        kwargs['mono'] = not settings.pop('multichannel')
+    if 'stages' in settings:
+        kwargs['stages'] = [name.strip() for name in settings.pop('stages').split(',') if name.strip()]
+    kwargs.update(settings)
+    return kwargs
+
+
+async def _read_head(reader):
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.LimitOverrunError:
+        raise HTTPError(431, "The request head is too large.")
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, _ = lines[0].split(' ', 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line.")
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name:
+            headers[name.strip().lower()] = value.strip()
+    return method, target, headers
+
+
+async def _body_chunks(reader, headers):
+    """
+    Yield the request body in pieces of at most IO_CHUNK bytes (Content-Length or chunked).
+    """
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            line = await reader.readuntil(b'\r\n')
+            try:
+                remaining = int(line.split(b';')[0], 16)
+            except ValueError:
+                raise HTTPError(400, "Malformed chunked body.")
+            if remaining == 0:
+                #skip the trailers up to the empty line
+                while await reader.readuntil(b'\r\n') != b'\r\n':
+                    pass
+                return
+            while remaining:
+                data = await reader.read(min(remaining, IO_CHUNK))
+                if not data:
+                    raise asyncio.IncompleteReadError(b'', remaining)
+                remaining -= len(data)
+                yield data
+            await reader.readexactly(2)
+        return
+    try:
+        remaining = int(headers.get('content-length', 0))
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length.")
+    while remaining > 0:
+        data = await reader.read(min(remaining, IO_CHUNK))
+        if not data:
+            raise asyncio.IncompleteReadError(b'', remaining)
+        remaining -= len(data)
+        yield data
+
+
+def _head(status, headers):
+    lines = [f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+async def _send(writer, status, body, content_type):
+    writer.write(_head(status, {'Content-Type': content_type, 'Content-Length': len(body), 'Connection': 'close'}))
+    writer.write(body)
+    await writer.drain()
+
+
+async def _send_error(writer, status, message):
+    await _send(writer, status, json.dumps({'error': message}).encode(), 'application/json')
+
+
+async def _send_file(writer, path, content_type, headers):
+    """
+    Send a file as a chunked response, one IO_CHUNK at a time; drain() waits for slow clients.
+    """
+    headers = dict(headers, **{'Content-Type': content_type, 'Transfer-Encoding': 'chunked', 'Connection': 'close'})
+    writer.write(_head(200, headers))
+    with open(path, 'rb') as file:
+        for data in iter(lambda: file.read(IO_CHUNK), b''):
+            writer.write(b'%x\r\n' % len(data) + data + b'\r\n')
+            await writer.drain()
+    writer.write(b'0\r\n\r\n')
+    await writer.drain()
+
+
+def run_service(host='127.0.0.1', port=8000, workers=None, queue_size=DEFAULT_QUEUE_SIZE, **settings):
+    """
+    Run a ProcessingService until it is interrupted (Ctrl+C).
+
+    Parameters:
+    - host, port, workers, queue_size, settings: See ProcessingService.
+    """
+    service = ProcessingService(host, port, workers=workers, queue_size=queue_size, **settings)
+
+    async def serve():
+        await service.start()
+        print(f"Serving on http://{service.host}:{service.port} with {service.workers} worker(s)")
+        await service.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
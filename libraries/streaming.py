@@ -0,0 +1,294 @@
+import os
+import numpy as np
+
+from .dtypes import resolve_dtype
+from .library1 import SegmentTable
+from .library2 import reverse_segments
+from .library3 import manipulate_segments
+from .library5 import smooth_audio_list
+from .library6 import concatenate_segments
+from .loader import load_blocks
+from .noise_bank import NoiseBank, check_noise_type
+from .pipeline import stage_kernels
+
+#number of samples read from the input per block
+DEFAULT_BLOCKSIZE = 65536
+
+
+def read_blocks(input_file, blocksize=DEFAULT_BLOCKSIZE, mono=True, dtype=None):
+    """
+    Yield float blocks of an audio file without loading the whole file.
+
+    PCM WAV files are read through a memory map (see loader.load_blocks). With mono=True
+    multichannel files are downmixed by averaging the channels, like librosa.load does.
+
+    Parameters:
+    - input_file: Path of the audio file.
+    - blocksize: Number of samples per block.
+    - mono: Downmix to mono (default); False keeps the channels.
+    - dtype: float32 or float64 blocks (default: the dtype policy).
+
+    Returns:
+    - Generator of 1-D NumPy arrays, or (channels, samples) arrays if mono is False.
+    """
+    return load_blocks(input_file, blocksize=blocksize, mono=mono, dtype=dtype)[1]
+
+
+#raw PCM sample formats: (dtype, scale to the float range [-1, 1])
+PCM_FORMATS = {
+    's16le': (np.dtype('<i2'), 32768.0),
+    'f32le': (np.dtype('<f4'), 1.0),
+}
+
+
+def read_pcm_blocks(stream, pcm_format='s16le', channels=1, blocksize=DEFAULT_BLOCKSIZE, mono=True, dtype=None):
+    """
+    Yield float blocks decoded from a binary stream of interleaved raw PCM.
+
+    Parameters:
+    - stream: Binary file object, e.g. sys.stdin.buffer.
+    - pcm_format: 's16le' or 'f32le'.
+    - channels: Number of interleaved channels.
+    - blocksize: Number of frames read per block.
+    - mono: Downmix the channels to mono (default); False keeps them.
+    - dtype: float32 or float64 blocks (default: the dtype policy).
+
+    Returns:
+    - Generator of 1-D NumPy arrays, or (channels, frames) arrays if mono is False.
+      A ValueError is raised after the last block if the stream ends inside a frame.
+    """
+    if pcm_format not in PCM_FORMATS:
+        raise ValueError(f"Unsupported PCM format. Choose one of {', '.join(PCM_FORMATS)}.")
+    float_dtype = resolve_dtype(dtype)
+    dtype, scale = PCM_FORMATS[pcm_format]
+    frame_bytes = dtype.itemsize * channels
+    pending = b''
+    while True:
+        data = stream.read(blocksize * frame_bytes)
+        if not data:
+            break
+        #pipes may deliver partial frames; keep them for the next read
+        data = pending + data
+        usable = len(data) - len(data) % frame_bytes
+        pending = data[usable:]
+        if not usable:
+            continue
+        frames = np.frombuffer(data, dtype=dtype, count=usable // dtype.itemsize).reshape(-1, channels)
+        if not mono:
+            block = frames.T.astype(float_dtype)
+        elif channels > 1:
+            block = frames.mean(axis=1, dtype=float_dtype)
+        else:
+            block = frames[:, 0].astype(float_dtype)
+        if scale != 1.0:
+            block /= scale
+        yield block
+    if pending:
+        #a truncated or misaligned stream would otherwise lose its last samples silently
+        raise ValueError(f"The PCM stream ended with {len(pending)} bytes of an incomplete frame "
+                         f"({frame_bytes} bytes per frame of {channels} {pcm_format} channel(s)).")
+
+
+def write_pcm(stream, audio, pcm_format='s16le'):
+    """
+    Write a float block to a binary stream as raw PCM.
+
+    Parameters:
+    - stream: Binary file object, e.g. sys.stdout.buffer.
+    - audio: 1-D NumPy array in the range [-1, 1], or (channels, samples) for interleaved output.
+    - pcm_format: 's16le' or 'f32le'.
+    """
+    if pcm_format not in PCM_FORMATS:
+        raise ValueError(f"Unsupported PCM format. Choose one of {', '.join(PCM_FORMATS)}.")
+    dtype, scale = PCM_FORMATS[pcm_format]
+    if pcm_format == 's16le':
+        samples = np.clip(audio * scale, -32768, 32767).astype(dtype)
+    else:
+        samples = audio.astype(dtype, copy=False)
+    #(channels, samples) -> interleaved frames
+    stream.write(np.ascontiguousarray(samples.T).tobytes())
+
+
+def segment_blocks(blocks, segment_length, blocksize=DEFAULT_BLOCKSIZE):
+    """
+    Regroup a stream of blocks of any size into SegmentTables of whole segments.
+
+    Samples are copied into one preallocated work buffer whose size is a multiple
+    of the segment length, so a segment that spans two input blocks ends up whole
+    in one table and memory stays bounded by the buffer size. Every table carries
+    the global index of its first segment (first_index).
+
+    The yielded tables are views of the work buffer: they are only valid until
+    the next table is requested.
+
+    Parameters:
+    - blocks: Iterable of 1-D NumPy arrays, or of (channels, samples) arrays.
+    - segment_length: Length of one segment in samples.
+    - blocksize: Approximate number of samples per yielded table.
+
+    Returns:
+    - Generator of SegmentTables; only the last one may end with a shorter segment.
+    """
+    if segment_length <= 0:
+        raise ValueError("segment_length must be greater than 0.")
+    capacity = max(blocksize // segment_length, 1) * segment_length
+    work = None
+    fill = 0
+    first_index = 0
+    for block in blocks:
+        if work is None:
+            work = np.empty(block.shape[:-1] + (capacity,), dtype=block.dtype)
+        pos = 0
+        while pos < block.shape[-1]:
+            take = min(capacity - fill, block.shape[-1] - pos)
+            work[..., fill:fill + take] = block[..., pos:pos + take]
+            fill += take
+            pos += take
+            if fill == capacity:
+                table = SegmentTable.from_length(work, segment_length, first_index=first_index)
+                yield table
+                first_index += len(table)
+                fill = 0
+    if fill:
+        yield SegmentTable.from_length(work[..., :fill], segment_length, first_index=first_index)
+
+
+def run_kernels(table, sample_rate, method, pattern='1 * n + 0', noise_type='white', noise_level=0.5,
+                shaping='fir', fade_percentage=15, curve='linear', seed=None, noise_bank=None, stages=None,
+                noise_pool=None, **options):
+    """
+    Run the manipulation and fade kernels on a SegmentTable in place.
+
+    Parameters:
+    - table: SegmentTable to process.
+    - sample_rate: Sampling rate of the audio.
+    - method: 'mute', 'noise', 'reverse' or None (fades only).
+    - pattern, noise_type, noise_level, shaping, fade_percentage, curve: see process_blocks.
+    - seed: Job seed (int or numpy SeedSequence); the noise of every segment then follows from
+      the seed and the segment's global index, whichever table it is processed in.
+    - noise_bank: NoiseBank to draw noise from; overrides seed (e.g. one bank shared by all blocks).
+    - noise_pool: Precomputed noise for seeded noise (see noise_bank.precompute_noise).
+    - stages: Registered pipeline stage names to run instead of method + fades (see pipeline.STAGES).
+    - options: Further settings for the stages (e.g. semitones for 'pitch').
+
+    Returns:
+    - The same table.
+    """
+    if stages:
+        for kernel in stage_kernels(sample_rate, stages, pattern=pattern, noise_type=noise_type,
+                                    noise_level=noise_level, shaping=shaping, fade_percentage=fade_percentage,
+                                    curve=curve, seed=seed, noise_pool=noise_pool, **options):
+            kernel(table)
+        return table
+    if method == 'reverse':
+        reverse_segments(table, pattern)
+    elif method is not None:
+        if method == 'noise' and noise_bank is None:
+            noise_bank = NoiseBank(sample_rate, noise_type, shaping, seed=seed, pool=noise_pool)
+        manipulate_segments(table, method, sample_rate, noise_type, noise_level, noise_bank=noise_bank)
+    smooth_audio_list(table, sample_rate, fade_percentage=fade_percentage, curve=curve)
+    return table
+
+
+def process_blocks(blocks, sample_rate, segment_duration_ms, method, pattern='1 * n + 0',
+                   noise_type='white', noise_level=0.5, shaping='fir', fade_percentage=15, curve='linear',
+                   stages=None, seed=None, noise_pool=None, out=None, **options):
+    """
+    Run segmentation, manipulation and fades over a stream of blocks.
+
+    Parameters:
+    - blocks: Iterable of 1-D NumPy arrays, or of (channels, samples) arrays.
+    - sample_rate: Sampling rate of the audio.
+    - segment_duration_ms: Duration of each segment in milliseconds.
+    - method: 'mute', 'noise', 'reverse' or None (fades only).
+    - pattern: Segment pattern used by the 'reverse' method.
+    - noise_type, noise_level, shaping: Noise settings used by the 'noise' method.
+    - fade_percentage, curve: Fade settings (see smooth_audio_list).
+    - stages: Registered pipeline stage names to run instead of method + fades (see pipeline.STAGES).
+    - seed: Noise seed; the same seed gives the same output whatever the block size.
+    - noise_pool: Precomputed noise for seeded noise (see noise_bank.precompute_noise).
+    - out: Optional SegmentAssembler (e.g. a memmapped WAV file) that every processed block is
+      appended to as it is yielded; it is flushed when the stream ends.
+    - options: Further settings for the stages (e.g. semitones for 'pitch').
+
+    Returns:
+    - Generator of processed 1-D NumPy arrays. Each array is only valid until the next one is requested.
+    """
+    chunks = _process_blocks(blocks, sample_rate, segment_duration_ms, method, pattern, noise_type, noise_level,
+                             shaping, fade_percentage, curve, stages, seed, noise_pool, **options)
+    if out is None:
+        return chunks
+    return _assemble(chunks, out)
+
+
+def _assemble(chunks, assembler):
+    for chunk in chunks:
+        assembler.append(chunk)
+        yield chunk
+    assembler.flush()
+
+
+def _process_blocks(blocks, sample_rate, segment_duration_ms, method, pattern, noise_type, noise_level, shaping,
+                    fade_percentage, curve, stages, seed, noise_pool, **options):
+    segment_length = int(sample_rate * segment_duration_ms / 1000)
+    if segment_length <= 0:
+        raise ValueError("segment_duration_ms is too short for the given sample_rate")
+    if stages:
+        #kernels are built once, so stateful stages (noise) continue across blocks
+        kernels = stage_kernels(sample_rate, stages, pattern=pattern, noise_type=noise_type, noise_level=noise_level,
+                                shaping=shaping, fade_percentage=fade_percentage, curve=curve, seed=seed,
+                                noise_pool=noise_pool, **options)
+        for table in segment_blocks(blocks, segment_length):
+            for kernel in kernels:
+                kernel(table)
+            yield concatenate_segments(table)
+        return
+    if method not in ['mute', 'noise', 'reverse', None]:
+        raise ValueError("method must be 'mute', 'noise', 'reverse' or None.")
+
+    #one noise stream for the whole job, shared by all blocks
+    noise_bank = None
+    if method == 'noise':
+        check_noise_type(noise_type, shaping)
+        noise_bank = NoiseBank(sample_rate, noise_type, shaping, seed=seed, pool=noise_pool)
+
+    for table in segment_blocks(blocks, segment_length):
+        run_kernels(table, sample_rate, method, pattern=pattern, noise_type=noise_type, noise_level=noise_level,
+                    shaping=shaping, fade_percentage=fade_percentage, curve=curve, noise_bank=noise_bank)
+        yield concatenate_segments(table)
+
+
+def stream_process(input_file, output_file, segment_duration_ms, method, output_format=None,
+                   blocksize=DEFAULT_BLOCKSIZE, mono=True, **options):
+    """
+    Process an audio file block by block and write the result with constant memory use.
+
+    Parameters:
+    - input_file: Path of the input audio file.
+    - output_file: Path of the output audio file.
+    - segment_duration_ms: Duration of each segment in milliseconds.
+    - method: 'mute', 'noise', 'reverse' or None (fades only).
+    - output_format: soundfile format name (default: taken from the output file extension).
+    - blocksize: Number of samples per block.
+    - mono: Downmix to mono (default); False processes and writes all channels.
+    - options: Further keyword arguments for process_blocks (pattern, noise_type, noise_level, ...).
+
+    Returns:
+    - Number of samples written (per channel).
+    """
+    import soundfile as sf
+
+    sample_rate, blocks = load_blocks(input_file, blocksize=blocksize, mono=mono)
+    channels = 1 if mono else sf.info(input_file).channels
+    output_folder = os.path.dirname(output_file)
+    if output_folder:
+        os.makedirs(output_folder, exist_ok=True)
+
+    written = 0
+    with sf.SoundFile(output_file, 'w', samplerate=sample_rate, channels=channels,
+                      format=output_format.upper() if output_format else None) as out:
+        for chunk in process_blocks(blocks, sample_rate, segment_duration_ms, method, **options):
+            #soundfile takes (frames, channels)
+            out.write(chunk.T)
+            written += chunk.shape[-1]
+    return written
@@ -0,0 +1,210 @@
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .library1 import SegmentTable
+from .library3 import segment_rms
+from .library4 import export_audio
+from .noise_bank import NoiseBank, check_noise_type
+from .pipeline import stage_kernels
+
+#methods a sweep can vary; 'noise' is crossed with the noise types and levels
+SWEEP_METHODS = ('mute', 'noise', 'reverse')
+#columns of the index file, one row per variant
+INDEX_FIELDS = ('file', 'segment', 'method', 'noise_type', 'noise_level', 'fade_percentage', 'ok', 'error',
+                'seconds')
+
+
+def sweep_variants(segments=(100,), methods=SWEEP_METHODS, noise_types=('white', 'pink'), noise_levels=(0.5,),
+                   fade_percentages=(15,)):
+    """
+    Expand a parameter grid into its variants.
+
+    Noise types and levels only multiply the 'noise' method; mute and reverse
+    variants do not depend on them.
+
+    Parameters:
+    - segments: Segment durations in milliseconds.
+    - methods: Any of 'mute', 'noise', 'reverse'.
+    - noise_types: Noise types of the 'noise' variants.
+    - noise_levels: Noise levels of the 'noise' variants.
+    - fade_percentages: Fade percentages (0 - 50) applied to every variant.
+
+    Returns:
+    - List of variant dicts with segment, method, noise_type, noise_level and fade_percentage
+      (noise_type and noise_level are None for mute and reverse).
+    """
+    for method in methods:
+        if method not in SWEEP_METHODS:
+            raise ValueError(f"Unsupported sweep method '{method}'. Choose from {', '.join(SWEEP_METHODS)}.")
+    for fade_percentage in fade_percentages:
+        if not (0 <= fade_percentage <= 50):
+            raise ValueError("The fade_percentage must be between 0 and 50.")
+    variants = []
+    for segment, method in itertools.product(segments, dict.fromkeys(methods)):
+        if method == 'noise':
+            manipulations = [(noise_type, noise_level) for noise_type in dict.fromkeys(noise_types)
+                             for noise_level in dict.fromkeys(noise_levels)]
+        else:
+            manipulations = [(None, None)]
+        for (noise_type, noise_level), fade_percentage in itertools.product(manipulations,
+                                                                             dict.fromkeys(fade_percentages)):
+            variants.append(dict(segment=segment, method=method, noise_type=noise_type, noise_level=noise_level,
+                                 fade_percentage=fade_percentage))
+    return variants
+
+
+def sweep_plan(variants):
+    """
+    Group variants by the intermediates they share.
+
+    Returns:
+    - Dict segment -> {manipulation: [variants]}, where a manipulation is ('mute',),
+      ('reverse',) or ('noise', noise_type, noise_level). All variants of a segment
+      duration share its segment table and per-segment RMS, the noise variants of a
+      noise type share its unit noise, and the variants of a manipulation differ only
+      in their fades.
+    """
+    plan = {}
+    for variant in variants:
+        manipulation = (variant['method'],)
+        if variant['method'] == 'noise':
+            manipulation += (variant['noise_type'], variant['noise_level'])
+        plan.setdefault(variant['segment'], {}).setdefault(manipulation, []).append(variant)
+    return plan
+
+
+def variant_name(stem, variant):
+    """
+    Return the output name (without extension) of a variant, e.g. 'speech_20ms_noise_pink_0.5_fade15'.
+    """
+    parts = [stem, f"{variant['segment']:g}ms", variant['method']]
+    if variant['method'] == 'noise':
+        parts += [variant['noise_type'], f"{variant['noise_level']:g}"]
+    return '_'.join(parts + [f"fade{variant['fade_percentage']:g}"])
+
+
+class _SegmentShare:
+    """
+    Intermediates of one segment duration: the segment layout, the RMS of the noised
+    (even) segments and the unit noise of every noise type, each computed once.
+    """
+
+    def __init__(self, audio, sample_rate, segment_duration_ms, noise_types, shaping, seed):
+        self.segment_length = int(sample_rate * segment_duration_ms / 1000)
+        if self.segment_length <= 0:
+            raise ValueError("segment_duration_ms is too short for the given sample_rate")
+        table = SegmentTable.from_length(audio, self.segment_length)
+        channels = audio.shape[0] if audio.ndim > 1 else 1
+        #the noise stage replaces the segments with even indices: whole rows, then the short last one
+        self.tails = [i for i in table.tail_indices if i % 2 == 0]
+        self.rms = [segment_rms(table.rows[..., 0::2, :])] + [segment_rms(table[i]) for i in self.tails]
+        self.noise = {}
+        for noise_type in noise_types:
+            bank = NoiseBank(sample_rate, noise_type, shaping, dtype=audio.dtype, seed=seed)
+            rows = table.rows[..., 0::2, :]
+            parts = [bank.segments(np.arange(0, table.n_rows, 2), rows.shape[-1], channels).reshape(rows.shape)]
+            for i in self.tails:
+                grouped = bool(table.lengths[i] == self.segment_length)
+                parts.append(bank.segments([i], table.lengths[i], channels, grouped=grouped).reshape(table[i].shape))
+            self.noise[noise_type] = parts
+
+    def targets(self, table):
+        #the views the noise replaces, in the order of self.rms and self.noise
+        return [table.rows[..., 0::2, :]] + [table[i] for i in self.tails]
+
+
+def _manipulate(audio, sample_rate, share, manipulation, pattern):
+    result = audio.copy()
+    table = SegmentTable.from_length(result, share.segment_length)
+    method = manipulation[0]
+    if method == 'noise':
+        _, noise_type, noise_level = manipulation
+        #the unit noise times the segment RMS times the level, as the noise stage scales it
+        for target, rms, noise in zip(share.targets(table), share.rms, share.noise[noise_type]):
+            np.multiply(noise, (rms * noise_level).astype(noise.dtype)[..., None], out=target)
+    else:
+        for kernel in stage_kernels(sample_rate, [method], pattern=pattern):
+            kernel(table)
+    return result
+
+
+def _run_manipulation(audio, sample_rate, share, manipulation, variants, stem, output_folder, output_format,
+                      bitrate, pattern, curve):
+    started = time.perf_counter()
+    manipulated = _manipulate(audio, sample_rate, share, manipulation, pattern)
+    rows = []
+    for number, variant in enumerate(variants):
+        #the last fade can work on the manipulated audio itself
+        faded = manipulated if number == len(variants) - 1 else manipulated.copy()
+        table = SegmentTable.from_length(faded, share.segment_length)
+        for kernel in stage_kernels(sample_rate, ['fade'], fade_percentage=variant['fade_percentage'], curve=curve):
+            kernel(table)
+        result = export_audio(faded, sample_rate, output_folder, variant_name(stem, variant),
+                              targets=[(output_format, bitrate)])[0]
+        rows.append(dict(variant, file=os.path.basename(result.path), ok=result.ok, error=result.error,
+                         seconds=round(time.perf_counter() - started, 6)))
+        started = time.perf_counter()
+    return rows
+
+
+def run_sweep(audio, sample_rate, output_folder, variants, stem='sweep', workers=None, output_format='wav',
+              bitrate='192k', pattern='1 * n + 0', shaping='fir', curve='linear', seed=0, index_name='index.csv'):
+    """
+    Produce every variant of a parameter sweep from one decoded audio, sharing the work they have in common.
+
+    The plan (see sweep_plan) is run level by level: the segment layout and the RMS
+    of the noised segments once per segment duration, the unit noise once per duration
+    and noise type, the manipulation once per manipulation, and only the fades and the
+    export once per variant. Manipulations run in parallel on a thread pool; the NumPy
+    kernels and the encoders release the GIL, and the audio is shared, not copied to
+    worker processes. Every output equals the Pipeline output of its variant.
+
+    Parameters:
+    - audio: Decoded 1-D or (channels, samples) float audio; it is not modified.
+    - sample_rate: Sampling rate of the audio.
+    - output_folder: Folder for the outputs and the index file (created if needed).
+    - variants: Variant dicts (see sweep_variants).
+    - stem: Prefix of the output names (see variant_name).
+    - workers: Threads (default: os.cpu_count()).
+    - output_format, bitrate: Output format and MP3 bitrate (see library4.export_audio).
+    - pattern, shaping, curve: Reverse pattern, noise shaping and fade curve of every variant.
+    - seed: Noise seed; the noise variants of a type share it, so they differ only in level.
+    - index_name: Name of the CSV index file written to output_folder (one row per variant).
+
+    Returns:
+    - List of index rows (dicts with INDEX_FIELDS), in the order of the variants.
+    """
+    if seed is None:
+        raise ValueError("A sweep needs a noise seed, so that its noise variants are comparable.")
+    audio = np.asarray(audio)
+    plan = sweep_plan(variants)
+    for variant in variants:
+        if variant['method'] == 'noise':
+            check_noise_type(variant['noise_type'], shaping)
+    os.makedirs(output_folder, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    def share(segment):
+        noise_types = {manipulation[1] for manipulation in plan[segment] if manipulation[0] == 'noise'}
+        return _SegmentShare(audio, sample_rate, segment, sorted(noise_types), shaping, seed)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        shares = dict(zip(plan, pool.map(share, plan)))
+        futures = [pool.submit(_run_manipulation, audio, sample_rate, shares[segment], manipulation, group, stem,
+                               output_folder, output_format, bitrate, pattern, curve)
+                   for segment, manipulations in plan.items() for manipulation, group in manipulations.items()]
+        done = [row for future in futures for row in future.result()]
+
+    #the index lists the variants in the order they were asked for
+    order = {variant_name(stem, variant): number for number, variant in enumerate(variants)}
+    done.sort(key=lambda row: order[variant_name(stem, row)])
+    with open(os.path.join(output_folder, index_name), 'w', newline='') as file:
+        writer = csv.DictWriter(file, INDEX_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(done)
+    return done
@@ -1,13 +1,101 @@
+import argparse
+import importlib
+import json
 import os
-import librosa
-import soundfile as sf
-# Import all functions from the libraries package
-from libraries import *
+import sys
+# Import the functions used here; libraries loads each one lazily on first use
+from libraries import energy_boundaries, export_audio, load_audio, save_audio, stream_process
+from libraries.cache import AudioCache, cached_load, cached_run
+from libraries.dtypes import dtype_policy, get_dtype
+from libraries.library6 import SegmentAssembler
+from libraries.loader import LazyAudio, load_blocks
+from libraries.pipeline import Pipeline
+from libraries.noise_bank import precompute_noise
+from libraries.instrumentation import JsonLinesSink, add_sink, remove_sink, stage
+from libraries.streaming import DEFAULT_BLOCKSIZE, process_blocks, read_pcm_blocks, write_pcm
 
 
 # Define pathsm
 DATA_FOLDER = "data"
 OUTPUT_FOLDER = "output"
+# Inputs longer than this (in seconds) are processed block by block with constant memory
+STREAMING_THRESHOLD_S = 600
+
+# Interactive menu choices: (method, noise_type)
+METHODS = {
+    "1": ("mute", 'white'),
+    "2": ("noise", 'white'),
+    "3": ("noise", 'pink'),
+    "4": ("reverse", None),
+}
+
+# Command line method names: (method, noise_type); None keeps the --noise-type flag
+CLI_METHODS = {
+    "mute": ("mute", None),
+    "noise": ("noise", None),
+    "whitenoise": ("noise", 'white'),
+    "pinknoise": ("noise", 'pink'),
+    "reverse": ("reverse", None),
+    "pitch": ("pitch", None),
+}
+
+def is_long_recording(input_file):
+    # soundfile can read the header without decoding; unknown formats take the in-memory path
+    import soundfile as sf
+
+    try:
+        return sf.info(input_file).duration > STREAMING_THRESHOLD_S
+    except Exception:
+        return False
+
+def ask_output_name():
+    while True:
+        try:
+            output_name = input("Enter the Output's name without it's extension: ")
+            break
+        except Exception as e:
+            print(e)
+            continue
+    return output_name
+
+def pipeline_stages(method):
+    """Stage names for a manipulation method: the method itself (if any) followed by the fades."""
+    return ([method] if method else []) + ["fade"]
+
+def prepare_noise_pool(args, sample_rate):
+    """Returns the --noise-pool file for the options, precomputing it first if it does not exist yet."""
+    if not args.noise_pool:
+        return None
+    if not os.path.exists(args.noise_pool):
+        noise_type = CLI_METHODS[args.method][1]
+        precompute_noise(args.noise_pool, sample_rate, noise_type or args.noise_type, args.shaping,
+                         seed=args.seed or 0)
+    return args.noise_pool
+
+def apply_pipeline(audio, sr, segment_duration_ms, method, noise_type='white', noise_level=0.5,
+                   pattern='1 * n + 0', fade_percentage=15, shaping='fir', curve='linear', stages=None,
+                   cache=None, audio_key=None, semitones=2.0, boundaries=None, seed=None, noise_pool=None, out=None):
+    """Runs segmentation, manipulation, smoothing and concatenation on a loaded audio as one fused pass.
+    With a cache (and the cache key of the audio) every stage output is cached and reruns resume from it.
+    With boundaries (see energy_boundaries) the segments follow them instead of segment_duration_ms.
+    With out (an array or a SegmentAssembler) the result is written there instead of into the audio."""
+    stages = stages or pipeline_stages(method)
+    pipeline = Pipeline.from_names(sr, segment_duration_ms, stages, noise_type=noise_type, noise_level=noise_level,
+                                   pattern=pattern, fade_percentage=fade_percentage, shaping=shaping, curve=curve,
+                                   semitones=semitones, seed=seed, noise_pool=noise_pool)
+    # Every stage reports its own record (summed over the fused chunks), the whole pass one more
+    segments = len(boundaries) - 1 if boundaries is not None else -(-audio.shape[-1] // pipeline.segment_length)
+    with stage("pipeline", samples=audio.shape[-1], segments=segments, stages=",".join(pipeline.names)):
+        if cache is not None:
+            result = cached_run(pipeline, audio, audio_key, cache, out=getattr(out, "output", out),
+                                boundaries=boundaries)
+            if out is not None and hasattr(out, "flush"):
+                out.flush()
+            return result
+        # without out the loaded audio is processed in place (a lazily read WAV gets a new array)
+        if out is None and not isinstance(audio, LazyAudio):
+            out = audio
+        return pipeline.run(audio, out=out, boundaries=boundaries)
 
 def main():
     print("Welcome to the Voice Manipulation Project!")
@@ -22,7 +110,7 @@ def main():
         except ValueError:
             print("The input format is not vaild. try again \n")
             continue
-        
+
     # Receives and checks the File
     while True:
         try:
@@ -35,7 +123,7 @@ def main():
         except Exception as e:
             print(e)
             continue
-        
+
     # Receives and checks the method
     while True:
         try:
@@ -48,40 +136,368 @@ def main():
             print(e)
             continue
 
+    manipulation, noise_type = METHODS[method]
+    if is_long_recording(input_file):
+        # Long recordings never get loaded whole: blocks are read, processed and written in turn
+        output_name = ask_output_name()
+        output_file = os.path.join(OUTPUT_FOLDER, f"{output_name}.wav")
+        print("Applying manipulations block by block...")
+        stream_process(input_file, output_file, segment_duration_ms, manipulation,
+                       pattern='1 * n + 0', noise_type=noise_type or 'white', noise_level=0.5,
+                       fade_percentage=15)
+        print(f"Audio saved: {output_file}")
+        return
+
     # Load the audio and sampling rate
     print("Loading audio file...")
-    audio, sr = librosa.load(input_file, sr=None)
+    audio, sr = load_audio(input_file)
 
     # Apply the processing pipeline
     print("Applying manipulations...")
-    
-    audiolist = segment_audio_by_duration(audio, sr, segment_duration_ms) #Function from library1
-    match method:
-        case "1":
-            audiolist = manipulate_segments(audiolist, "mute", sr, 'white', 0.5) # Function from library3
-        case "2":
-            audiolist = manipulate_segments(audiolist, "noise", sr, 'white', 0.5) # Function from library3
-        case "3":
-            audiolist = manipulate_segments(audiolist, "noise", sr, 'pink', 0.5) # Function from library3
-        case "4":
-            audiolist = reverse_segments(audiolist,'1 * n + 0')  # Function from library2
-        case _:
-            print("invalid manipulation input.")
-    
-    audiolist = smooth_audio_list(audiolist, sr, fade_percentage=15)  # Function from library5 audio_arrays, sample_rate, fade_percentage=15
-    audio = concatenate_segments(audiolist)  # Function from library6
-
+    audio = apply_pipeline(audio, sr, segment_duration_ms, manipulation, noise_type or 'white', 0.5)
 
     # Save in different formats
     # Save the output audio in WAV and MP3 formats.
-    while True:
-        try:
-            output_name = input("Enter the Output's name without it's extension: ")
-            break
-        except Exception as e:
-            print(e)
-            continue 
+    output_name = ask_output_name()
     save_audio(audio, sr, OUTPUT_FOLDER, output_name=output_name, output_format="wav")
 
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Voice Manipulation Project: segment an audio and mute, noise or reverse its segments.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--file", help="input audio file")
+    source.add_argument("--raw", action="store_true",
+                        help="read raw PCM from stdin and write processed PCM to stdout")
+    source.add_argument("--serve", action="store_true",
+                        help="run the local HTTP processing service (POST /process, GET /metrics)")
+    source.add_argument("--batch", metavar="MANIFEST",
+                        help="run every job of a CSV or JSON lines manifest (input, output, method, ...) "
+                             "with --workers processes; an interrupted run resumes where it stopped")
+    parser.add_argument("--method", "--action", dest="method", choices=sorted(CLI_METHODS), default="reverse",
+                        help="manipulation method (default: reverse)")
+    parser.add_argument("--segment", type=int, default=100, help="segment duration in ms (default: 100)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="cut segments at low-energy points (pauses) instead of every --segment ms")
+    parser.add_argument("--min-segment", type=int, default=100,
+                        help="shortest adaptive segment in ms (default: 100)")
+    parser.add_argument("--max-segment", type=int, default=1000,
+                        help="longest adaptive segment in ms (default: 1000)")
+    parser.add_argument("--pattern", default="1 * n + 0",
+                        help="segment pattern for reverse and pitch (default: '1 * n + 0')")
+    parser.add_argument("--semitones", type=float, default=2.0,
+                        help="pitch shift in semitones for --method pitch, negative is lower (default: 2)")
+    parser.add_argument("--noise-type", default="white", help="white, pink (and brown, blue with --shaping fft)")
+    parser.add_argument("--seed", type=int,
+                        help="noise seed: the same seed gives the same output for any --workers or --blocksize")
+    parser.add_argument("--noise-pool",
+                        help="memory-mapped .npy file of precomputed noise for seeded noise; created if missing")
+    parser.add_argument("--noise-level", type=float, default=0.5, help="noise RMS relative to the segment (default: 0.5)")
+    parser.add_argument("--shaping", choices=["fir", "fft"], default="fir", help="noise shaping (default: fir)")
+    parser.add_argument("--fade", type=float, default=15, help="fade percentage per segment, 0-50 (default: 15)")
+    parser.add_argument("--curve", choices=["linear", "equal_power", "raised_cosine"], default="linear",
+                        help="fade curve (default: linear)")
+    parser.add_argument("--format", default="wav",
+                        help="output format(s), comma separated: wav, flac, mp3, ... (default: wav)")
+    parser.add_argument("--bitrate", default="192k", help="bitrate for mp3 output (default: 192k)")
+    parser.add_argument("--output", help="output name without extension (default: <input>_<method>)")
+    parser.add_argument("--output-folder", default=OUTPUT_FOLDER, help=f"output folder (default: {OUTPUT_FOLDER})")
+    parser.add_argument("--memmap-output", action="store_true",
+                        help="write the result as a float32 WAV that is memory-mapped and filled in place "
+                             "(<output>.wav) instead of encoding --format")
+    parser.add_argument("--stream", action="store_true",
+                        help="process the file block by block even if it is short")
+    parser.add_argument("--sweep", action="store_true",
+                        help="write every variant of the --sweep-* grid for --file, decoding it once, plus an index.csv")
+    parser.add_argument("--sweep-segments", help="comma separated segment durations in ms (default: --segment)")
+    parser.add_argument("--sweep-methods", default="mute,noise,reverse",
+                        help="comma separated methods of the sweep: mute, noise, reverse (default: all three)")
+    parser.add_argument("--sweep-noise-types", default="white,pink",
+                        help="comma separated noise types of the noise variants (default: white,pink)")
+    parser.add_argument("--sweep-levels", help="comma separated noise levels (default: --noise-level)")
+    parser.add_argument("--sweep-fades", help="comma separated fade percentages (default: --fade)")
+    parser.add_argument("--realtime", action="store_true",
+                        help="run the real-time block engine: a file is fed as a live feed, --raw is answered block by block")
+    parser.add_argument("--realtime-block", type=int, default=512,
+                        help="samples per real-time block (default: 512)")
+    parser.add_argument("--latency", type=float,
+                        help="real-time output delay in ms, at least one segment for reverse and noise "
+                             "(default: the smallest possible)")
+    parser.add_argument("--realtime-speed", type=float, default=0,
+                        help="pace a --realtime file at this multiple of real time; 0 runs as fast as possible (default)")
+    parser.add_argument("--sample-rate", type=int, default=44100, help="sample rate of raw PCM (default: 44100)")
+    parser.add_argument("--channels", type=int, default=1,
+                        help="channels of raw PCM input, downmixed to mono unless --multichannel (default: 1)")
+    parser.add_argument("--multichannel", action="store_true",
+                        help="keep every channel instead of downmixing to mono; all channels are processed in one pass")
+    parser.add_argument("--pcm", choices=["s16le", "f32le"], default="s16le", help="raw PCM sample format (default: s16le)")
+    parser.add_argument("--blocksize", type=int, default=DEFAULT_BLOCKSIZE, help="samples per processing block")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes for in-memory processing; 0 uses every core (default: 1)")
+    parser.add_argument("--batch-log",
+                        help="completion log of --batch (default: <manifest>.log.jsonl)")
+    parser.add_argument("--host", default="127.0.0.1", help="address of --serve (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="port of --serve (default: 8000)")
+    parser.add_argument("--queue-size", type=int, default=8,
+                        help="requests --serve queues for a worker before turning new ones away (default: 8)")
+    parser.add_argument("--stages",
+                        help="comma separated pipeline stages to run instead of --method, e.g. noise,reverse,fade")
+    parser.add_argument("--plugin", action="append", default=[],
+                        help="import this module first, so the stages it registers can be used in --stages")
+    parser.add_argument("--cache", action="store_true",
+                        help="cache the decoded input and every stage output, so reruns skip unchanged work")
+    parser.add_argument("--cache-dir", help="cache folder (default: $VOICE_CACHE_DIR or ~/.cache/voice-manipulation)")
+    parser.add_argument("--cache-size", type=int, default=2048, help="cache size bound in MB (default: 2048)")
+    parser.add_argument("--metrics", help="append per-stage timing records as JSON lines to this file ('-' for stderr)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also record allocated bytes per stage in the metrics (slower)")
+    parser.add_argument("--dtype", choices=["float32", "float64"],
+                        help="sample precision of the processing (default: $VOICE_DTYPE or float32)")
+    return parser
+
+def run_cli(args):
+    sink = JsonLinesSink(args.metrics) if args.metrics else None
+    if sink is not None:
+        add_sink(sink, trace_memory=args.trace_memory)
+    try:
+        with dtype_policy(args.dtype or get_dtype()):
+            process_cli(args)
+    finally:
+        if sink is not None:
+            remove_sink(sink)
+            sink.close()
+
+def run_batch_cli(args):
+    from libraries.batch import run_batch
+
+    if not os.path.exists(args.batch):
+        raise SystemExit(f"Manifest {args.batch} not found!")
+
+    def report(record):
+        if record["status"] == "failed":
+            print(f"Job {record['id']} failed: {record['error']}")
+
+    with stage("batch", workers=args.workers) as current:
+        try:
+            summary = run_batch(args.batch, args.batch_log, workers=args.workers or None, on_record=report)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        current.update(jobs=summary["jobs"], done=summary["done"], failed=summary["failed"],
+                       audio_seconds=summary["audio_seconds"])
+    print(f"{summary['done']} done, {summary['failed']} failed, {summary['skipped']} already done "
+          f"of {summary['jobs']} jobs in {summary['seconds']:.1f}s ({summary['audio_seconds']:.1f}s of audio). "
+          f"Log: {summary['log']}")
+    if summary["failed"]:
+        raise SystemExit(1)
+
+def comma_list(value, kind, default):
+    """Parses a comma separated --sweep-* list; None gives [default]."""
+    if value is None:
+        return [default]
+    try:
+        return [kind(item.strip()) for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise SystemExit(f"Invalid list: {value}")
+
+def run_sweep_cli(args):
+    from libraries.sweep import run_sweep, sweep_variants
+
+    try:
+        variants = sweep_variants(segments=comma_list(args.sweep_segments, float, args.segment),
+                                  methods=comma_list(args.sweep_methods, str, "reverse"),
+                                  noise_types=comma_list(args.sweep_noise_types, str, "white"),
+                                  noise_levels=comma_list(args.sweep_levels, float, args.noise_level),
+                                  fade_percentages=comma_list(args.sweep_fades, float, args.fade))
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print("Loading audio file...")
+    with stage("load") as current:
+        if args.cache:
+            cache = AudioCache(args.cache_dir, args.cache_size << 20)
+            audio, sr, _ = cached_load(args.file, cache, mono=not args.multichannel)
+        else:
+            audio, sr = load_audio(args.file, mono=not args.multichannel)
+        current.update(samples=audio.shape[-1], sample_rate=sr)
+    print(f"Writing {len(variants)} variants...")
+    stem = args.output or os.path.splitext(os.path.basename(args.file))[0]
+    output_format = args.format.split(",")[0].strip().partition(":")[0].lower()
+    with stage("sweep", samples=audio.shape[-1], variants=len(variants)):
+        rows = run_sweep(audio, sr, args.output_folder, variants, stem=stem, workers=args.workers or None,
+                         output_format=output_format, bitrate=args.bitrate, pattern=args.pattern,
+                         shaping=args.shaping, curve=args.curve, seed=0 if args.seed is None else args.seed)
+    for row in rows:
+        if not row["ok"]:
+            print(f"Error saving {row['file']}: {row['error']}")
+    print(f"{sum(row['ok'] for row in rows)} variants saved in {args.output_folder}, "
+          f"index: {os.path.join(args.output_folder, 'index.csv')}")
+
+def process_cli(args):
+    if args.serve:
+        # the service imports asyncio and its pool only when it is used
+        from libraries.service import run_service
+        run_service(args.host, args.port, workers=args.workers or None, queue_size=args.queue_size)
+        return
+    if args.batch:
+        run_batch_cli(args)
+        return
+    method, noise_type = CLI_METHODS[args.method]
+    options = dict(pattern=args.pattern, noise_type=noise_type or args.noise_type, noise_level=args.noise_level,
+                   shaping=args.shaping, fade_percentage=args.fade, curve=args.curve, semitones=args.semitones,
+                   seed=args.seed)
+    for module in args.plugin:
+        importlib.import_module(module)
+    if args.stages:
+        # custom stages replace --method everywhere: in memory, streamed, raw and in the workers
+        options["stages"] = [name.strip() for name in args.stages.split(",") if name.strip()]
+    elif method == "pitch":
+        # pitch only exists as a pipeline stage, which the streamed, raw and worker paths run as well
+        options["stages"] = pipeline_stages(method)
+
+    if args.adaptive and (args.raw or args.stream or args.realtime or args.sweep or args.workers != 1):
+        raise SystemExit("--adaptive needs the whole audio in memory and cannot be used with "
+                         "--raw, --stream, --realtime, --sweep or --workers")
+    if args.sweep and not args.file:
+        raise SystemExit("--sweep needs an input --file")
+
+    if args.raw and args.realtime:
+        # a live feed: every block is answered at once, delayed by the engine's latency
+        from libraries.realtime import RealtimeEngine, simulate
+        options["noise_pool"] = prepare_noise_pool(args, args.sample_rate)
+        engine = RealtimeEngine(args.sample_rate, args.realtime_block, args.segment, method, latency_ms=args.latency,
+                                channels=args.channels if args.multichannel else None, **options)
+        blocks = read_pcm_blocks(sys.stdin.buffer, args.pcm, args.channels, args.realtime_block,
+                                 mono=not args.multichannel)
+        for chunk in simulate(engine, blocks):
+            write_pcm(sys.stdout.buffer, chunk, args.pcm)
+            sys.stdout.buffer.flush()
+        print(json.dumps(engine.report()), file=sys.stderr)
+        return
+
+    if args.raw:
+        # stdout carries the audio, so nothing else may be printed there
+        options["noise_pool"] = prepare_noise_pool(args, args.sample_rate)
+        blocks = read_pcm_blocks(sys.stdin.buffer, args.pcm, args.channels, args.blocksize, mono=not args.multichannel)
+        with stage("raw", method=method) as current:
+            samples = 0
+            for chunk in process_blocks(blocks, args.sample_rate, args.segment, method, **options):
+                write_pcm(sys.stdout.buffer, chunk, args.pcm)
+                samples += chunk.shape[-1]
+            sys.stdout.buffer.flush()
+            current.update(samples=samples)
+        return
+
+    if not os.path.exists(args.file):
+        raise SystemExit(f"Input file {args.file} not found!")
+    label = "_".join(options["stages"]) if args.stages else args.method
+    output_name = args.output or f"{os.path.splitext(os.path.basename(args.file))[0]}_{label}"
+    output_formats = [name.strip().lower() for name in args.format.split(",") if name.strip()]
+    output_format = output_formats[0].partition(":")[0]
+
+    import soundfile as sf
+
+    if args.sweep:
+        run_sweep_cli(args)
+        return
+
+    if args.realtime:
+        from libraries.realtime import realtime_process
+        output_file = os.path.join(args.output_folder, f"{output_name}.{output_format}")
+        options["noise_pool"] = prepare_noise_pool(args, sf.info(args.file).samplerate)
+        print("Applying manipulations in real-time blocks...")
+        report = realtime_process(args.file, output_file, args.segment, method, block_size=args.realtime_block,
+                                  latency_ms=args.latency, speed=args.realtime_speed or None,
+                                  mono=not args.multichannel, output_format=output_format, **options)
+        print(f"Audio saved: {output_file}")
+        print(f"{report['blocks']} blocks of {report['deadline_ms']:.2f} ms, latency {report['latency_ms']:.1f} ms: "
+              f"mean {report.get('mean_ms', 0):.3f} ms, p99 {report.get('p99_ms', 0):.3f} ms, "
+              f"max {report.get('max_ms', 0):.3f} ms, {report['overruns']} over the deadline")
+        return
+
+    # adaptive boundaries are searched over the whole recording, so it is always loaded
+    streamed = not args.adaptive and (args.stream or is_long_recording(args.file))
+    if streamed and args.memmap_output:
+        # every processed block is copied straight into the memory-mapped output file
+        info = sf.info(args.file)
+        output_file = os.path.join(args.output_folder, f"{output_name}.wav")
+        os.makedirs(args.output_folder, exist_ok=True)
+        assembler = SegmentAssembler(info.frames, "float32", path=output_file, sample_rate=info.samplerate,
+                                     channels=info.channels if args.multichannel else None)
+        options["noise_pool"] = prepare_noise_pool(args, info.samplerate)
+        sample_rate, blocks = load_blocks(args.file, blocksize=args.blocksize, mono=not args.multichannel)
+        print("Applying manipulations block by block...")
+        with stage("stream", method=method) as current:
+            samples = 0
+            for chunk in process_blocks(blocks, sample_rate, args.segment, method, out=assembler, **options):
+                samples += chunk.shape[-1]
+            current.update(samples=samples)
+        print(f"Audio saved: {output_file}")
+        return
+    if streamed and len(output_formats) == 1 and output_format.upper() in sf.available_formats():
+        output_file = os.path.join(args.output_folder, f"{output_name}.{output_format}")
+        options["noise_pool"] = prepare_noise_pool(args, sf.info(args.file).samplerate)
+        print("Applying manipulations block by block...")
+        with stage("stream", method=method) as current:
+            current.update(samples=stream_process(args.file, output_file, args.segment, method,
+                                                  output_format=output_format, blocksize=args.blocksize,
+                                                  mono=not args.multichannel, **options))
+        print(f"Audio saved: {output_file}")
+        return
+
+    print("Loading audio file...")
+    cache = AudioCache(args.cache_dir, args.cache_size << 20) if args.cache else None
+    with stage("load", cached=cache is not None) as current:
+        if cache is not None:
+            # decoding (mp3 above all) is skipped when the same content was decoded before
+            audio, sr, audio_key = cached_load(args.file, cache, mono=not args.multichannel)
+        else:
+            # a WAV is only converted chunk by chunk inside the fused pipeline when nothing else needs the array
+            audio, sr = load_audio(args.file, mono=not args.multichannel,
+                                   lazy=not args.adaptive and args.workers == 1)
+        current.update(samples=audio.shape[-1], channels=audio.shape[0] if audio.ndim > 1 else 1, sample_rate=sr)
+    options["noise_pool"] = prepare_noise_pool(args, sr)
+    if args.adaptive:
+        with stage("segment", samples=audio.shape[-1]) as current:
+            options["boundaries"] = energy_boundaries(audio, sr, args.min_segment, args.max_segment)
+            current.update(segments=len(options["boundaries"]) - 1)
+    assembler = None
+    if args.memmap_output:
+        # the result goes straight into a memory-mapped float32 WAV file instead of a second buffer
+        os.makedirs(args.output_folder, exist_ok=True)
+        assembler = SegmentAssembler(audio.shape[-1], "float32", path=os.path.join(args.output_folder,
+                                     f"{output_name}.wav"), sample_rate=sr,
+                                     channels=audio.shape[0] if audio.ndim > 1 else None)
+    print("Applying manipulations...")
+    if args.workers != 1:
+        # the process pool machinery is only imported when it is used
+        from libraries.parallel import parallel_process
+        with stage("parallel", samples=audio.shape[-1], method=method, workers=args.workers):
+            audio = parallel_process(audio, sr, args.segment, method, workers=args.workers or None,
+                                     out=None if assembler is None else assembler.output, **options)
+        if assembler is not None:
+            assembler.flush()
+    elif cache is not None:
+        audio = apply_pipeline(audio, sr, args.segment, method, cache=cache, audio_key=audio_key, out=assembler,
+                               **options)
+    else:
+        audio = apply_pipeline(audio, sr, args.segment, method, out=assembler, **options)
+    if assembler is not None:
+        print(f"Audio saved: {assembler.path}")
+        return
+    # All formats are encoded concurrently from the same buffer
+    with stage("export", samples=audio.shape[-1], formats=len(output_formats)):
+        results = export_audio(audio, sr, args.output_folder, output_name,
+                               targets=[name if ":" in name else (name, args.bitrate) for name in output_formats])
+    for result in results:
+        if result.ok:
+            print(f"Audio saved: {result.path} ({result.bytes} bytes, {result.seconds:.2f}s)")
+        else:
+            print(f"Error saving {result.format}: {result.error}")
+
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1:
+        parser = build_parser()
+        args = parser.parse_args()
+        if not args.file and not args.raw and not args.serve and not args.batch:
+            parser.error("one of the arguments --file --raw --serve --batch is required")
+        run_cli(args)
+    else:
+        main()
@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+import soundfile as sf
+from libraries import *
+from libraries.batch import CompletionLog, read_manifest, run_batch
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.sample_rate = 8000
+        self.temp = tempfile.TemporaryDirectory()
+        self.folder = self.temp.name
+        self.audio = []
+        for number, seconds in enumerate((1, 3, 2)):
+            audio = np.random.default_rng(number).normal(0, 0.2, seconds * self.sample_rate).astype(np.float32)
+            sf.write(self.path(f'in{number}.wav'), audio, self.sample_rate, subtype='FLOAT')
+            self.audio.append(audio)
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.folder, name)
+
+    def write_manifest(self, rows, name='jobs.csv'):
+        path = self.path(name)
+        with open(path, 'w') as file:
+            if name.endswith('.jsonl'):
+                file.writelines(json.dumps(row) + '\n' for row in rows)
+            else:
+                file.write('\n'.join(rows) + '\n')
+        return path
+
+    def csv_manifest(self):
+        return self.write_manifest([
+            'id,input,output,method,segment,fade_percentage',
+            f"a,{self.path('in0.wav')},{self.path('out/a.wav')},reverse,50,0",
+            f"b,{self.path('in1.wav')},{self.path('out/b.wav')},mute,,",
+            f"c,{self.path('in2.wav')},{self.path('out/c.flac')},reverse,,",
+        ])
+
+    def test_read_manifest(self):
+        jobs = read_manifest(self.csv_manifest())
+        self.assertEqual([job['id'] for job in jobs], ['a', 'b', 'c'])
+        self.assertEqual(jobs[0]['kwargs'], dict(method='reverse', segment_duration_ms=50.0, fade_percentage=0.0,
+                                                 output_format='wav'))
+        self.assertEqual(jobs[2]['kwargs']['output_format'], 'flac')
+        jsonl = self.write_manifest([dict(input='x.wav', output='y.mp3', params=dict(method='noise', seed=2)),
+                                     dict(input='x.wav', output='z.wav', stages='reverse,fade')], 'jobs.jsonl')
+        first, second = read_manifest(jsonl)
+        self.assertEqual(first['id'], '1')
+        self.assertEqual(first['kwargs'], dict(method='noise', seed=2, output_format='mp3'))
+        self.assertEqual(second['kwargs']['stages'], ['reverse', 'fade'])
+
+    def test_invalid_manifests(self):
+        rows = [dict(input='x.wav', output='y.wav', volume=11)], [dict(input='x.wav')], \
+               [dict(input='x.wav', output='y')], [dict(input='x.wav', output='y.wav')] * 2
+        for row in rows:
+            with self.assertRaises(ValueError):
+                read_manifest(self.write_manifest(row, 'bad.jsonl'))
+
+    def test_run_and_resume(self):
+        manifest = self.csv_manifest()
+        records = []
+        summary = run_batch(manifest, workers=1, on_record=records.append)
+        self.assertEqual((summary['done'], summary['failed'], summary['skipped']), (3, 0, 0))
+        self.assertEqual(summary['audio_seconds'], 6.0)
+        #largest input first
+        self.assertEqual([record['id'] for record in records], ['b', 'c', 'a'])
+        result, _ = sf.read(self.path('out/a.wav'), dtype='float32')
+        np.testing.assert_allclose(result, self.audio[0].reshape(-1, 400)[:, ::-1].ravel(), atol=1e-4)
+        self.assertEqual(sorted(os.listdir(self.path('out'))), ['a.wav', 'b.wav', 'c.flac'])
+
+        summary = run_batch(manifest, workers=1)
+        self.assertEqual((summary['done'], summary['skipped']), (0, 3))
+        #a changed row is a new job
+        with open(manifest) as file:
+            text = file.read().replace('reverse,50,0', 'reverse,20,0')
+        with open(manifest, 'w') as file:
+            file.write(text)
+        summary = run_batch(manifest, workers=1)
+        self.assertEqual((summary['done'], summary['skipped']), (1, 2))
+
+    def test_failures_are_recorded_and_retried(self):
+        manifest = self.write_manifest([
+            'input,output', f"{self.path('missing.wav')},{self.path('out/x.wav')}",
+            f"{self.path('in0.wav')},{self.path('out/y.wav')}",
+        ])
+        summary = run_batch(manifest, workers=2)
+        self.assertEqual((summary['done'], summary['failed']), (1, 1))
+        records = CompletionLog.records(summary['log'])
+        failed = [record for record in records if record['status'] == 'failed']
+        self.assertEqual(failed[0]['id'], '1')
+        self.assertIn('error', failed[0])
+        self.assertEqual(os.listdir(self.path('out')), ['y.wav'])
+        summary = run_batch(manifest, workers=2)
+        self.assertEqual((summary['failed'], summary['skipped']), (1, 1))
+
+    def test_torn_log_line_is_ignored(self):
+        manifest = self.csv_manifest()
+        log_path = self.path('log.jsonl')
+        run_batch(manifest, log_path, workers=1)
+        with open(log_path, 'rb+') as file:
+            file.truncate(os.path.getsize(log_path) - 20)
+        summary = run_batch(manifest, log_path, workers=1)
+        self.assertEqual((summary['done'], summary['skipped']), (1, 2))
+        self.assertEqual(len(CompletionLog.records(log_path)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
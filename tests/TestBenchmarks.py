@@ -0,0 +1,36 @@
+import unittest
+import numpy as np
+from benchmarks.suite import BENCHMARKS, compare, run_suite, synthetic_signal
+
+
+def record(median_s, peak_bytes):
+    return {"median_s": median_s, "min_s": median_s, "peak_bytes": peak_bytes, "retained_blocks": 0}
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_synthetic_signal_is_reproducible(self):
+        signal = synthetic_signal(0.5, 8000)
+        self.assertEqual(signal.dtype, np.float32)
+        self.assertEqual(len(signal), 4000)
+        self.assertLess(np.max(np.abs(signal)), 1)
+        np.testing.assert_array_equal(signal, synthetic_signal(0.5, 8000))
+
+    def test_compare_flags_slowdowns_and_memory_growth(self):
+        baseline = {"a": record(0.100, 1000), "b": record(0.100, 1000), "c": record(0.0001, 1000)}
+        current = {"a": record(0.105, 1000), "b": record(0.200, 2000), "c": record(0.0005, 1000),
+                   "new": record(1.0, 1)}
+        regressions = compare(baseline, current)
+        #'a' is within the threshold and 'c' below the noise floor
+        self.assertEqual([(key, metric) for key, metric, *_ in regressions],
+                         [("b", "median_s"), ("b", "peak_bytes")])
+
+    def test_every_benchmark_runs(self):
+        results = run_suite([(0.2, 8000, 20)], list(BENCHMARKS), repeat=1, log=lambda line: None)
+        self.assertEqual(len(results), len(BENCHMARKS))
+        for result in results.values():
+            self.assertGreater(result["median_s"], 0)
+            self.assertGreaterEqual(result["peak_bytes"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import soundfile as sf
+from libraries.cache import AudioCache, cached_load, cached_run, file_digest
+from libraries.pipeline import Pipeline
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.cache = AudioCache(os.path.join(self.folder.name, "cache"))
+        self.sample_rate = 1000
+        self.audio = np.random.normal(0, 0.2, 5_000).astype(np.float32)
+        self.input_file = os.path.join(self.folder.name, "input.wav")
+        sf.write(self.input_file, self.audio, self.sample_rate, subtype="FLOAT")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_put_get_round_trip(self):
+        self.assertIsNone(self.cache.get("missing"))
+        self.cache.put("entry", self.audio, sample_rate=self.sample_rate)
+        array, meta = self.cache.get("entry")
+        self.assertIsInstance(array, np.memmap)
+        self.assertFalse(array.flags.writeable)
+        np.testing.assert_array_equal(array, self.audio)
+        self.assertEqual(meta, {"sample_rate": self.sample_rate})
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.cache.max_bytes = 3 * (self.audio.nbytes + 200)
+        for name in "abc":
+            self.cache.put(name, self.audio)
+            os.utime(self.cache._path(name, ".npy"), ns=(0, {"a": 1, "b": 2, "c": 3}[name] * 10**9))
+        self.cache.get("a")
+        self.cache.put("d", self.audio)
+        self.assertEqual(sorted(key for _, _, key in self.cache.entries()), ["a", "c", "d"])
+        self.assertLessEqual(self.cache.size(), self.cache.max_bytes)
+
+    def test_decoded_audio_is_keyed_by_content(self):
+        audio, sr, key = cached_load(self.input_file, self.cache)
+        np.testing.assert_array_equal(audio, self.audio)
+        copy = os.path.join(self.folder.name, "copy.wav")
+        with open(self.input_file, "rb") as source, open(copy, "wb") as target:
+            target.write(source.read())
+        self.assertEqual(file_digest(copy), file_digest(self.input_file))
+        with mock.patch("libraries.loader.load_audio", side_effect=AssertionError("decoded again")):
+            cached, sr2, key2 = cached_load(copy, self.cache)
+        self.assertEqual((sr2, key2), (sr, key))
+
+    def test_rerun_resumes_from_the_first_changed_stage(self):
+        audio, _, key = cached_load(self.input_file, self.cache)
+        first = Pipeline(self.sample_rate, 30).add("reverse", pattern="2 * n + 1").add("fade", fade_percentage=10)
+        expected = first.run(audio)
+        np.testing.assert_array_equal(cached_run(first, audio, key, self.cache), expected)
+
+        second = Pipeline(self.sample_rate, 30).add("reverse", pattern="2 * n + 1").add("fade", fade_percentage=20)
+        calls = []
+        original = Pipeline.run
+
+        def spy(pipeline, *args, **kwargs):
+            calls.append((kwargs.get("start"), kwargs.get("stop")))
+            return original(pipeline, *args, **kwargs)
+        with mock.patch.object(Pipeline, "run", spy):
+            result = cached_run(second, audio, key, self.cache)
+        #the reversed audio came from the cache: only the fade ran
+        self.assertEqual(calls, [(1, 2)])
+        np.testing.assert_array_equal(result, second.run(audio))
+
+    def test_unseeded_noise_is_not_cached(self):
+        audio, _, key = cached_load(self.input_file, self.cache)
+        entries = len(self.cache.entries())
+        cached_run(Pipeline(self.sample_rate, 30).add("noise").add("fade"), audio, key, self.cache)
+        self.assertEqual(len(self.cache.entries()), entries)
+        cached_run(Pipeline(self.sample_rate, 30).add("noise", seed=3).add("fade"), audio, key, self.cache)
+        self.assertEqual(len(self.cache.entries()), entries + 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import tracemalloc
+import unittest
+import numpy as np
+import soundfile as sf
+from libraries import *
+from libraries.dtypes import get_dtype
+from libraries.library3 import generate_noise, generate_noise_batch
+from libraries.library4 import to_int16
+from libraries.library5 import fade_envelopes
+
+
+class TestDtypePolicy(unittest.TestCase):
+    def setUp(self):
+        self.sample_rate = 8000
+        self.audio = np.random.normal(0, 0.2, 8000).astype(np.float32)
+
+    def chain(self, audio, method):
+        segments = segment_audio_by_duration(audio, self.sample_rate, 20)
+        segments = manipulate_segments(segments, method, self.sample_rate, noise_type='pink')
+        return concatenate_segments(smooth_audio_list(segments, self.sample_rate))
+
+    def test_default_is_float32(self):
+        self.assertEqual(get_dtype(), np.float32)
+        self.assertEqual(generate_noise(500, self.sample_rate).dtype, np.float32)
+        self.assertEqual(generate_noise(500, self.sample_rate, shaping='fft', noise_type='brown').dtype, np.float32)
+        self.assertEqual(fade_envelopes(500, 15)[0].dtype, np.float32)
+        self.assertEqual(concatenate_segments([]).dtype, np.float32)
+
+    def test_noise_does_not_upcast_the_output(self):
+        #the noise segments used to be float64 and pulled the whole output up with them
+        for method in ('mute', 'noise'):
+            self.assertEqual(self.chain(self.audio, method).dtype, np.float32)
+        table = segment_audio_by_duration(self.audio.copy(), self.sample_rate, 20, as_table=True)
+        manipulate_segments(table, 'noise', self.sample_rate)
+        self.assertEqual(concatenate_segments(table).dtype, np.float32)
+        result = Pipeline(self.sample_rate, 20).add('noise').add('fade').run(self.audio)
+        self.assertEqual(result.dtype, np.float32)
+
+    def test_integer_segments_use_the_policy(self):
+        segments = [np.full(100, 1000, dtype=np.int16), np.full(100, 1000, dtype=np.int16)]
+        self.assertEqual(manipulate_segments(segments, 'noise', self.sample_rate)[0].dtype, np.float32)
+        with dtype_policy('float64'):
+            self.assertEqual(manipulate_segments(segments, 'noise', self.sample_rate)[0].dtype, np.float64)
+
+    def test_float64_policy(self):
+        with dtype_policy('float64') as dtype:
+            self.assertEqual(dtype, np.float64)
+            self.assertEqual(generate_noise(500, self.sample_rate).dtype, np.float64)
+            self.assertEqual(fade_envelopes(500, 15)[0].dtype, np.float64)
+            self.assertEqual(self.chain(self.audio.astype(np.float64), 'noise').dtype, np.float64)
+            with tempfile.TemporaryDirectory() as folder:
+                path = os.path.join(folder, 'input.wav')
+                sf.write(path, self.audio, self.sample_rate, subtype='PCM_16')
+                self.assertEqual(load_audio(path)[0].dtype, np.float64)
+        #the policy is restored on exit
+        self.assertEqual(get_dtype(), np.float32)
+        self.assertEqual(fade_envelopes(500, 15)[0].dtype, np.float32)
+
+    def test_unsupported_dtype(self):
+        with self.assertRaises(ValueError):
+            set_dtype('int16')
+        with self.assertRaises(ValueError):
+            generate_noise(10, self.sample_rate, dtype=np.float16)
+
+    def test_float32_noise_matches_float64_noise(self):
+        #the precision changes, the noise does not
+        np.random.seed(0)
+        noise32 = generate_noise_batch(4, 1000, self.sample_rate, noise_type='pink', dtype=np.float32)
+        np.random.seed(0)
+        noise64 = generate_noise_batch(4, 1000, self.sample_rate, noise_type='pink', dtype=np.float64)
+        np.testing.assert_allclose(noise32, noise64, atol=1e-4)
+
+    def test_out_variants(self):
+        out = np.empty((3, 400), dtype=np.float32)
+        self.assertIs(generate_noise(400, self.sample_rate, channels=3, out=out), out)
+        np.testing.assert_allclose(out.std(axis=1), 1, atol=1e-3)
+        pcm = np.empty(self.audio.shape, dtype=np.int16)
+        self.assertIs(to_int16(self.audio, out=pcm), pcm)
+        np.testing.assert_array_equal(pcm, to_int16(self.audio))
+        with self.assertRaises(ValueError):
+            to_int16(self.audio, out=np.empty(self.audio.shape, dtype=np.float32))
+
+    def test_table_noise_peak_memory(self):
+        #noise is written into the table in place: the peak stays near one float32 copy of the
+        #manipulated half of the audio, instead of float64 noise plus a cast copy of it
+        audio = np.random.normal(0, 0.2, 1 << 20).astype(np.float32)
+        table = segment_audio_by_duration(audio, self.sample_rate, 20, as_table=True)
+        manipulate_segments(table, 'noise', self.sample_rate, noise_type='white')
+        tracemalloc.start()
+        try:
+            manipulate_segments(table, 'noise', self.sample_rate, noise_type='white')
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(table.buffer.dtype, np.float32)
+        self.assertLess(peak, audio.nbytes * 0.75)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from libraries import *
+from libraries.cache import AudioCache, cached_run
+from libraries.library1 import frame_energy
+
+
+class TestEnergySegmentation(unittest.TestCase):
+    def setUp(self):
+        self.sample_rate = 8000
+        rng = np.random.default_rng(0)
+        #bursts of noise separated by silent gaps of 80 ms
+        parts = []
+        self.gaps = []
+        for length in (2400, 3600, 4000, 2000, 5000, 3000):
+            parts.append(rng.normal(0, 0.3, length))
+            start = sum(len(part) for part in parts)
+            self.gaps.append((start, start + 640))
+            parts.append(np.zeros(640))
+        self.audio = np.concatenate(parts).astype(np.float32)
+
+    def test_cuts_fall_into_the_gaps(self):
+        boundaries = energy_boundaries(self.audio, self.sample_rate, 200, 1000)
+        self.assertEqual(boundaries[0], 0)
+        self.assertEqual(boundaries[-1], len(self.audio))
+        for cut in boundaries[1:-1]:
+            self.assertTrue(any(start <= cut <= stop for start, stop in self.gaps), cut)
+
+    def test_durations_stay_in_range(self):
+        audio = np.random.default_rng(1).normal(0, 0.3, 10 * self.sample_rate)
+        boundaries = energy_boundaries(audio, self.sample_rate, 150, 400)
+        lengths = np.diff(boundaries)
+        self.assertGreaterEqual(lengths.min(), 0.15 * self.sample_rate)
+        self.assertLessEqual(lengths.max(), 0.4 * self.sample_rate)
+
+    def test_short_and_empty_audio(self):
+        np.testing.assert_array_equal(energy_boundaries(np.zeros(0), self.sample_rate), [0])
+        np.testing.assert_array_equal(energy_boundaries(np.zeros(5), self.sample_rate), [0, 5])
+        self.assertEqual(len(segment_audio_by_energy(np.zeros(0), self.sample_rate)), 0)
+
+    def test_frame_energy_matches_direct_computation(self):
+        audio = np.random.default_rng(2).normal(0, 1, (2, 1000))
+        energy = frame_energy(audio, 50, 3)
+        expected = [np.mean(audio[:, i * 50:i * 50 + 150] ** 2) for i in range(18)]
+        np.testing.assert_allclose(energy, expected)
+
+    def test_table_matches_list(self):
+        segments = segment_audio_by_energy(self.audio, self.sample_rate, 200, 1000)
+        table = segment_audio_by_energy(self.audio, self.sample_rate, 200, 1000, as_table=True)
+        self.assertEqual(len(segments), len(table))
+        for segment, view in zip(segments, table):
+            np.testing.assert_array_equal(segment, view)
+        np.testing.assert_array_equal(concatenate_segments(table), self.audio)
+
+    def test_multichannel_uses_one_set_of_boundaries(self):
+        audio = np.stack([self.audio, 0.5 * self.audio])
+        segments = segment_audio_by_energy(audio, self.sample_rate, 200, 1000)
+        self.assertEqual(segments[0].shape[0], 2)
+        np.testing.assert_array_equal(energy_boundaries(audio, self.sample_rate, 200, 1000),
+                                      energy_boundaries(self.audio, self.sample_rate, 200, 1000))
+
+    def test_pipeline_runs_on_the_boundaries(self):
+        boundaries = energy_boundaries(self.audio, self.sample_rate, 200, 1000)
+        #a small chunk size splits the audio into several chunks of whole segments
+        pipeline = Pipeline(self.sample_rate, 100, chunk_size=4096).add('reverse').add('fade')
+        result = pipeline.run(self.audio, boundaries=boundaries)
+        table = SegmentTable.from_boundaries(self.audio.copy(), boundaries)
+        Pipeline(self.sample_rate, 100).add('reverse').add('fade').run_table(table)
+        np.testing.assert_allclose(result, table.buffer)
+        with self.assertRaises(ValueError):
+            pipeline.run(self.audio, boundaries=boundaries[:-1])
+
+    def test_cached_run_keys_on_the_boundaries(self):
+        boundaries = energy_boundaries(self.audio, self.sample_rate, 200, 1000)
+        pipeline = Pipeline(self.sample_rate, 100).add('reverse')
+        with tempfile.TemporaryDirectory() as folder:
+            cache = AudioCache(os.path.join(folder, 'cache'))
+            fixed = cached_run(pipeline, self.audio, 'audio', cache)
+            adaptive = cached_run(pipeline, self.audio, 'audio', cache, boundaries=boundaries)
+            np.testing.assert_array_equal(adaptive, pipeline.run(self.audio, boundaries=boundaries))
+            self.assertFalse(np.array_equal(fixed, adaptive))
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            energy_boundaries(self.audio, self.sample_rate, 500, 100)
+        with self.assertRaises(ValueError):
+            SegmentTable.from_boundaries(self.audio, [0, 500, 400])
+        with self.assertRaises(ValueError):
+            frame_energy(self.audio, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
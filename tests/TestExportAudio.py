@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import soundfile as sf
+from libraries.library4 import export_audio, save_audio, to_int16
+
+
+class TestExportAudio(unittest.TestCase):
+    def setUp(self):
+        self.sr = 16000
+        self.audio = (0.5 * np.sin(np.arange(self.sr) * 2 * np.pi * 440 / self.sr)).astype(np.float32)
+
+    def test_int16_conversion_clips(self):
+        audio = np.array([-2.0, -1.0, 0.0, 0.5, 1.0, 2.0], dtype=np.float32)
+        np.testing.assert_array_equal(to_int16(audio, chunk_size=4), [-32768, -32767, 0, 16384, 32767, 32767])
+
+    def test_exports_all_targets(self):
+        with tempfile.TemporaryDirectory() as folder:
+            results = export_audio(self.audio, self.sr, folder, "voice", targets=["wav", "flac", "mp3:128k"],
+                                   chunk_size=4096)
+            self.assertEqual([result.format for result in results], ["wav", "flac", "mp3"])
+            for result in results:
+                self.assertTrue(result.ok, result.error)
+                self.assertGreater(result.bytes, 0)
+                self.assertTrue(os.path.exists(result.path))
+            self.assertEqual(results[2].bitrate, "128k")
+            wav, sr = sf.read(results[0].path, dtype='float32')
+            self.assertEqual(sr, self.sr)
+            np.testing.assert_allclose(wav, self.audio, atol=1e-4)
+            flac, _ = sf.read(results[1].path, dtype='float32')
+            np.testing.assert_array_equal(flac, wav)
+
+    def test_failures_are_reported(self):
+        with tempfile.TemporaryDirectory() as folder:
+            result = save_audio(self.audio, self.sr, folder, "voice", output_format="nosuchformat")
+            self.assertFalse(result.ok)
+            self.assertTrue(result.error)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import numpy as np
+from libraries.library1 import SegmentTable
+from libraries.library5 import smooth_audio_list, fade_envelopes
+
+
+class TestFadeEnvelopes(unittest.TestCase):
+    def test_envelopes_are_cached_and_read_only(self):
+        fade_in, fade_out = fade_envelopes(1000, 15)
+        self.assertIs(fade_in, fade_envelopes(1000, 15)[0])
+        self.assertEqual(len(fade_in), 150)
+        self.assertFalse(fade_in.flags.writeable)
+        #envelopes follow the dtype policy (float32 by default)
+        self.assertEqual(fade_in.dtype, np.float32)
+        np.testing.assert_array_equal(fade_in, np.linspace(0.0, 1.0, 150, dtype=np.float32))
+        np.testing.assert_array_equal(fade_out, np.linspace(1.0, 0.0, 150, dtype=np.float32))
+
+    def test_curve_shapes(self):
+        for curve in ['linear', 'equal_power', 'raised_cosine']:
+            fade_in, fade_out = fade_envelopes(400, 25, curve)
+            self.assertAlmostEqual(fade_in[0], 0.0)
+            self.assertAlmostEqual(fade_in[-1], 1.0)
+            np.testing.assert_allclose(fade_out, fade_in[::-1])
+        #equal power keeps the summed power of a crossfade constant
+        fade_in, fade_out = fade_envelopes(400, 25, 'equal_power', dtype=np.float64)
+        np.testing.assert_allclose(fade_in ** 2 + fade_out ** 2, 1.0)
+        with self.assertRaises(ValueError):
+            fade_envelopes(400, 25, 'square')
+
+    def test_zero_fade_leaves_audio_untouched(self):
+        audio = np.ones(5)
+        smoothed = smooth_audio_list([audio], 44100, fade_percentage=15)
+        np.testing.assert_array_equal(smoothed[0], np.ones(5))
+
+    def test_table_matches_list(self):
+        audio = np.random.normal(0, 1, 1050)
+        segments = [seg.copy() for seg in np.split(audio, [300, 600, 900])]
+        table = SegmentTable.from_length(audio.copy(), 300)
+        expected = np.concatenate(smooth_audio_list(segments, 1000, 20, curve='raised_cosine'))
+        smooth_audio_list(table, 1000, 20, curve='raised_cosine')
+        np.testing.assert_allclose(table.buffer, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
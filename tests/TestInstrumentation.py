@@ -0,0 +1,83 @@
+import io
+import json
+import unittest
+import numpy as np
+from libraries.instrumentation import JsonLinesSink, add_sink, enabled, remove_sink, stage, timed
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.records = []
+        add_sink(self.records.append)
+
+    def tearDown(self):
+        remove_sink(self.records.append)
+
+    def test_stage_records_timing_and_fields(self):
+        with stage("segment", samples=1000) as current:
+            current.update(segments=10)
+        record, = self.records
+        self.assertEqual(record["stage"], "segment")
+        self.assertEqual(record["segments"], 10)
+        self.assertGreaterEqual(record["wall_s"], 0)
+        self.assertIn("cpu_s", record)
+        if record["wall_s"] > 0:
+            self.assertAlmostEqual(record["samples_per_s"], 1000 / record["wall_s"])
+
+    def test_nested_stages_report_memory(self):
+        remove_sink(self.records.append)
+        add_sink(self.records.append, trace_memory=True)
+        with stage("outer"):
+            with stage("inner"):
+                data = np.ones(1_000_000)
+            del data
+        inner, outer = self.records
+        self.assertGreaterEqual(inner["allocated_bytes"], 8_000_000)
+        #the outer stage still sees the peak reached inside the inner one
+        self.assertGreaterEqual(outer["allocated_bytes"], 8_000_000)
+        self.assertLess(outer["retained_bytes"], 1_000_000)
+
+    def test_decorator_and_errors(self):
+        @timed()
+        def failing():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            failing()
+        self.assertEqual(self.records[0]["stage"], "failing")
+        self.assertEqual(self.records[0]["error"], "ValueError")
+
+    def test_disabled_records_nothing(self):
+        remove_sink(self.records.append)
+        self.assertFalse(enabled())
+        with stage("segment") as current:
+            current.update(segments=1)
+        self.assertEqual(self.records, [])
+        add_sink(self.records.append)
+
+    def test_pipeline_stages_are_summed_over_chunks(self):
+        from libraries.pipeline import Pipeline
+
+        audio = np.zeros(10_050, dtype=np.float32)
+        Pipeline(1000, 100, chunk_size=2000).add('reverse').add('fade').run(audio)
+        reverse, fade = self.records
+        self.assertEqual((reverse["stage"], fade["stage"]), ("reverse", "fade"))
+        #one record per stage, however many chunks the fused pass took
+        self.assertEqual(reverse["calls"], 6)
+        self.assertEqual(reverse["segments"], 101)
+        self.assertEqual(fade["samples"], 10_050)
+
+    def test_json_lines_sink(self):
+        out = io.StringIO()
+        sink = JsonLinesSink(out)
+        add_sink(sink)
+        try:
+            with stage("export", formats=2):
+                pass
+        finally:
+            remove_sink(sink)
+        self.assertEqual(json.loads(out.getvalue())["formats"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
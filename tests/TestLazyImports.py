@@ -0,0 +1,24 @@
+import subprocess
+import sys
+import unittest
+import libraries
+
+
+class TestLazyImports(unittest.TestCase):
+    def test_import_does_not_load_heavy_dependencies(self):
+        #a fresh interpreter, since this one may already have imported them
+        code = ("import sys, libraries; "
+                "print(','.join(m for m in ('scipy', 'librosa', 'soundfile') if m in sys.modules))")
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_exports_resolve(self):
+        for name in libraries.__all__:
+            self.assertTrue(callable(getattr(libraries, name)))
+        self.assertIn("parallel_process", dir(libraries))
+        with self.assertRaises(AttributeError):
+            libraries.not_a_function
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import soundfile as sf
+from libraries.loader import LazyAudio, WavMap, load_audio, load_blocks, open_wav
+
+
+class TestLoader(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.audio = np.random.uniform(-1, 1, (5000, 2)).astype(np.float32)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def write(self, name, subtype=None, audio=None):
+        path = os.path.join(self.folder.name, name)
+        sf.write(path, self.audio if audio is None else audio, 8000, subtype=subtype)
+        return path
+
+    def test_memory_mapped_wav_matches_soundfile(self):
+        for subtype in ['PCM_U8', 'PCM_16', 'PCM_32', 'FLOAT', 'DOUBLE']:
+            path = self.write(f"{subtype}.wav", subtype)
+            self.assertIsInstance(open_wav(path).frames, np.memmap)
+            expected = sf.read(path, dtype='float32')[0]
+            audio, sr = load_audio(path)
+            self.assertEqual(sr, 8000)
+            self.assertEqual(audio.dtype, np.float32)
+            np.testing.assert_allclose(audio, expected.mean(axis=1), atol=1e-6)
+            stereo, _ = load_audio(path, mono=False)
+            np.testing.assert_allclose(stereo, expected.T, atol=1e-6)
+
+    def test_other_formats_use_soundfile(self):
+        path = self.write("voice.flac")
+        self.assertIsNone(open_wav(path))
+        self.assertIsNone(open_wav(self.write("voice24.wav", 'PCM_24')))
+        audio, sr = load_audio(path)
+        np.testing.assert_allclose(audio, sf.read(path, dtype='float32')[0].mean(axis=1), atol=1e-6)
+
+    def test_blocks_are_converted_lazily(self):
+        path = self.write("mono.wav", 'PCM_16', audio=self.audio[:, 0])
+        sr, blocks = load_blocks(path, blocksize=1024)
+        blocks = list(blocks)
+        self.assertEqual([len(block) for block in blocks[:2]], [1024, 1024])
+        np.testing.assert_allclose(np.concatenate(blocks), sf.read(path, dtype='float32')[0])
+        self.assertEqual(len(WavMap(path)), 5000)
+
+    def test_lazy_wav_is_converted_per_slice(self):
+        from libraries.pipeline import Pipeline
+
+        path = self.write("lazy.wav", 'PCM_16')
+        for mono in (True, False):
+            eager, _ = load_audio(path, mono=mono)
+            lazy, sr = load_audio(path, mono=mono, lazy=True)
+            self.assertIsInstance(lazy, LazyAudio)
+            self.assertEqual((lazy.shape, lazy.dtype, sr), (eager.shape, eager.dtype, 8000))
+            np.testing.assert_array_equal(lazy[..., 1000:1234], eager[..., 1000:1234])
+            np.testing.assert_array_equal(np.asarray(lazy), eager)
+            pipeline = Pipeline(8000, 30, chunk_size=1000).add('reverse').add('fade')
+            np.testing.assert_array_equal(pipeline.run(lazy), pipeline.run(eager))
+        with self.assertRaises(TypeError):
+            lazy[..., ::2]
+        #formats that cannot be mapped are decoded whole as before
+        self.assertIsInstance(load_audio(self.write("voice.flac"), lazy=True)[0], np.ndarray)
+
+    def test_resampling_only_when_requested(self):
+        path = self.write("resample.wav", 'PCM_16')
+        audio, sr = load_audio(path, sr=4000)
+        self.assertEqual(sr, 4000)
+        self.assertAlmostEqual(len(audio), 2500, delta=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
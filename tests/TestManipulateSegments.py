@@ -111,5 +111,32 @@ class TestManipulateSegments(unittest.TestCase):
         with self.assertRaises(TypeError):
             manipulate_segments([np.ones(1000), "not an array"], method='mute', sample_rate=self.sample_rate)
 
+class TestBatchedManipulation(unittest.TestCase):
+    def test_segment_rms_matches_direct_formula(self):
+        frames = np.random.normal(0, 2, (8, 441))
+        expected = np.sqrt(np.mean(frames ** 2, axis=1))
+        np.testing.assert_allclose(segment_rms(frames), expected)
+
+    def test_noise_batch_rows_are_normalized(self):
+        noise = generate_noise_batch(16, 500, 44100, noise_type='pink', dtype=np.float64)
+        self.assertEqual(noise.shape, (16, 500))
+        np.testing.assert_allclose(noise.mean(axis=1), 0, atol=1e-9)
+        np.testing.assert_allclose(noise.std(axis=1), 1, atol=1e-4)
+
+    def test_noise_rms_follows_each_segment(self):
+        #segments of different loudness and lengths are scaled independently
+        segments = [np.full(300, 0.1), np.ones(300), np.full(300, 0.4), np.ones(300), np.full(120, 0.8)]
+        manipulated = manipulate_segments(segments, method='noise', sample_rate=44100, noise_level=0.5)
+        for i, level in [(0, 0.1), (2, 0.4), (4, 0.8)]:
+            self.assertAlmostEqual(segment_rms(manipulated[i]), level * 0.5, delta=1e-4)
+        self.assertEqual(len(manipulated[4]), 120)
+        self.assertIs(manipulated[1], segments[1])
+
+    def test_float32_segments_stay_float32(self):
+        segments = [np.ones(200, dtype=np.float32) for _ in range(4)]
+        manipulated = manipulate_segments(segments, method='noise', sample_rate=44100)
+        self.assertEqual(manipulated[0].dtype, np.float32)
+        self.assertEqual(manipulated[2].dtype, np.float32)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import soundfile as sf
+import libraries.parallel as parallel
+from libraries import *
+from libraries.library1 import SegmentTable
+from libraries.library3 import generate_noise, segment_rms
+from libraries.streaming import process_blocks
+
+
+class TestMultichannel(unittest.TestCase):
+    def setUp(self):
+        self.sample_rate = 1000
+        #three channels with different levels; 1050 samples leave a 30-sample tail segment
+        self.audio = (np.random.normal(0, 0.2, (3, 1050)) * np.array([[1.0], [0.5], [0.1]])).astype(np.float32)
+
+    def per_channel(self, process):
+        #reference: the mono chain run once per channel
+        return np.stack([process(channel.copy()) for channel in self.audio])
+
+    def chain(self, audio, method):
+        table = segment_audio_by_duration(audio, self.sample_rate, 60, as_table=True)
+        if method == 'reverse':
+            reverse_segments(table, '2 * n + 1')
+        else:
+            manipulate_segments(table, method, self.sample_rate)
+        smooth_audio_list(table, self.sample_rate, fade_percentage=10)
+        return concatenate_segments(table)
+
+    def test_table_views_cover_all_channels(self):
+        table = SegmentTable.from_length(self.audio, 100)
+        self.assertEqual(table.channels, 3)
+        self.assertEqual(table.rows.shape, (3, 10, 100))
+        self.assertEqual(table[10].shape, (3, 50))
+        self.assertTrue(np.shares_memory(table.rows, self.audio))
+
+    def test_table_chain_matches_per_channel(self):
+        for method in ['mute', 'reverse']:
+            result = self.chain(self.audio.copy(), method)
+            np.testing.assert_array_equal(result, self.per_channel(lambda channel: self.chain(channel, method)))
+
+    def test_list_chain_matches_per_channel(self):
+        def list_chain(audio):
+            segments = segment_audio_by_duration(audio, self.sample_rate, 60)
+            segments = reverse_segments(segments, '2 * n + 1')
+            segments = manipulate_segments(segments, 'mute', self.sample_rate)
+            return concatenate_segments(smooth_audio_list(segments, self.sample_rate, fade_percentage=10))
+        result = list_chain(self.audio.copy())
+        self.assertEqual(result.shape, self.audio.shape)
+        np.testing.assert_array_equal(result, self.per_channel(list_chain))
+
+    def test_noise_matches_each_channel_rms(self):
+        table = segment_audio_by_duration(self.audio.copy(), self.sample_rate, 100, as_table=True)
+        expected = segment_rms(table.rows[:, ::2]) * 0.5
+        manipulate_segments(table, 'noise', self.sample_rate, noise_type='pink')
+        np.testing.assert_allclose(segment_rms(table.rows[:, ::2]), expected, rtol=1e-3)
+        #independent noise per channel
+        self.assertFalse(np.allclose(table.rows[0, 0] / expected[0, 0], table.rows[1, 0] / expected[1, 0]))
+        self.assertEqual(generate_noise(100, self.sample_rate, channels=4).shape, (4, 100))
+
+    def test_streaming_and_pipeline_match_in_memory(self):
+        expected = self.chain(self.audio.copy(), 'reverse')
+        blocks = [self.audio[:, i:i + 333] for i in range(0, self.audio.shape[1], 333)]
+        streamed = np.concatenate([chunk.copy() for chunk in
+                                   process_blocks(blocks, self.sample_rate, 60, 'reverse', pattern='2 * n + 1',
+                                                  fade_percentage=10)], axis=-1)
+        np.testing.assert_array_equal(streamed, expected)
+        pipeline = Pipeline(self.sample_rate, 60, chunk_size=200).add('reverse', pattern='2 * n + 1')
+        np.testing.assert_array_equal(pipeline.add('fade', fade_percentage=10).run(self.audio), expected)
+
+    def test_parallel_matches_serial(self):
+        minimum, parallel.MIN_SEGMENTS_PER_WORKER = parallel.MIN_SEGMENTS_PER_WORKER, 1
+        try:
+            result = parallel_process(self.audio, self.sample_rate, 60, 'reverse', workers=2,
+                                      pattern='2 * n + 1', fade_percentage=10)
+        finally:
+            parallel.MIN_SEGMENTS_PER_WORKER = minimum
+        np.testing.assert_array_equal(result, self.chain(self.audio.copy(), 'reverse'))
+
+    def test_export_and_assembler_write_all_channels(self):
+        with tempfile.TemporaryDirectory() as folder:
+            results = export_audio(self.audio, self.sample_rate, folder, "multi", targets=["wav", "flac"])
+            self.assertTrue(all(result.ok for result in results))
+            data, sr = sf.read(os.path.join(folder, "multi.flac"), dtype="float32")
+            self.assertEqual(data.shape, (1050, 3))
+            np.testing.assert_allclose(data.T, self.audio, atol=1e-4)
+
+            path = os.path.join(folder, "assembled.wav")
+            assembler = SegmentAssembler(1050, path=path, sample_rate=self.sample_rate, channels=3)
+            assembler.write_table(SegmentTable.from_length(self.audio, 100))
+            assembler.flush()
+            del assembler
+            data, sr = sf.read(path, dtype="float32")
+            np.testing.assert_array_equal(data.T, self.audio)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import numpy as np
+from libraries.library3 import manipulate_segments, generate_noise
+from libraries.noise_bank import NoiseBank, fir_kernel, spectral_noise
+
+
+def spectral_slope(noise, sample_rate):
+    #slope of the power spectrum in log-log space between 50 Hz and 5 kHz
+    power = np.abs(np.fft.rfft(noise)) ** 2
+    freqs = np.fft.rfftfreq(len(noise), d=1.0 / sample_rate)
+    band = (freqs > 50) & (freqs < 5000)
+    return np.polyfit(np.log(freqs[band]), np.log(power[band]), 1)[0]
+
+
+class TestNoiseBank(unittest.TestCase):
+    def test_fir_kernel_is_cached(self):
+        self.assertIs(fir_kernel(44100, 'pink'), fir_kernel(44100, 'pink'))
+        self.assertIsNone(fir_kernel(44100, 'white'))
+        with self.assertRaises(ValueError):
+            fir_kernel(44100, 'brown')
+
+    def test_spectral_shapes(self):
+        np.random.seed(0)
+        sample_rate = 16000
+        for noise_type, expected in [('white', 0.0), ('pink', -1.0), ('brown', -2.0), ('blue', 1.0)]:
+            noise = spectral_noise(2 ** 17, sample_rate, noise_type)
+            self.assertAlmostEqual(np.std(noise), 1.0, places=3)
+            self.assertAlmostEqual(spectral_slope(noise, sample_rate), expected, delta=0.15)
+
+    def test_fir_stream_is_continuous_across_draws(self):
+        first = NoiseBank(44100, 'pink', rng=np.random.default_rng(3), dtype=np.float64)
+        second = NoiseBank(44100, 'pink', rng=np.random.default_rng(3), dtype=np.float64)
+        whole = first.draw(3000)
+        pieces = np.concatenate([second.draw(1000), second.draw(2000)])
+        np.testing.assert_allclose(pieces, whole)
+
+    def test_take_returns_normalized_rows(self):
+        rows = NoiseBank(44100, 'pink', shaping='fft').take(5, 800)
+        self.assertEqual(rows.shape, (5, 800))
+        np.testing.assert_allclose(rows.std(axis=1), 1, atol=1e-4)
+
+    def test_fft_shaping_in_manipulate_segments(self):
+        segments = [np.ones(1000) for _ in range(4)]
+        manipulated = manipulate_segments(segments, 'noise', 44100, noise_type='brown', shaping='fft')
+        self.assertAlmostEqual(np.sqrt(np.mean(manipulated[0] ** 2)), 0.5, places=3)
+        with self.assertRaises(ValueError):
+            manipulate_segments(segments, 'noise', 44100, noise_type='brown')
+        self.assertEqual(len(generate_noise(123, 44100, 'blue', shaping='fft')), 123)
+
+
+if __name__ == "__main__":
+    unittest.main()
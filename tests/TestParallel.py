@@ -0,0 +1,52 @@
+import unittest
+import numpy as np
+import libraries.parallel as parallel
+from libraries.library1 import SegmentTable
+from libraries.parallel import SharedAudio, parallel_process
+from libraries.streaming import run_kernels
+
+
+class TestParallelProcess(unittest.TestCase):
+    def setUp(self):
+        #force the pool even for a short test signal
+        self.min_segments = parallel.MIN_SEGMENTS_PER_WORKER
+        parallel.MIN_SEGMENTS_PER_WORKER = 1
+        self.audio = np.random.normal(0, 0.3, 20_500).astype(np.float32)
+
+    def tearDown(self):
+        parallel.MIN_SEGMENTS_PER_WORKER = self.min_segments
+
+    def serial(self, method, **settings):
+        result = self.audio.copy()
+        run_kernels(SegmentTable.from_length(result, 100), 1000, method, **settings)
+        return result
+
+    def test_matches_serial_kernels(self):
+        original = self.audio.copy()
+        for method in ['mute', 'reverse', None]:
+            result = parallel_process(self.audio, 1000, 100, method, workers=2, curve='raised_cosine')
+            np.testing.assert_allclose(result, self.serial(method, curve='raised_cosine'))
+            self.assertEqual(result.dtype, np.float32)
+        #the input is never modified
+        np.testing.assert_array_equal(self.audio, original)
+
+    def test_noise_shards_use_independent_streams(self):
+        audio = np.ones(4000, dtype=np.float32)
+        result = parallel_process(audio, 1000, 100, 'noise', workers=2, fade_percentage=0)
+        rows = result.reshape(40, 100)
+        np.testing.assert_array_equal(rows[1::2], 1)
+        np.testing.assert_allclose(np.sqrt(np.mean(rows[0::2] ** 2, axis=1)), 0.5, rtol=1e-3)
+        #no two noise segments are identical
+        self.assertEqual(len({row.tobytes() for row in rows[0::2]}), 20)
+
+    def test_shared_audio_is_processed_in_place(self):
+        with SharedAudio(len(self.audio)) as shared:
+            shared.array[...] = self.audio
+            result = parallel_process(shared, 1000, 100, 'mute', workers=2)
+            self.assertTrue(np.shares_memory(result, shared.array))
+            np.testing.assert_allclose(result, self.serial('mute'))
+            del result
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import numpy as np
+from libraries import *
+from libraries.pipeline import STAGES, Pipeline, register_stage, stage_options
+from libraries.streaming import process_blocks
+
+
+def split_blocks(audio, blocksize):
+    return [audio[i:i + blocksize] for i in range(0, len(audio), blocksize)]
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.sample_rate = 1000
+        self.audio = np.random.normal(0, 0.2, 10_050).astype(np.float32)
+
+    def staged(self, method):
+        #the stage by stage reference: every function over the whole table in turn
+        table = segment_audio_by_duration(self.audio.copy(), self.sample_rate, 30, as_table=True)
+        if method == 'reverse':
+            reverse_segments(table, '2 * n + 1')
+        else:
+            manipulate_segments(table, method, self.sample_rate)
+        smooth_audio_list(table, self.sample_rate, fade_percentage=10, curve='equal_power')
+        return concatenate_segments(table)
+
+    def test_fused_matches_staged(self):
+        for method in ['mute', 'reverse']:
+            #small chunks, so the fused run crosses many chunk boundaries
+            pipeline = Pipeline.from_names(self.sample_rate, 30, [method, 'fade'], pattern='2 * n + 1',
+                                           fade_percentage=10, curve='equal_power')
+            pipeline.chunk_size = 100
+            result = pipeline.run(self.audio)
+            np.testing.assert_array_equal(result, self.staged(method))
+        #the input is left alone unless out=audio is passed
+        self.assertFalse(np.all(result == self.audio))
+
+    def test_seeded_noise_does_not_depend_on_chunking(self):
+        def run(chunk_size):
+            pipeline = Pipeline(self.sample_rate, 30, chunk_size=chunk_size)
+            return pipeline.add('noise', noise_type='pink', seed=7).run(self.audio)
+        np.testing.assert_allclose(run(90), run(1 << 16), atol=1e-5)
+
+    def test_run_blocks_and_process_blocks_match_run(self):
+        pipeline = Pipeline(self.sample_rate, 30).add('mute').add('reverse').add('fade')
+        expected = pipeline.run(self.audio)
+        streamed = np.concatenate([chunk.copy() for chunk in pipeline.run_blocks(split_blocks(self.audio, 777))])
+        np.testing.assert_array_equal(streamed, expected)
+        processed = np.concatenate([chunk.copy() for chunk in
+                                    process_blocks(split_blocks(self.audio, 500), self.sample_rate, 30, None,
+                                                   stages=['mute', 'reverse', 'fade'])])
+        np.testing.assert_array_equal(processed, expected)
+
+    def test_empty_stage_range_runs_no_stage(self):
+        pipeline = Pipeline(self.sample_rate, 30).add('reverse').add('fade')
+        for start, stop in ((1, 1), (2, 1), (2, None), (3, None)):
+            np.testing.assert_array_equal(pipeline.run(self.audio, start=start, stop=stop), self.audio)
+
+    def test_registered_stage_joins_the_pipeline(self):
+        @register_stage('gain')
+        def gain_stage(sample_rate, gain=1.0):
+            def kernel(table):
+                table.buffer[slice(*table.span())] *= gain
+            return kernel
+        try:
+            self.assertEqual(stage_options('gain', {'gain': 2.0, 'pattern': '*'}), {'gain': 2.0})
+            audio = np.ones(100, dtype=np.float32)
+            result = Pipeline.from_names(self.sample_rate, 10, ['gain'], gain=2.0).run(audio, out=audio)
+            self.assertIs(result, audio)
+            np.testing.assert_array_equal(audio, 2.0)
+        finally:
+            del STAGES['gain']
+
+    def test_invalid_stages(self):
+        with self.assertRaises(ValueError):
+            Pipeline(self.sample_rate, 30).add('unknown')
+        with self.assertRaises(ValueError):
+            Pipeline(self.sample_rate, 30).add('fade', fade_percentage=80)
+        with self.assertRaises(ValueError):
+            Pipeline(self.sample_rate, 0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
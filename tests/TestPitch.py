@@ -0,0 +1,93 @@
+import unittest
+import numpy as np
+from libraries import *
+from libraries.pitch import FRAME_BATCH, default_n_fft
+
+
+def dominant_frequency(audio, sample_rate):
+    spectrum = np.abs(np.fft.rfft(audio * np.hanning(len(audio))))
+    return np.argmax(spectrum) * sample_rate / len(audio)
+
+
+class TestPitch(unittest.TestCase):
+    def setUp(self):
+        self.sample_rate = 16000
+        t = np.arange(2 * self.sample_rate) / self.sample_rate
+        self.tone = (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+    def test_pitch_shift_scales_the_frequency(self):
+        for semitones in (12, -12, 7):
+            shifted = pitch_shift(self.tone, self.sample_rate, semitones)
+            self.assertEqual(shifted.shape, self.tone.shape)
+            self.assertEqual(shifted.dtype, np.float32)
+            inner = shifted[2000:-2000]
+            self.assertAlmostEqual(dominant_frequency(inner, self.sample_rate), 440 * 2 ** (semitones / 12), delta=2)
+            #the level is kept (the phase vocoder loses a little, like librosa's)
+            self.assertAlmostEqual(np.sqrt(np.mean(inner ** 2)), 0.5 / np.sqrt(2), delta=0.06)
+
+    def test_time_stretch_keeps_the_frequency(self):
+        for rate in (0.5, 2.0, 1.3):
+            stretched = time_stretch(self.tone, self.sample_rate, rate)
+            self.assertEqual(len(stretched), round(len(self.tone) / rate))
+            self.assertAlmostEqual(dominant_frequency(stretched[1000:-1000], self.sample_rate), 440, delta=2)
+
+    def test_unit_rate_reconstructs_the_signal(self):
+        stretched = time_stretch(self.tone, self.sample_rate, 1.0)
+        np.testing.assert_allclose(stretched[600:-600], self.tone[600:-600], atol=1e-4)
+
+    def test_long_signals_continue_across_frame_batches(self):
+        #more frames than one batch: the phases must carry over without a seam
+        hop = default_n_fft(self.sample_rate) // 4
+        t = np.arange(3 * FRAME_BATCH * hop) / self.sample_rate
+        tone = np.sin(2 * np.pi * 300 * t)
+        stretched = time_stretch(tone, self.sample_rate, 1.0)
+        np.testing.assert_allclose(stretched[1000:-1000], tone[1000:-1000], atol=1e-6)
+
+    def test_shift_segments_table_in_place(self):
+        table = segment_audio_by_duration(self.tone.copy(), self.sample_rate, 100, as_table=True)
+        self.assertIs(shift_segments(table, self.sample_rate, 12, pattern='2 * n + 0'), table)
+        buffer = table.buffer
+        #selected segments are an octave higher, the others are untouched
+        self.assertAlmostEqual(dominant_frequency(buffer[3200:4800], self.sample_rate), 880, delta=15)
+        np.testing.assert_array_equal(buffer[1600:3200], self.tone[1600:3200])
+
+    def test_shift_segments_list_matches_table(self):
+        segments = segment_audio_by_duration(self.tone, self.sample_rate, 100)
+        shifted = shift_segments(segments, self.sample_rate, -5, pattern='n%3==1')
+        table = segment_audio_by_duration(self.tone.copy(), self.sample_rate, 100, as_table=True)
+        shift_segments(table, self.sample_rate, -5, pattern='n%3==1')
+        self.assertIs(shifted[0], segments[0])
+        np.testing.assert_allclose(concatenate_segments(shifted), table.buffer, atol=1e-6)
+
+    def test_multichannel_matches_mono(self):
+        audio = np.stack([self.tone, 0.5 * self.tone])
+        table = segment_audio_by_duration(audio.copy(), self.sample_rate, 100, as_table=True)
+        shift_segments(table, self.sample_rate, 3)
+        mono = segment_audio_by_duration(self.tone.copy(), self.sample_rate, 100, as_table=True)
+        shift_segments(mono, self.sample_rate, 3)
+        np.testing.assert_allclose(table.buffer[1], 0.5 * mono.buffer, atol=1e-6)
+
+    def test_stretch_segments_changes_selected_lengths(self):
+        segments = segment_audio_by_duration(self.tone, self.sample_rate, 100)
+        stretched = stretch_segments(segments, self.sample_rate, 0.5, pattern='2 * n + 0')
+        self.assertEqual([len(seg) for seg in stretched[:3]], [3200, 1600, 3200])
+        self.assertIs(stretched[1], segments[1])
+
+    def test_pitch_stage(self):
+        result = Pipeline(self.sample_rate, 100).add('pitch', semitones=12, pattern='2 * n + 1').run(self.tone)
+        self.assertAlmostEqual(dominant_frequency(result[1600:3200], self.sample_rate), 880, delta=15)
+        np.testing.assert_array_equal(result[:1600], self.tone[:1600])
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            pitch_shift(self.tone, self.sample_rate, 2, n_fft=1024, hop_length=300)
+        with self.assertRaises(ValueError):
+            time_stretch(self.tone, self.sample_rate, 0)
+        with self.assertRaises(TypeError):
+            shift_segments(self.tone, self.sample_rate, 2)
+        with self.assertRaises(TypeError):
+            Pipeline(self.sample_rate, 100).add('pitch', semitones='up')
+
+
+if __name__ == '__main__':
+    unittest.main()
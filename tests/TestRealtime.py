@@ -0,0 +1,105 @@
+import unittest
+import numpy as np
+from libraries import *
+from libraries.realtime import fixed_blocks, simulate
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.waits = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.waits.append(seconds)
+        self.now += seconds
+
+
+class TestRealtime(unittest.TestCase):
+    def setUp(self):
+        self.sample_rate = 8000
+        #not a whole number of blocks or segments
+        self.audio = np.random.default_rng(0).normal(0, 0.3, 3 * self.sample_rate + 123).astype(np.float32)
+
+    def run_engine(self, engine, audio, feed=1000):
+        blocks = (audio[..., i:i + feed] for i in range(0, audio.shape[-1], feed))
+        chunks = [chunk.copy() for chunk in simulate(engine, blocks)]
+        return np.concatenate(chunks, axis=-1)
+
+    def test_matches_offline_pipeline_after_the_latency(self):
+        for method, params in (('reverse', {}), ('noise', dict(seed=4, noise_type='pink'))):
+            offline = Pipeline(self.sample_rate, 20).add(method, **params).add('fade').run(self.audio)
+            for block_size in (64, 300, 1024):
+                engine = RealtimeEngine(self.sample_rate, block_size, 20, method, **params)
+                self.assertEqual(engine.latency, 160)
+                output = self.run_engine(engine, self.audio)
+                self.assertEqual(output.shape[-1], self.audio.shape[-1] + engine.latency)
+                np.testing.assert_array_equal(output[:engine.latency], 0)
+                np.testing.assert_array_equal(output[engine.latency:], offline)
+
+    def test_mute_and_fades_need_no_latency(self):
+        engine = RealtimeEngine(self.sample_rate, 100, 20, 'mute', curve='equal_power')
+        self.assertEqual(engine.latency, 0)
+        output = self.run_engine(engine, self.audio)
+        offline = Pipeline(self.sample_rate, 20).add('mute').add('fade', curve='equal_power').run(self.audio)
+        #the last, shorter segment is faded like a whole one: its end is not known in advance
+        whole = len(self.audio) - len(self.audio) % 160
+        np.testing.assert_allclose(output[:whole], offline[:whole], atol=1e-7)
+        #held back for one segment, it gets the envelope of its own length
+        engine = RealtimeEngine(self.sample_rate, 100, 20, 'mute', curve='equal_power', latency_ms=20)
+        output = self.run_engine(engine, self.audio)
+        np.testing.assert_array_equal(output[:160], 0)
+        np.testing.assert_allclose(output[160:], offline, atol=1e-7)
+        engine = RealtimeEngine(self.sample_rate, 64, 20, None, latency_ms=20)
+        output = self.run_engine(engine, self.audio)
+        offline = Pipeline(self.sample_rate, 20).add('fade').run(self.audio)
+        np.testing.assert_allclose(output[160:], offline, atol=1e-7)
+
+    def test_configured_latency(self):
+        engine = RealtimeEngine(self.sample_rate, 256, 20, 'reverse', latency_ms=50)
+        self.assertEqual(engine.latency, 400)
+        output = self.run_engine(engine, self.audio)
+        offline = Pipeline(self.sample_rate, 20).add('reverse').add('fade').run(self.audio)
+        np.testing.assert_array_equal(output[400:], offline)
+        with self.assertRaises(ValueError):
+            RealtimeEngine(self.sample_rate, 256, 20, 'reverse', latency_ms=10)
+
+    def test_multichannel(self):
+        audio = np.stack([self.audio, -self.audio])
+        engine = RealtimeEngine(self.sample_rate, 128, 20, 'reverse', channels=2)
+        output = self.run_engine(engine, audio)
+        np.testing.assert_array_equal(output[0], -output[1])
+        with self.assertRaises(ValueError):
+            engine.process(self.audio[:128])
+
+    def test_deadline_report(self):
+        engine = RealtimeEngine(self.sample_rate, 256, 20, 'noise')
+        self.run_engine(engine, self.audio)
+        report = engine.report()
+        self.assertEqual(report['blocks'], -(-len(self.audio) // 256))
+        self.assertAlmostEqual(report['deadline_ms'], 32.0)
+        self.assertLessEqual(report['p50_ms'], report['max_ms'])
+        self.assertGreaterEqual(report['overruns'], 0)
+        with self.assertRaises(ValueError):
+            engine.process(np.zeros(257, dtype=np.float32))
+
+    def test_simulated_clock_paces_the_blocks(self):
+        clock = FakeClock()
+        engine = RealtimeEngine(self.sample_rate, 800, 20, 'reverse')
+        blocks = [self.audio[:4000]]
+        list(simulate(engine, blocks, speed=2.0, clock=clock, sleep=clock.sleep))
+        #five blocks of 100 ms at twice real time
+        self.assertEqual(len(clock.waits), 5)
+        self.assertAlmostEqual(clock.now, 0.25)
+
+    def test_fixed_blocks(self):
+        blocks = [np.arange(5), np.arange(5, 7), np.arange(7, 20)]
+        sizes = [len(block) for block in fixed_blocks(blocks, 6)]
+        self.assertEqual(sizes, [6, 6, 6, 2])
+        np.testing.assert_array_equal(np.concatenate(list(fixed_blocks(blocks, 6))), np.arange(20))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
 import numpy as np
 from libraries import *
+from libraries.library1 import SegmentTable
+from libraries.library2 import compile_selector
 class TestReverseSegments(unittest.TestCase):
     
     def setUp(self):
@@ -10,22 +12,64 @@ class TestReverseSegments(unittest.TestCase):
         self.segments = [self.segment1, self.segment2, self.segment3]
         
     def test_reverse_segments1(self):
-        reversed_segments = reverse_segments(self.segments, 44100, '1*n+0')
+        reversed_segments = reverse_segments(self.segments, '1*n+0')
         true_reverses = [np.array([3,2,1]), np.array([6,5,4]), np.array([9,8,7])]
-        self.assertEqual(reversed_segments[0].all(),true_reverses[0].all())
-        self.assertEqual(reversed_segments[1].all(),true_reverses[1].all())
-        self.assertEqual(reversed_segments[2].all(),true_reverses[2].all())
+        np.testing.assert_array_equal(reversed_segments[0],true_reverses[0])
+        np.testing.assert_array_equal(reversed_segments[1],true_reverses[1])
+        np.testing.assert_array_equal(reversed_segments[2],true_reverses[2])
         
         # Test the function with a different pattern.
     def test_reverse_segments2(self):
-        reversed_segments = reverse_segments(self.segments, 44100, '2*n+0')
+        reversed_segments = reverse_segments(self.segments, '2*n+0')
         true_reverses = [np.array([3,2,1]), np.array([4,5,6]), np.array([9,8,7])]
-        self.assertEqual(reversed_segments[0].all(),true_reverses[0].all())
-        self.assertEqual(reversed_segments[1].all(),true_reverses[1].all())
-        self.assertEqual(reversed_segments[2].all(),true_reverses[2].all())
+        np.testing.assert_array_equal(reversed_segments[0],true_reverses[0])
+        np.testing.assert_array_equal(reversed_segments[1],true_reverses[1])
+        np.testing.assert_array_equal(reversed_segments[2],true_reverses[2])
         
         
-    
+class TestSegmentSelector(unittest.TestCase):
+
+    def selected(self, expression, count=30, offset=0):
+        return compile_selector(expression).indices(count, offset).tolist()
+
+    def test_affine_terms(self):
+        self.assertEqual(self.selected('2*n+1', 8), [1, 3, 5, 7])
+        self.assertEqual(self.selected('12 * n + 3'), [3, 15, 27])
+        self.assertEqual(self.selected('3n'), [0, 3, 6, 9, 12, 15, 18, 21, 24, 27])
+        self.assertEqual(self.selected('0*n+4'), [4])
+        self.assertEqual(self.selected('1.5*n+0', 10), [0, 3, 6, 9])
+
+    def test_ranges_slices_and_modulo_sets(self):
+        self.assertEqual(self.selected('2-5'), [2, 3, 4, 5])
+        self.assertEqual(self.selected('::7'), [0, 7, 14, 21, 28])
+        self.assertEqual(self.selected('-3:'), [27, 28, 29])
+        self.assertEqual(self.selected('n%10=={0,9}'), [0, 9, 10, 19, 20, 29])
+        self.assertEqual(self.selected('0-1, n%10==5 | 28'), [0, 1, 5, 15, 25, 28])
+
+    def test_offset_keeps_global_indices(self):
+        #a block that starts at segment 7 selects the same global segments
+        self.assertEqual(self.selected('2*n+0', 6, offset=7), [1, 3, 5])
+        self.assertEqual(self.selected('2-8', 6, offset=7), [0, 1])
+
+    def test_masks_are_cached(self):
+        selector = compile_selector('2*n+0')
+        self.assertIs(selector, compile_selector('2*n+0'))
+        self.assertIs(selector.mask(100), selector.mask(100))
+        self.assertFalse(selector.mask(100).flags.writeable)
+
+    def test_invalid_selectors(self):
+        for expression in ['', 'n^2', '1:5:0', 'n%0==1']:
+            with self.assertRaises(ValueError):
+                compile_selector(expression)
+
+    def test_table_matches_list(self):
+        audio = np.arange(1050.0)
+        segments = [seg.copy() for seg in np.split(audio, range(100, 1050, 100))]
+        table = SegmentTable.from_length(audio.copy(), 100)
+        expected = np.concatenate(reverse_segments(segments, 'n%3=={0,2}'))
+        reverse_segments(table, 'n%3=={0,2}')
+        np.testing.assert_array_equal(table.buffer, expected)
+        
         
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
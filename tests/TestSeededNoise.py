@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from libraries import *
+from libraries.library3 import generate_noise, generate_noise_batch
+from libraries.noise_bank import NOISE_GROUP, NoiseBank, load_noise_pool, spawn_rng
+from libraries.streaming import process_blocks
+
+
+class TestSeededNoise(unittest.TestCase):
+    def setUp(self):
+        self.sample_rate = 8000
+        self.audio = np.random.default_rng(0).normal(0, 0.3, (2, 3 * self.sample_rate)).astype(np.float32)
+
+    def reference(self, **params):
+        return Pipeline(self.sample_rate, 20).add('noise', seed=5, **params).add('fade').run(self.audio)
+
+    def test_spawn_rng_matches_seed_sequence_spawn(self):
+        child = np.random.SeedSequence(9).spawn(3)[2].spawn(5)[4]
+        np.testing.assert_array_equal(spawn_rng(9, 2, 4).random(4), np.random.default_rng(child).random(4))
+
+    def test_same_seed_same_noise(self):
+        first = generate_noise(1000, self.sample_rate, 'pink', seed=3)
+        np.testing.assert_array_equal(first, generate_noise(1000, self.sample_rate, 'pink', seed=3))
+        self.assertFalse(np.array_equal(first, generate_noise(1000, self.sample_rate, 'pink', seed=4)))
+        #the global random state is neither used nor changed
+        state = np.random.get_state()[1].copy()
+        generate_noise_batch(4, 500, self.sample_rate, seed=3)
+        np.testing.assert_array_equal(np.random.get_state()[1], state)
+
+    def test_noise_does_not_depend_on_call_order(self):
+        bank = NoiseBank(self.sample_rate, 'pink', seed=7)
+        indices = np.array([3, NOISE_GROUP + 1, 0, 5 * NOISE_GROUP])
+        together = bank.segments(indices, 300)
+        other = NoiseBank(self.sample_rate, 'pink', seed=7)
+        apart = np.concatenate([other.segments([index], 300) for index in indices[::-1]])[::-1]
+        np.testing.assert_array_equal(together, apart)
+        np.testing.assert_allclose(together.std(axis=1), 1, atol=1e-3)
+
+    def test_chunking_does_not_change_the_output(self):
+        reference = self.reference(noise_type='pink')
+        for chunk_size in (1000, 7000):
+            pipeline = Pipeline(self.sample_rate, 20, chunk_size=chunk_size).add('noise', noise_type='pink', seed=5)
+            np.testing.assert_array_equal(pipeline.add('fade').run(self.audio), reference)
+
+    def test_block_size_does_not_change_the_output(self):
+        reference = self.reference()
+        for blocksize in (1000, 4321):
+            blocks = (self.audio[:, i:i + blocksize] for i in range(0, self.audio.shape[-1], blocksize))
+            chunks = [chunk.copy() for chunk in process_blocks(blocks, self.sample_rate, 20, 'noise', seed=5)]
+            np.testing.assert_array_equal(np.concatenate(chunks, axis=-1), reference)
+
+    def test_worker_count_does_not_change_the_output(self):
+        reference = self.reference()
+        for workers in (1, 2):
+            result = parallel_process(self.audio, self.sample_rate, 20, 'noise', workers=workers, seed=5)
+            np.testing.assert_array_equal(result, reference)
+
+    def test_list_matches_table(self):
+        segments = segment_audio_by_duration(self.audio, self.sample_rate, 30)
+        table = segment_audio_by_duration(self.audio.copy(), self.sample_rate, 30, as_table=True)
+        listed = manipulate_segments(segments, 'noise', self.sample_rate, seed=1)
+        manipulate_segments(table, 'noise', self.sample_rate, seed=1)
+        np.testing.assert_array_equal(concatenate_segments(listed), table.buffer)
+
+    def test_noise_pool(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'pool.npy')
+            precompute_noise(path, self.sample_rate, 'pink', seconds=2)
+            #both files were renamed into place
+            self.assertEqual(sorted(os.listdir(folder)), ['pool.json', 'pool.npy'])
+            pool, meta = load_noise_pool(path)
+            self.assertIsInstance(pool, np.memmap)
+            self.assertEqual(meta['noise_type'], 'pink')
+            first = self.reference(noise_type='pink', noise_pool=path)
+            np.testing.assert_array_equal(first, self.reference(noise_type='pink', noise_pool=path))
+            self.assertFalse(np.array_equal(first, self.reference(noise_type='pink')))
+            with self.assertRaises(ValueError):
+                NoiseBank(self.sample_rate, 'white', pool=path)
+            with self.assertRaises(ValueError):
+                NoiseBank(self.sample_rate, 'pink', pool=path).segments([0], 3 * self.sample_rate)
+
+    def test_unseeded_bank_has_no_segments(self):
+        with self.assertRaises(ValueError):
+            NoiseBank(self.sample_rate).segments([0], 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import soundfile as sf
+from libraries.dtypes import dtype_policy
+from libraries.library1 import SegmentTable
+from libraries.library6 import SegmentAssembler, _float_wav_header, concatenate_segments
+
+
+class TestSegmentAssembler(unittest.TestCase):
+    def test_mixed_float_segments_are_not_upcast(self):
+        segments = [np.ones(3, dtype=np.float32), np.zeros(2, dtype=np.float64)]
+        result = concatenate_segments(segments)
+        self.assertEqual(result.dtype, np.float32)
+        np.testing.assert_array_equal(result, [1, 1, 1, 0, 0])
+        self.assertEqual(concatenate_segments(segments, dtype=np.float64).dtype, np.float64)
+        #mixed precisions follow the dtype policy, whatever their order
+        with dtype_policy('float64'):
+            self.assertEqual(concatenate_segments(segments).dtype, np.float64)
+            self.assertEqual(concatenate_segments(segments[::-1]).dtype, np.float64)
+        half = [np.ones(2, dtype=np.float16)] + segments
+        self.assertEqual(concatenate_segments(half).dtype, np.float32)
+        #a precision all segments share is kept
+        self.assertEqual(concatenate_segments([np.zeros(2), np.ones(3)]).dtype, np.float64)
+
+    def test_writes_into_preallocated_output(self):
+        out = np.full(6, -1.0)
+        result = concatenate_segments([np.arange(2.0), np.arange(4.0)], out=out)
+        self.assertIs(result, out)
+        np.testing.assert_array_equal(out, [0, 1, 0, 1, 2, 3])
+        with self.assertRaises(ValueError):
+            concatenate_segments([np.arange(2.0)], out=out)
+
+    def test_segments_at_known_offsets(self):
+        assembler = SegmentAssembler(10, np.float32)
+        assembler.write(6, np.full(4, 2.0))
+        assembler.write(0, np.full(6, 1.0))
+        np.testing.assert_array_equal(assembler.result, [1] * 6 + [2] * 4)
+        with self.assertRaises(ValueError):
+            assembler.write(8, np.ones(4))
+
+    def test_memmap_outputs(self):
+        table = SegmentTable.from_length(np.linspace(-1, 1, 1000, dtype=np.float32), 300)
+        with tempfile.TemporaryDirectory() as folder:
+            wav_path = os.path.join(folder, "out.wav")
+            assembler = SegmentAssembler(1000, path=wav_path, sample_rate=8000)
+            concatenate_segments(table, out=assembler)
+            assembler.flush()
+            del assembler
+            audio, sr = sf.read(wav_path, dtype='float32')
+            self.assertEqual(sr, 8000)
+            np.testing.assert_array_equal(audio, table.buffer)
+
+            npy_path = os.path.join(folder, "out.npy")
+            assembler = SegmentAssembler(1000, path=npy_path)
+            for segment in table:
+                assembler.append(segment)
+            assembler.flush()
+            del assembler
+            np.testing.assert_array_equal(np.load(npy_path), table.buffer)
+
+    def test_wav_output_is_limited_to_4_gib(self):
+        self.assertEqual(len(_float_wav_header(2 ** 28, 44100, 2)), 56)
+        with self.assertRaises(ValueError):
+            _float_wav_header(2 ** 29, 44100, 2)
+
+    def test_pipeline_and_stream_fill_a_wav_assembler(self):
+        from libraries.pipeline import Pipeline
+        from libraries.streaming import process_blocks
+
+        audio = np.random.default_rng(1).normal(0, 0.1, (2, 5000)).astype(np.float32)
+        expected = Pipeline(1000, 100).add('reverse').add('fade').run(audio)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "out.wav")
+            assembler = SegmentAssembler(5000, np.float32, path=path, sample_rate=1000, channels=2)
+            original = audio.copy()
+            Pipeline(1000, 100).add('reverse').add('fade').run(audio, out=assembler)
+            np.testing.assert_array_equal(sf.read(path, dtype="float32")[0].T, expected)
+            np.testing.assert_array_equal(audio, original)
+
+            path = os.path.join(folder, "stream.wav")
+            assembler = SegmentAssembler(5000, np.float32, path=path, sample_rate=1000, channels=2)
+            blocks = (audio[:, i:i + 1234] for i in range(0, 5000, 1234))
+            for _ in process_blocks(blocks, 1000, 100, 'reverse', out=assembler):
+                pass
+            self.assertEqual(assembler.cursor, 5000)
+            np.testing.assert_array_equal(sf.read(path, dtype="float32")[0].T, expected)
+
+            from libraries.parallel import parallel_process
+            path = os.path.join(folder, "parallel.wav")
+            assembler = SegmentAssembler(5000, np.float32, path=path, sample_rate=1000, channels=2)
+            parallel_process(audio, 1000, 100, 'reverse', workers=1, out=assembler.output)
+            assembler.flush()
+            np.testing.assert_array_equal(sf.read(path, dtype="float32")[0].T, expected)
+            del assembler
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import numpy as np
+from libraries.library1 import segment_audio_list, segment_audio_by_duration
+
+class TestSegmentAudioList(unittest.TestCase):
+    def test_segment_audio_list(self):
+        sample_rate = 1000  # 1000 samples per second
+        num_segments = 2   # Split each audio into 2 segments
+        audio1 = np.arange(1000)   # Test signal with values from 0 to 999
+        audio2 = np.arange(1500)   # Test signal with values from 0 to 1499
+        
+        audio_arrays = [audio1, audio2]
+        segmented_audios = segment_audio_list(audio_arrays, sample_rate, num_segments)
+
+        # Expected segment lengths.
+        expected_segment_samples1 = len(audio1) // num_segments
+        expected_segment_samples2 = len(audio2) // num_segments
+        
+        self.assertEqual(len(segmented_audios[0][0]), expected_segment_samples1)
+        self.assertEqual(len(segmented_audios[1][0]), expected_segment_samples2)
+        
+        # Check if segmentation preserves original values.
+        self.assertTrue(np.array_equal(segmented_audios[0][0], np.arange(500)))
+        self.assertTrue(np.array_equal(segmented_audios[0][1], np.arange(500, 1000)))
+        self.assertEqual(segmented_audios[1][1][-1], 1499)
+
+class TestSegmentAudioByDuration(unittest.TestCase):
+    def test_exact_division(self):
+        sample_rate = 1000  # 1000 samples per second
+        segment_duration_ms = 250  # Each segment is 250ms (i.e., 250 samples)
+        audio = np.arange(1000)
+        segments = segment_audio_by_duration(audio, sample_rate, segment_duration_ms)
+        
+        # Expecting exactly 4 segments.
+        self.assertEqual(len(segments), 4)
+        for segment in segments:
+            self.assertEqual(len(segment), 250)
+        
+        # Verify that reassembling the segments recovers the original audio.
+        self.assertTrue(np.array_equal(np.concatenate(segments), audio))
+
+    def test_inexact_division(self):
+        sample_rate = 1000  # 1000 samples per second
+        segment_duration_ms = 300  # Each segment is 300ms (i.e., 300 samples)
+        audio = np.arange(1000)
+        segments = segment_audio_by_duration(audio, sample_rate, segment_duration_ms)
+        # Expected segmentation:
+        # Segment 1: samples 0-299 (300 samples)
+        # Segment 2: samples 300-599 (300 samples)
+        # Segment 3: samples 600-899 (300 samples)
+        # Segment 4: samples 900-999 (100 samples)
+        self.assertEqual(len(segments), 4)
+        self.assertEqual(len(segments[0]), 300)
+        self.assertEqual(len(segments[1]), 300)
+        self.assertEqual(len(segments[2]), 300)
+        self.assertEqual(len(segments[3]), 100)
+        self.assertTrue(np.array_equal(np.concatenate(segments), audio))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import numpy as np
+from libraries import *
+from libraries.library1 import SegmentTable
+
+
+class TestSegmentTable(unittest.TestCase):
+    def setUp(self):
+        self.sample_rate = 1000
+        self.audio = np.arange(1000, dtype=np.float64)
+
+    def test_table_matches_list_segmentation(self):
+        #the table must describe exactly the same segments as the list version
+        segments = segment_audio_by_duration(self.audio.copy(), self.sample_rate, 300)
+        table = segment_audio_by_duration(self.audio.copy(), self.sample_rate, 300, as_table=True)
+        self.assertEqual(len(table), len(segments))
+        for seg, view in zip(segments, table):
+            np.testing.assert_array_equal(seg, view)
+        self.assertEqual(table.rows.shape, (3, 300))
+        self.assertEqual(list(table.tail_indices), [3])
+
+    def test_views_share_the_buffer(self):
+        table = SegmentTable.from_length(self.audio, 250)
+        self.assertTrue(np.shares_memory(table.rows, self.audio))
+        self.assertTrue(np.shares_memory(table[3], self.audio))
+
+    def test_from_count_absorbs_remainder(self):
+        table = segment_audio_list(np.arange(1003), self.sample_rate, 4, as_table=True)
+        np.testing.assert_array_equal(table.lengths, [250, 250, 250, 253])
+        self.assertEqual(table.rows.shape, (3, 250))
+        self.assertEqual(table[3][-1], 1002)
+
+    def test_pipeline_on_table_matches_list(self):
+        list_audio = self.audio.copy()
+        table_audio = self.audio.copy()
+        segments = segment_audio_by_duration(list_audio, self.sample_rate, 300)
+        table = segment_audio_by_duration(table_audio, self.sample_rate, 300, as_table=True)
+
+        segments = manipulate_segments(segments, 'mute', self.sample_rate)
+        table = manipulate_segments(table, 'mute', self.sample_rate)
+        segments = reverse_segments(segments, '1 * n + 0')
+        table = reverse_segments(table, '1 * n + 0')
+        segments = smooth_audio_list(segments, self.sample_rate, fade_percentage=15)
+        table = smooth_audio_list(table, self.sample_rate, fade_percentage=15)
+
+        expected = concatenate_segments(segments)
+        result = concatenate_segments(table)
+        np.testing.assert_allclose(result, expected)
+        #contiguous tables are assembled without copying
+        self.assertTrue(np.shares_memory(result, table_audio))
+
+    def test_noise_on_table_keeps_odd_segments(self):
+        table = SegmentTable.from_length(np.ones(4000), 1000)
+        manipulate_segments(table, 'noise', 44100, noise_type='white', noise_level=0.5)
+        self.assertFalse(np.array_equal(table[0], np.ones(1000)))
+        np.testing.assert_array_equal(table[1], np.ones(1000))
+        np.testing.assert_array_equal(table[3], np.ones(1000))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import asyncio
+import http.client
+import io
+import json
+import threading
+import unittest
+import numpy as np
+import soundfile as sf
+from libraries.service import ProcessingService, ServiceMetrics
+
+
+class TestService(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.loop = asyncio.new_event_loop()
+        cls.thread = threading.Thread(target=cls.loop.run_forever, daemon=True)
+        cls.thread.start()
+        cls.service = ProcessingService(port=0, workers=1, queue_size=1, admit_timeout=0.5)
+        asyncio.run_coroutine_threadsafe(cls.service.start(), cls.loop).result(timeout=30)
+
+    @classmethod
+    def tearDownClass(cls):
+        asyncio.run_coroutine_threadsafe(cls.service.close(), cls.loop).result(timeout=30)
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+        cls.thread.join()
+        cls.loop.close()
+
+    def setUp(self):
+        self.sample_rate = 8000
+        self.audio = np.random.default_rng(0).normal(0, 0.2, self.sample_rate).astype(np.float32)
+        wav = io.BytesIO()
+        sf.write(wav, self.audio, self.sample_rate, format='WAV', subtype='FLOAT')
+        self.wav = wav.getvalue()
+
+    def request(self, method, path, body=None, headers=None, encode_chunked=False):
+        connection = http.client.HTTPConnection('127.0.0.1', self.service.port, timeout=60)
+        try:
+            connection.request(method, path, body=body, headers=headers or {}, encode_chunked=encode_chunked)
+            response = connection.getresponse()
+            return response, response.read()
+        finally:
+            connection.close()
+
+    def test_process_returns_the_processed_file(self):
+        response, body = self.request('POST', '/process?method=reverse&segment=100&fade_percentage=0', self.wav)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader('Transfer-Encoding'), 'chunked')
+        result, rate = sf.read(io.BytesIO(body), dtype='float32')
+        self.assertEqual(rate, self.sample_rate)
+        expected = self.audio.reshape(10, 800)[:, ::-1].ravel()
+        np.testing.assert_allclose(result, expected, atol=1e-4)
+
+    def test_chunked_upload(self):
+        pieces = (self.wav[i:i + 1000] for i in range(0, len(self.wav), 1000))
+        response, body = self.request('POST', '/process?method=mute&format=flac', pieces,
+                                      {'Transfer-Encoding': 'chunked'}, encode_chunked=True)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader('Content-Type'), 'audio/flac')
+        self.assertEqual(len(sf.read(io.BytesIO(body))[0]), len(self.audio))
+
+    def test_errors(self):
+        self.assertEqual(self.request('POST', '/process?method=shout', self.wav)[0].status, 400)
+        self.assertEqual(self.request('POST', '/process?volume=11', self.wav)[0].status, 400)
+        self.assertEqual(self.request('POST', '/process', b'')[0].status, 400)
+        self.assertEqual(self.request('GET', '/process')[0].status, 405)
+        response, body = self.request('GET', '/nothing')
+        self.assertEqual(response.status, 404)
+        self.assertIn('error', json.loads(body))
+
+    def test_metrics(self):
+        self.request('POST', '/process?method=reverse', self.wav)
+        response, body = self.request('GET', '/metrics')
+        self.assertEqual(response.status, 200)
+        metrics = json.loads(body)
+        self.assertGreaterEqual(metrics['completed'], 1)
+        self.assertEqual(metrics['queue_depth'], 0)
+        self.assertIsNotNone(metrics['latency_ms']['p99'])
+        self.assertGreater(metrics['throughput']['audio_seconds_per_s'], 0)
+
+    def test_full_queue_turns_requests_away(self):
+        #take every admission slot, as if that many requests were running or queued
+        slots = self.service.queue_size + self.service.workers
+        for _ in range(slots):
+            asyncio.run_coroutine_threadsafe(self.service._admission.acquire(), self.loop).result()
+        try:
+            response, _ = self.request('POST', '/process', self.wav)
+            self.assertEqual(response.status, 503)
+        finally:
+            for _ in range(slots):
+                self.loop.call_soon_threadsafe(self.service._admission.release)
+        self.assertEqual(self.request('POST', '/process', self.wav)[0].status, 200)
+
+    def test_metrics_percentiles(self):
+        metrics = ServiceMetrics()
+        for latency in range(1, 101):
+            metrics.record(latency / 1000, 0.0, 1.0)
+        snapshot = metrics.snapshot()
+        self.assertAlmostEqual(snapshot['latency_ms']['p50'], 50.5)
+        self.assertEqual(snapshot['completed'], 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import io
+import os
+import tempfile
+import unittest
+import numpy as np
+import soundfile as sf
+from libraries import *
+from libraries.streaming import segment_blocks, process_blocks, read_blocks, read_pcm_blocks, write_pcm
+
+
+def split_blocks(audio, blocksize):
+    return [audio[i:i + blocksize] for i in range(0, len(audio), blocksize)]
+
+
+class ShortReads(io.BytesIO):
+    #behaves like a pipe that delivers at most 7 bytes per read, splitting frames
+    def read(self, size=-1):
+        return super().read(7 if size < 0 else min(size, 7))
+
+
+class TestStreaming(unittest.TestCase):
+    def setUp(self):
+        self.sample_rate = 1000
+        self.audio = np.random.normal(0, 0.2, 10_050).astype(np.float32)
+
+    def in_memory(self, method):
+        table = segment_audio_by_duration(self.audio.copy(), self.sample_rate, 30, as_table=True)
+        if method == 'reverse':
+            reverse_segments(table, '1 * n + 0')
+        else:
+            manipulate_segments(table, method, self.sample_rate)
+        smooth_audio_list(table, self.sample_rate, fade_percentage=15)
+        return concatenate_segments(table)
+
+    def test_segments_spanning_blocks_stay_whole(self):
+        tables = list(table.to_list() + [table.first_index] for table in
+                      segment_blocks(split_blocks(np.arange(1000.0), 77), 30, blocksize=100))
+        #90-sample tables: three segments each, the last table holds the 10-sample remainder
+        self.assertEqual(tables[1][-1], 3)
+        self.assertEqual(len(tables[-1][-2]), 10)
+
+    def test_stream_matches_in_memory(self):
+        for method in ['mute', 'reverse']:
+            blocks = split_blocks(self.audio.copy(), 777)
+            streamed = np.concatenate([chunk.copy() for chunk in
+                                       process_blocks(blocks, self.sample_rate, 30, method)])
+            np.testing.assert_allclose(streamed, self.in_memory(method))
+
+    def test_stream_noise_keeps_odd_segments(self):
+        audio = np.ones(3000, dtype=np.float32)
+        streamed = np.concatenate([chunk.copy() for chunk in
+                                   process_blocks(split_blocks(audio, 512), self.sample_rate, 100, 'noise',
+                                                  fade_percentage=0)])
+        np.testing.assert_array_equal(streamed[100:200], 1)
+        self.assertAlmostEqual(np.sqrt(np.mean(streamed[:100] ** 2)), 0.5, places=3)
+
+    def test_stream_process_writes_file(self):
+        with tempfile.TemporaryDirectory() as folder:
+            input_file = os.path.join(folder, "input.wav")
+            output_file = os.path.join(folder, "out", "output.wav")
+            sf.write(input_file, self.audio, self.sample_rate, subtype='FLOAT')
+            written = stream_process(input_file, output_file, 30, 'mute', blocksize=1000)
+            self.assertEqual(written, len(self.audio))
+            result, sr = sf.read(output_file, dtype='float32')
+            self.assertEqual(sr, self.sample_rate)
+            np.testing.assert_allclose(result, self.in_memory('mute'), atol=1e-4)
+            self.assertEqual(sum(len(block) for block in read_blocks(input_file, 4096)), len(self.audio))
+
+    def test_raw_pcm_round_trip(self):
+        samples = (np.arange(-500, 501) * 30).astype('<i2')
+        stereo = np.repeat(samples, 2)
+        blocks = list(read_pcm_blocks(ShortReads(stereo.tobytes()), 's16le', 2, 333))
+        self.assertEqual(sum(len(block) for block in blocks), len(samples))
+        out = io.BytesIO()
+        for block in blocks:
+            write_pcm(out, block, 's16le')
+        np.testing.assert_array_equal(np.frombuffer(out.getvalue(), '<i2'), samples)
+
+    def test_raw_pcm_partial_frame(self):
+        stereo = np.zeros(2000, dtype='<i2').tobytes()
+        blocks = read_pcm_blocks(ShortReads(stereo + b'\x01\x02\x03'), 's16le', 2, 333)
+        with self.assertRaisesRegex(ValueError, '3 bytes'):
+            list(blocks)
+
+
+if __name__ == "__main__":
+    unittest.main()
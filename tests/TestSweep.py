@@ -0,0 +1,73 @@
+import csv
+import os
+import tempfile
+import unittest
+import numpy as np
+import soundfile as sf
+from libraries import *
+from libraries.sweep import sweep_plan, variant_name
+
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.sample_rate = 8000
+        #quiet enough not to clip on export, and not a whole number of segments
+        self.audio = np.random.default_rng(0).normal(0, 0.1, 2 * self.sample_rate + 123).astype(np.float32)
+        self.temp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def reference(self, audio, variant, seed=0):
+        pipeline = Pipeline(self.sample_rate, variant['segment'])
+        if variant['method'] == 'noise':
+            pipeline.add('noise', noise_type=variant['noise_type'], noise_level=variant['noise_level'], seed=seed)
+        else:
+            pipeline.add(variant['method'])
+        return pipeline.add('fade', fade_percentage=variant['fade_percentage']).run(audio)
+
+    def test_variants(self):
+        variants = sweep_variants([20, 50], noise_types=['white', 'pink'], noise_levels=[0.25, 1],
+                                  fade_percentages=[0, 15])
+        #(mute + reverse + 2 types x 2 levels) x 2 fades per duration
+        self.assertEqual(len(variants), 2 * 6 * 2)
+        plan = sweep_plan(variants)
+        self.assertEqual(list(plan), [20, 50])
+        self.assertEqual(len(plan[20]), 6)
+        self.assertEqual(len(plan[20][('noise', 'pink', 0.25)]), 2)
+        self.assertEqual(variant_name('speech', variants[2]), 'speech_20ms_noise_white_0.25_fade0')
+        with self.assertRaises(ValueError):
+            sweep_variants(methods=['shout'])
+        with self.assertRaises(ValueError):
+            sweep_variants(fade_percentages=[60])
+
+    def test_outputs_match_the_pipeline(self):
+        for audio in (self.audio, np.stack([self.audio, self.audio[::-1]])):
+            variants = sweep_variants([20, 33], noise_levels=[0.25, 1], fade_percentages=[0, 15])
+            folder = os.path.join(self.temp.name, str(audio.ndim))
+            original = audio.copy()
+            rows = run_sweep(audio, self.sample_rate, folder, variants, stem='x', workers=3,
+                             output_format='flac' if audio.ndim > 1 else 'wav')
+            np.testing.assert_array_equal(audio, original)
+            self.assertTrue(all(row['ok'] for row in rows))
+            for row, variant in zip(rows, variants):
+                result, _ = sf.read(os.path.join(folder, row['file']), dtype='float32', always_2d=True)
+                np.testing.assert_allclose(result.T.reshape(audio.shape), self.reference(audio, variant),
+                                           atol=1e-4)
+
+    def test_index(self):
+        variants = sweep_variants([25], methods=['reverse', 'noise'], noise_types=['pink'], fade_percentages=[10])
+        rows = run_sweep(self.audio, self.sample_rate, self.temp.name, variants, stem='s', seed=3)
+        with open(os.path.join(self.temp.name, 'index.csv'), newline='') as file:
+            index = list(csv.DictReader(file))
+        self.assertEqual([entry['file'] for entry in index], ['s_25ms_reverse_fade10.wav', 's_25ms_noise_pink_0.5_fade10.wav'])
+        self.assertEqual(index[1]['noise_type'], 'pink')
+        self.assertEqual(len(rows), 2)
+        result, _ = sf.read(os.path.join(self.temp.name, index[1]['file']), dtype='float32')
+        np.testing.assert_allclose(result, self.reference(self.audio, variants[1], seed=3), atol=1e-4)
+        with self.assertRaises(ValueError):
+            run_sweep(self.audio, self.sample_rate, self.temp.name, variants, seed=None)
+
+
+if __name__ == '__main__':
+    unittest.main()